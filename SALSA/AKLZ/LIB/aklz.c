@@ -0,0 +1,320 @@
+/*
+ * AKLZ codec for platforms without AKLZ.dll.
+ *
+ * Exposes the same interface as AKLZ.dll (is_compressed, decompress, compress) so that
+ * aklz_dll.py can load either library. The output of compress matches aklz_py.compress
+ * in 'best' mode, and compress_with_mode matches it in either mode.
+ *
+ * Build with build_aklz.py, or directly:
+ *     cc -O2 -shared -fPIC -o libaklz.so aklz.c
+ */
+
+#include <stdlib.h>
+#include <string.h>
+
+#ifdef _WIN32
+#define EXPORT __declspec(dllexport)
+#else
+#define EXPORT __attribute__((visibility("default")))
+#endif
+
+#define SIGNATURE_SIZE 12
+#define HEADER_SIZE 16
+#define MATCH_BEG 3
+#define MAX_MATCH_LEN 18
+#define BUFFER_SIZE 4096
+#define WINDOW_MASK (BUFFER_SIZE - 1)
+#define WINDOW_START 18
+#define HASH_BITS 15
+#define HASH_SIZE (1 << HASH_BITS)
+#define FAST_MAX_CHAIN 16
+
+static const unsigned char signature[SIGNATURE_SIZE] = {
+    'A', 'K', 'L', 'Z', '~', '?', 'Q', 'd', '=', 0xCC, 0xCC, 0xCD
+};
+
+typedef struct {
+    int size;
+    char *buffer;
+} BufWSize;
+
+EXPORT int is_compressed(const char *buffer_in)
+{
+    return memcmp(buffer_in, signature, SIGNATURE_SIZE) == 0 ? 0 : 1;
+}
+
+EXPORT void free_buffer(char *buffer)
+{
+    free(buffer);
+}
+
+/* ------------------ */
+/* Decompress Methods */
+/* ------------------ */
+
+static long get_match_location(long raw_match_pos, long cur_out_size)
+{
+    long num_windows = 0;
+    long match_loc;
+    if (cur_out_size > raw_match_pos) {
+        num_windows = (cur_out_size - raw_match_pos + BUFFER_SIZE - 1) / BUFFER_SIZE;
+        if (num_windows > cur_out_size / BUFFER_SIZE)
+            num_windows = cur_out_size / BUFFER_SIZE;
+    }
+    match_loc = raw_match_pos + num_windows * BUFFER_SIZE;
+    if (match_loc > cur_out_size)
+        match_loc -= BUFFER_SIZE;
+    return match_loc;
+}
+
+EXPORT int decompress(BufWSize *buf_in, BufWSize *buf_out)
+{
+    const unsigned char *file_in = (const unsigned char *)buf_in->buffer;
+    long file_in_size = buf_in->size;
+    long file_in_ptr = HEADER_SIZE;
+    long file_out_size;
+    long cur_out_size = 0;
+    unsigned char *file_out;
+    int i;
+
+    buf_out->size = 0;
+    buf_out->buffer = NULL;
+
+    if (file_in_size < HEADER_SIZE || memcmp(file_in, signature, SIGNATURE_SIZE) != 0)
+        return 1;
+
+    file_out_size = ((long)file_in[12] << 24) | ((long)file_in[13] << 16) | ((long)file_in[14] << 8) | file_in[15];
+    /* Positions not written yet read as 0, so the output starts zeroed */
+    file_out = calloc(file_out_size > 0 ? file_out_size : 1, 1);
+    if (file_out == NULL)
+        return 2;
+
+    while (file_in_ptr < file_in_size && cur_out_size < file_out_size) {
+        unsigned char flag_byte = file_in[file_in_ptr++];
+
+        for (i = 0; i < 8; i++) {
+            if (flag_byte & 1) {
+                if (file_in_ptr >= file_in_size)
+                    goto truncated;
+                file_out[cur_out_size++] = file_in[file_in_ptr++];
+            } else {
+                long raw_match_pos, match_len, match_loc, j;
+                if (file_in_ptr + 1 >= file_in_size)
+                    goto truncated;
+                raw_match_pos = (file_in[file_in_ptr] | ((file_in[file_in_ptr + 1] & 0xF0) << 4)) + WINDOW_START;
+                match_len = (file_in[file_in_ptr + 1] & 0x0F) + MATCH_BEG;
+                file_in_ptr += 2;
+                if (match_len > file_out_size - cur_out_size)
+                    match_len = file_out_size - cur_out_size;
+                match_loc = get_match_location(raw_match_pos, cur_out_size);
+                if (match_loc + match_len > file_out_size)
+                    goto truncated;
+                for (j = 0; j < match_len; j++, match_loc++)
+                    file_out[cur_out_size++] = match_loc < 0 ? 0 : file_out[match_loc];
+            }
+            flag_byte >>= 1;
+
+            if (file_in_ptr >= file_in_size || cur_out_size >= file_out_size)
+                break;
+        }
+    }
+
+    buf_out->size = (int)file_out_size;
+    buf_out->buffer = (char *)file_out;
+    return 0;
+
+truncated:
+    free(file_out);
+    return 3;
+}
+
+/* ---------------- */
+/* Compress Methods */
+/* ---------------- */
+
+/* Hash chains over the input prefixed with WINDOW_START zero bytes, as in aklz_py.HashChainMatchFinder */
+typedef struct {
+    const unsigned char *data;
+    long size;
+    long inserted;
+    long max_chain;
+    long heads[HASH_SIZE];
+    long links[BUFFER_SIZE];
+} MatchFinder;
+
+static unsigned long hash3(const unsigned char *p)
+{
+    unsigned long key = ((unsigned long)p[0] << 16) | ((unsigned long)p[1] << 8) | p[2];
+    return (key * 2654435761UL >> 8) & (HASH_SIZE - 1);
+}
+
+static void insert_to(MatchFinder *mf, long end)
+{
+    if (end > mf->size - 2)
+        end = mf->size - 2;
+    for (; mf->inserted < end; mf->inserted++) {
+        unsigned long h = hash3(mf->data + mf->inserted);
+        mf->links[mf->inserted & WINDOW_MASK] = mf->heads[h];
+        mf->heads[h] = mf->inserted;
+    }
+}
+
+/* Returns the length of the longest match for pos and sets match_start, or returns 0 */
+static long find_match(MatchFinder *mf, long pos, long *match_start)
+{
+    const unsigned char *data = mf->data;
+    long max_len = mf->size - pos < MAX_MATCH_LEN ? mf->size - pos : MAX_MATCH_LEN;
+    long min_pos = pos - BUFFER_SIZE + 1 > 0 ? pos - BUFFER_SIZE + 1 : 0;
+    long best_start = 0, best_len = 0;
+    long chain = mf->max_chain;
+    long candidate;
+
+    if (max_len < MATCH_BEG)
+        return 0;
+    insert_to(mf, pos);
+
+    candidate = mf->heads[hash3(data + pos)];
+    while (candidate >= min_pos && chain > 0) {
+        /* Buckets are shared between keys, so only candidates with the same first 3 bytes count */
+        if (data[candidate] == data[pos] && data[candidate + 1] == data[pos + 1]
+            && data[candidate + 2] == data[pos + 2]) {
+            chain--;
+            if (data[candidate + best_len] == data[pos + best_len]) {
+                long length = MATCH_BEG;
+                while (length < max_len && data[candidate + length] == data[pos + length])
+                    length++;
+                if (length == max_len) {
+                    *match_start = candidate;
+                    return max_len;
+                }
+                if (length > best_len) {
+                    best_start = candidate;
+                    best_len = length;
+                }
+            }
+        }
+        candidate = mf->links[candidate & WINDOW_MASK];
+    }
+
+    *match_start = best_start;
+    return best_len;
+}
+
+static int compress_mode(BufWSize *buf_in, BufWSize *buf_out, long max_chain, int lazy)
+{
+    long file_size = buf_in->size;
+    long cur_byte = 0;
+    long out_ptr;
+    long next_start = 0, next_len = -1;
+    unsigned char *file_out;
+    unsigned char *data;
+    MatchFinder *mf;
+
+    buf_out->size = 0;
+    buf_out->buffer = NULL;
+
+    if (file_size >= SIGNATURE_SIZE && memcmp(buf_in->buffer, signature, SIGNATURE_SIZE) == 0) {
+        file_out = malloc(file_size > 0 ? file_size : 1);
+        if (file_out == NULL)
+            return 2;
+        memcpy(file_out, buf_in->buffer, file_size);
+        buf_out->size = (int)file_size;
+        buf_out->buffer = (char *)file_out;
+        return 0;
+    }
+
+    file_out = malloc(HEADER_SIZE + file_size + file_size / 8 + 2);
+    data = malloc(WINDOW_START + file_size + 1);
+    mf = malloc(sizeof(MatchFinder));
+    if (file_out == NULL || data == NULL || mf == NULL) {
+        free(file_out);
+        free(data);
+        free(mf);
+        return 2;
+    }
+
+    memset(data, 0, WINDOW_START);
+    memcpy(data + WINDOW_START, buf_in->buffer, file_size);
+    mf->data = data;
+    mf->size = WINDOW_START + file_size;
+    mf->inserted = 0;
+    mf->max_chain = max_chain;
+    memset(mf->heads, 0xFF, sizeof(mf->heads));
+    insert_to(mf, WINDOW_START);
+
+    memcpy(file_out, signature, SIGNATURE_SIZE);
+    file_out[12] = (unsigned char)(file_size >> 24);
+    file_out[13] = (unsigned char)(file_size >> 16);
+    file_out[14] = (unsigned char)(file_size >> 8);
+    file_out[15] = (unsigned char)file_size;
+    out_ptr = HEADER_SIZE;
+
+    while (cur_byte < file_size) {
+        long flag_ptr = out_ptr++;
+        unsigned char flag_byte = 0;
+        int i;
+
+        for (i = 0; i < 8; i++) {
+            long pos = cur_byte + WINDOW_START;
+            long match_start = 0, match_len;
+
+            if (next_len < 0) {
+                match_len = find_match(mf, pos, &match_start);
+            } else {
+                match_start = next_start;
+                match_len = next_len;
+                next_len = -1;
+            }
+
+            /* Emit a literal instead if the next byte starts a longer match */
+            if (lazy && match_len > 0 && match_len < MAX_MATCH_LEN && cur_byte + 1 < file_size) {
+                insert_to(mf, pos + 1);
+                next_len = find_match(mf, pos + 1, &next_start);
+                if (next_len > match_len) {
+                    match_len = 0;
+                } else {
+                    next_len = -1;
+                    insert_to(mf, pos + match_len);
+                }
+            } else if (match_len > 0) {
+                insert_to(mf, pos + match_len);
+            } else {
+                insert_to(mf, pos + 1);
+            }
+
+            if (match_len > 0) {
+                long match_pos = match_start - WINDOW_START - WINDOW_START;
+                file_out[out_ptr++] = (unsigned char)(match_pos & 0xFF);
+                file_out[out_ptr++] = (unsigned char)((match_len - MATCH_BEG) | ((match_pos & 0xF00) >> 4));
+                cur_byte += match_len;
+            } else {
+                flag_byte |= (unsigned char)(1 << i);
+                file_out[out_ptr++] = data[pos];
+                cur_byte++;
+            }
+
+            if (cur_byte >= file_size)
+                break;
+        }
+
+        file_out[flag_ptr] = flag_byte;
+    }
+
+    free(data);
+    free(mf);
+    buf_out->size = (int)out_ptr;
+    buf_out->buffer = (char *)file_out;
+    return 0;
+}
+
+EXPORT int compress(BufWSize *buf_in, BufWSize *buf_out)
+{
+    return compress_mode(buf_in, buf_out, BUFFER_SIZE, 1);
+}
+
+EXPORT int compress_with_mode(BufWSize *buf_in, BufWSize *buf_out, int fast)
+{
+    if (fast)
+        return compress_mode(buf_in, buf_out, FAST_MAX_CHAIN, 0);
+    return compress_mode(buf_in, buf_out, BUFFER_SIZE, 1);
+}
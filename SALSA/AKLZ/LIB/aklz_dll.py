@@ -1,10 +1,15 @@
 from __future__ import annotations
 
 import os
+import sys
 import ctypes
 from typing import Union
 
 aklz_lib = 'AKLZ.dll'
+aklz_so = 'libaklz.so'
+aklz_dylib = 'libaklz.dylib'
+
+_lib = None
 
 
 class BufWSize(ctypes.Structure):
@@ -16,30 +21,89 @@ class BufWSize(ctypes.Structure):
 # ################ #
 
 
+def get_lib_name():
+    if os.name == 'nt':
+        return aklz_lib
+    if sys.platform == 'darwin':
+        return aklz_dylib
+    return aklz_so
+
+
 def get_dll_path():
-    dll_path = os.path.join(os.path.dirname(os.path.realpath(__file__)), aklz_lib)
+    dll_path = os.path.join(os.path.dirname(os.path.realpath(__file__)), get_lib_name())
     if not os.path.exists(dll_path):
         return ''
     return dll_path
 
 
+def _load_lib():
+    """Loads the native library once and declares its functions"""
+    global _lib
+    if _lib is not None:
+        return _lib
+    dll_path = get_dll_path()
+    if dll_path == '':
+        raise FileExistsError(os.path.join(os.path.dirname(os.path.realpath(__file__)), get_lib_name()) + ' does not exist')
+    dll = ctypes.cdll.LoadLibrary(dll_path)
+
+    dll.is_compressed.argtypes = (ctypes.POINTER(ctypes.c_char),)
+    dll.is_compressed.restype = ctypes.c_int
+
+    dll.decompress.argtypes = ctypes.c_void_p, ctypes.c_void_p
+    dll.decompress.restype = ctypes.c_int
+
+    dll.compress.argtypes = ctypes.c_void_p, ctypes.c_void_p
+    dll.compress.restype = ctypes.c_int
+
+    # Only the library built from aklz.c has these
+    if hasattr(dll, 'compress_with_mode'):
+        dll.compress_with_mode.argtypes = ctypes.c_void_p, ctypes.c_void_p, ctypes.c_int
+        dll.compress_with_mode.restype = ctypes.c_int
+    if hasattr(dll, 'free_buffer'):
+        dll.free_buffer.argtypes = (ctypes.POINTER(ctypes.c_char),)
+        dll.free_buffer.restype = None
+
+    _lib = dll
+    return _lib
+
+
+def is_available():
+    try:
+        _load_lib()
+    except OSError:
+        return False
+    return True
+
+
+def _make_buf_in(buffer_in):
+    p = ctypes.c_char_p(bytes(buffer_in))
+    p2 = ctypes.cast(p, ctypes.POINTER(ctypes.c_char))
+    # p is returned so the input bytes stay alive while the library reads them
+    return BufWSize(len(buffer_in), p2), p
+
+
+def _read_buf_out(dll, buf_out):
+    if not buf_out.buffer:
+        return bytearray()
+    result = bytearray(ctypes.string_at(buf_out.buffer, size=buf_out.size))
+    if hasattr(dll, 'free_buffer'):
+        dll.free_buffer(buf_out.buffer)
+    return result
+
+
 # ----------------- #
 # Compression Check #
 # ----------------- #
 
 def is_compressed(buffer_in: bytearray):
-    dll_path = os.path.join(os.path.dirname(os.path.realpath(__file__)), aklz_lib)
-    if not os.path.exists(dll_path):
-        raise FileExistsError(dll_path + ' does not exist')
-    dll = ctypes.cdll.LoadLibrary(dll_path)
-
-    IsCompressed = dll.is_compressed
-    IsCompressed.argtypes = (ctypes.POINTER(ctypes.c_char),)
-    IsCompressed.restype = ctypes.c_int
+    dll = _load_lib()
+    # The library reads the full signature without a length check
+    if len(buffer_in) < 12:
+        return False
 
     p = ctypes.c_char_p(bytes(buffer_in))
     p2 = ctypes.cast(p, ctypes.POINTER(ctypes.c_char))
-    result = IsCompressed(p2)
+    result = dll.is_compressed(p2)
     return result == 0
 
 
@@ -75,32 +139,28 @@ def _file_decompress(source: Union[bytearray, str] = None, filepath_out: Union[N
 
 
 def _decompress(buffer_in):
-    dll_path = os.path.join(os.path.dirname(os.path.realpath(__file__)), aklz_lib)
-    if not os.path.exists(dll_path):
-        raise FileExistsError(dll_path + ' does not exist')
-    dll = ctypes.cdll.LoadLibrary(dll_path)
+    dll = _load_lib()
 
-    Decompress = dll.decompress
-    Decompress.argtypes = ctypes.c_void_p, ctypes.c_void_p
-    Decompress.restype = ctypes.c_int
+    # Input without the AKLZ signature is returned unchanged, as aklz_py.decompress does
+    if not is_compressed(buffer_in):
+        return bytearray(buffer_in)
 
-    p = ctypes.c_char_p(bytes(buffer_in))
-    p2 = ctypes.cast(p, ctypes.POINTER(ctypes.c_char))
-    buf_in = BufWSize(len(buffer_in), p2)
+    buf_in, _ = _make_buf_in(buffer_in)
     buf_out = BufWSize()
-    result = Decompress(ctypes.addressof(buf_in), ctypes.addressof(buf_out))
+    result = dll.decompress(ctypes.addressof(buf_in), ctypes.addressof(buf_out))
+    if result == 2:
+        raise MemoryError('Unable to allocate the AKLZ output buffer')
     if result != 0:
-        print("Decompressed failed")
-    decompressed = bytearray(ctypes.string_at(buf_out.buffer, size=buf_out.size))
-    return decompressed
+        raise IndexError('AKLZ stream ended partway through a block')
+    return _read_buf_out(dll, buf_out)
 
 # ---------------- #
 # Compress Methods #
 # ---------------- #
 
 
-def compress(buffer_in: bytearray):
-    return _compress(buffer_in)
+def compress(buffer_in: bytearray, mode='best'):
+    return _compress(buffer_in, mode)
 
 
 def compress_from_file(filepath_in) -> bytearray:
@@ -127,20 +187,15 @@ def _file_compress(source: Union[bytearray, str] = None, filepath_out: Union[Non
         file_h.write(bytes(result))
 
 
-def _compress(buffer_in):
-    dll_path = os.path.join(os.path.dirname(os.path.realpath(__file__)), aklz_lib)
-    dll = ctypes.cdll.LoadLibrary(dll_path)
+def _compress(buffer_in, mode='best'):
+    dll = _load_lib()
 
-    Compress = dll.compress
-    Compress.argtypes = ctypes.c_void_p, ctypes.c_void_p
-    Compress.restype = ctypes.c_int
-
-    p = ctypes.c_char_p(bytes(buffer_in))
-    p2 = ctypes.cast(p, ctypes.POINTER(ctypes.c_char))
-    buf_in = BufWSize(len(buffer_in), p2)
+    buf_in, _ = _make_buf_in(buffer_in)
     buf_out = BufWSize()
-    result = Compress(ctypes.addressof(buf_in), ctypes.addressof(buf_out))
+    if hasattr(dll, 'compress_with_mode'):
+        result = dll.compress_with_mode(ctypes.addressof(buf_in), ctypes.addressof(buf_out), int(mode == 'fast'))
+    else:
+        result = dll.compress(ctypes.addressof(buf_in), ctypes.addressof(buf_out))
     if result != 0:
         print("Compression failed")
-    compressed = bytearray(ctypes.string_at(buf_out.buffer, size=buf_out.size))
-    return compressed
\ No newline at end of file
+    return _read_buf_out(dll, buf_out)
@@ -1,238 +1,390 @@
 import os.path
-from typing import List, Literal
+from typing import Iterator, Literal, Tuple, Union
 
 
 _MATCH_BEG: int = 3
 _MATCH_SIZE: int = 15
 _BUFFER_SIZE: int = 4096
-_DICT_SIZE: int = 256
 _FILE_SIGNATURE: bytearray = bytearray(b'AKLZ~?Qd=\xcc\xcc\xcd')
 _ENDIAN: Literal['big', 'little'] = 'big'
+_MAX_MATCH_LEN: int = _MATCH_BEG + _MATCH_SIZE
+_WINDOW_MASK: int = _BUFFER_SIZE - 1
 
+# Match finder settings for each compression mode: (maximum chain length, use lazy matching)
+_COMPRESS_MODES = {
+    'fast': (16, False),
+    'best': (_BUFFER_SIZE, True),
+}
 
-def decompress(file_in: bytearray) -> bytearray:
 
-    file_in_ptr = 0
-    file_sig = file_in[file_in_ptr:file_in_ptr + 12]
-    file_in_ptr += 12
+def decompress(file_in: bytearray) -> bytearray:
+    src = bytes(file_in)
 
-    if not file_sig == _FILE_SIGNATURE:
+    if not src[:12] == _FILE_SIGNATURE:
         return bytearray(file_in)
 
-    file_in_size = len(file_in)
-    file_out_size = int.from_bytes(bytes=file_in[file_in_ptr:file_in_ptr + 4], byteorder=_ENDIAN)
+    file_in_ptr = 12
+    file_in_size = len(src)
+    file_out_size = int.from_bytes(bytes=src[file_in_ptr:file_in_ptr + 4], byteorder=_ENDIAN)
     file_in_ptr += 4
     cur_out_size = 0
-    file_out = bytearray(b'\x00' * file_out_size)
+    file_out = bytearray()
 
-    # loop_counter = 0
     while file_in_ptr < file_in_size and cur_out_size < file_out_size:
-        # loop_counter += 1
-        # if loop_counter % 100 == 0:
-        #     print(f'Loop: {loop_counter} - Bytes read: {file_in_ptr}')
-
-        flag_byte = file_in[file_in_ptr]
+        flag_byte = src[file_in_ptr]
         file_in_ptr += 1
 
-        for i in range(8):
-            flag: bool = not (flag_byte & 1) == 0
-            flag_byte >>= 1
+        # A full literal group can be copied as one slice
+        if flag_byte == 0xFF and file_in_ptr < file_in_size:
+            num_literals = min(8, file_out_size - cur_out_size, file_in_size - file_in_ptr)
+            file_out += src[file_in_ptr:file_in_ptr + num_literals]
+            file_in_ptr += num_literals
+            cur_out_size += num_literals
+            continue
 
-            if flag:
-                file_out[cur_out_size] = file_in[file_in_ptr]
+        for i in range(8):
+            if flag_byte & 1:
+                file_out.append(src[file_in_ptr])
                 file_in_ptr += 1
                 cur_out_size += 1
 
             else:
-                raw_match_pos1 = file_in[file_in_ptr]
-                raw_match_pos2 = (file_in[file_in_ptr + 1] & 0xF0) << 4
-                raw_match_pos = (raw_match_pos1 | raw_match_pos2) + 18  # rename raw_match_pos
-                match_len = (file_in[file_in_ptr + 1] & _MATCH_SIZE) + _MATCH_BEG
+                match_byte2 = src[file_in_ptr + 1]
+                raw_match_pos = (src[file_in_ptr] | ((match_byte2 & 0xF0) << 4)) + 18
+                match_len = min((match_byte2 & _MATCH_SIZE) + _MATCH_BEG, file_out_size - cur_out_size)
                 file_in_ptr += 2
-                match_loc = raw_match_pos
-                num8 = int(cur_out_size / _BUFFER_SIZE)
-
-                for j in range(num8):
-                    if raw_match_pos + j * _BUFFER_SIZE < cur_out_size:
-                        match_loc += _BUFFER_SIZE
-
-                if match_loc > cur_out_size:
-                    match_loc -= _BUFFER_SIZE
+                match_loc = _get_match_location(raw_match_pos, cur_out_size)
+                if match_loc + match_len > file_out_size:
+                    raise IndexError(f'AKLZ match at {match_loc} reads past the end of the output ({file_out_size})')
+                _copy_match(file_out, match_loc, match_len)
+                cur_out_size += match_len
 
-                for j in range(match_len):
-                    if match_loc < 0:
-                        file_out[cur_out_size] = 0
-                    else:
-                        file_out[cur_out_size] = file_out[match_loc]
-                    cur_out_size += 1
-                    if cur_out_size >= len(file_out):
-                        return file_out
-
-                    match_loc += 1
+            flag_byte >>= 1
 
             if file_in_ptr >= file_in_size or cur_out_size >= file_out_size:
                 break
 
-    if not len(file_out) == file_out_size:
-        print(f'Incorrect file size: expected {file_out_size}, got {len(file_out)}')
+    if cur_out_size < file_out_size:
+        file_out += bytes(file_out_size - cur_out_size)
 
     return file_out
 
 
-def compress(file_in: bytearray) -> bytearray:
+def _get_match_location(raw_match_pos: int, cur_out_size: int) -> int:
+    """Resolves a 12-bit ring buffer position to an absolute position in the output"""
+    num_windows = 0
+    if cur_out_size > raw_match_pos:
+        num_windows = min(cur_out_size // _BUFFER_SIZE, (cur_out_size - raw_match_pos + _BUFFER_SIZE - 1) // _BUFFER_SIZE)
+    match_loc = raw_match_pos + num_windows * _BUFFER_SIZE
+    if match_loc > cur_out_size:
+        match_loc -= _BUFFER_SIZE
+    return match_loc
 
-    if file_in[:len(_FILE_SIGNATURE)] == _FILE_SIGNATURE:
-        return file_in
 
-    file_size = len(file_in)  # rename file_in_size
-    file_out = bytearray(b'')
-    array = bytearray(file_in)
-    lzWindowDictionary = LzWindowDictionary()
-    lzWindowDictionary.SetWindowSize(4096)
-    lzWindowDictionary.SetMaxMatchAmount(18)
-    file_out += _FILE_SIGNATURE
-    file_out_size = bytearray(file_size.to_bytes(length=4, byteorder=_ENDIAN))
-    file_out += file_out_size
+def _copy_match(file_out: bytearray, match_loc: int, match_len: int):
+    """Appends a back-reference to the output. Positions before the start or past the end of the output read as 0"""
+    if match_loc < 0:
+        num_zeros = min(-match_loc, match_len)
+        file_out += bytes(num_zeros)
+        match_len -= num_zeros
+        match_loc = 0
+    if match_len <= 0:
+        return
 
-    mirror_hex_array = [hex(file_out[i]) for i in range(len(file_out))]
+    cur_out_size = len(file_out)
+    if match_loc >= cur_out_size:
+        file_out += bytes(match_len)
+    elif match_loc + match_len <= cur_out_size:
+        file_out += file_out[match_loc:match_loc + match_len]
+    else:
+        # Overlapping matches repeat the bytes between the match location and the end of the output
+        pattern = file_out[match_loc:cur_out_size]
+        file_out += (pattern * (match_len // len(pattern) + 1))[:match_len]
 
-    # loop_counter = 0
-    cur_byte = 0
 
-    while cur_byte < file_size:
-        # loop_counter += 1
-        # if loop_counter % 13 == 0:
-        #     print(f'Loop: {loop_counter} - Bytes read: {num2}')
+class AklzDecompressor:
+    """Decompresses an AKLZ stream incrementally as input chunks are fed to it.
 
-        flag_byte = 0
-        cur_bytes: bytearray = bytearray(b'')
+    Decoded output is returned as soon as it is available and only the last window of output
+    is kept for back-references. Input which is not AKLZ compressed is passed through unchanged."""
 
-        for i in range(8):
-            array2 = lzWindowDictionary.Search(array, cur_byte, file_size)
-            if array2[1] > 0:
-                num5: int = array2[1] - 3
-                num6: int = array2[0] - 18
-                value: bytes = (num6 & 0xFF).to_bytes(length=1, byteorder=_ENDIAN)
-                value2: bytes = (num5 | ((num6 & 0xF00) >> 4)).to_bytes(length=1, byteorder=_ENDIAN)
-                cur_bytes += value
-                cur_bytes += value2
-                lzWindowDictionary.AddEntryRange(array, cur_byte, array2[1])
-                lzWindowDictionary.SlideWindow(array2[1])
-                cur_byte += array2[1]
-                # num3 += 2
-            else:
-                flag_byte = (flag_byte | (1 << i))
-                cur_bytes += array[cur_byte].to_bytes(length=1, byteorder=_ENDIAN)
-                lzWindowDictionary.AddEntry(array, cur_byte)
-                lzWindowDictionary.SlideWindow(1)
-                cur_byte += 1
+    _CHUNK_SIZE: int = 0x4000
 
-            if cur_byte >= file_size:
-                break
+    def __init__(self):
+        self.is_compressed: Union[None, bool] = None
+        self.file_out_size = 0
+        self.cur_out_size = 0
+        self.finished = False
+        self._in = bytearray()
+        self._window = bytearray()
+        self._flag_byte = 0
+        self._flag_bits = 0
+
+    @property
+    def progress(self) -> float:
+        """Fraction of the output which has been decoded"""
+        if self.finished:
+            return 1.0
+        if not self.is_compressed or self.file_out_size == 0:
+            return 0.0
+        return self.cur_out_size / self.file_out_size
+
+    def iter_decompress(self, source, chunk_size: int = _CHUNK_SIZE) -> Iterator[bytes]:
+        """Yields decompressed chunks read from a file handle, mmap, or bytes-like object"""
+        if hasattr(source, 'read'):
+            chunks = iter(lambda: source.read(chunk_size), b'')
+        else:
+            view = memoryview(source)
+            chunks = (view[i:i + chunk_size] for i in range(0, len(view), chunk_size))
+        for chunk in chunks:
+            out = self.feed(chunk)
+            if len(out) > 0:
+                yield out
+            if self.finished:
+                return
+        out = self.flush()
+        if len(out) > 0:
+            yield out
+
+    def feed(self, chunk) -> bytes:
+        """Adds a chunk of input and returns any output which can now be decoded"""
+        if self.finished:
+            return b''
+        self._in += chunk
+
+        if self.is_compressed is None:
+            if len(self._in) < 16:
+                return b''
+            self._read_header()
+
+        if not self.is_compressed:
+            out = bytes(self._in)
+            self._in.clear()
+            return out
+
+        return self._decode()
+
+    def flush(self) -> bytes:
+        """Signals the end of the input and returns the rest of the output"""
+        if self.finished:
+            return b''
+        if self.is_compressed is None:
+            self._read_header()
+            if not self.is_compressed:
+                self.finished = True
+                return bytes(self._in)
+        if not self.is_compressed:
+            self.finished = True
+            return b''
+
+        out = self._decode()
+        # The input ended right after a flag byte or partway through a back-reference
+        if self.cur_out_size < self.file_out_size and (self._flag_bits == 8 or
+                                                        (self._flag_bits > 0 and not self._flag_byte & 1 and len(self._in) > 0)):
+            raise IndexError('AKLZ stream ended partway through a block')
+        if self.cur_out_size < self.file_out_size:
+            out += bytes(self.file_out_size - self.cur_out_size)
+            self.cur_out_size = self.file_out_size
+        self.finished = True
+        return out
+
+    def _read_header(self):
+        self.is_compressed = self._in[:12] == _FILE_SIGNATURE
+        if self.is_compressed:
+            self.file_out_size = int.from_bytes(bytes=self._in[12:16], byteorder=_ENDIAN)
+            del self._in[:16]
+
+    def _decode(self) -> bytes:
+        src = self._in
+        file_in_size = len(src)
+        file_in_ptr = 0
+        file_out_size = self.file_out_size
+        cur_out_size = self.cur_out_size
+        window = self._window
+        window_start = len(window)
+        window_base = cur_out_size - window_start
+        flag_byte = self._flag_byte
+        flag_bits = self._flag_bits
+
+        while cur_out_size < file_out_size:
+            if flag_bits == 0:
+                if file_in_ptr >= file_in_size:
+                    break
+                flag_byte = src[file_in_ptr]
+                file_in_ptr += 1
+                flag_bits = 8
 
-        file_out += flag_byte.to_bytes(length=1, byteorder=_ENDIAN)
-        file_out += cur_bytes
-        mirror_hex_array.append(hex(flag_byte))
-        for byte in cur_bytes:
-            mirror_hex_array.append(hex(byte))
+            if flag_byte & 1:
+                if file_in_ptr >= file_in_size:
+                    break
+                window.append(src[file_in_ptr])
+                file_in_ptr += 1
+                cur_out_size += 1
 
-    return file_out
+            else:
+                if file_in_ptr + 1 >= file_in_size:
+                    break
+                match_byte2 = src[file_in_ptr + 1]
+                raw_match_pos = (src[file_in_ptr] | ((match_byte2 & 0xF0) << 4)) + 18
+                match_len = min((match_byte2 & _MATCH_SIZE) + _MATCH_BEG, file_out_size - cur_out_size)
+                file_in_ptr += 2
+                match_loc = _get_match_location(raw_match_pos, cur_out_size)
+                if match_loc + match_len > file_out_size:
+                    raise IndexError(f'AKLZ match at {match_loc} reads past the end of the output ({file_out_size})')
+                _copy_match(window, match_loc - window_base, match_len)
+                cur_out_size += match_len
 
+            flag_byte >>= 1
+            flag_bits -= 1
 
-def is_compressed(file_in: bytearray) -> bool:
-    return file_in[:len(_FILE_SIGNATURE)] == _FILE_SIGNATURE
+        del src[:file_in_ptr]
+        self._flag_byte = flag_byte
+        self._flag_bits = flag_bits
+        self.cur_out_size = cur_out_size
+        if cur_out_size >= file_out_size:
+            self.finished = True
 
+        out = bytes(window[window_start:])
+        if len(window) > _BUFFER_SIZE:
+            del window[:len(window) - _BUFFER_SIZE]
+        return out
 
-class LzWindowDictionary:
-    _max_window_length: int = 4096
-    _window_start: int = -18
-    _cur_window_length: int = 15
-    _min_match_length: int = 3
-    _max_match_length: int = 18
-    _BlockSize: int = 0
-    _offset_lists: List[List[int]]
-    _DictionarySize: int = 256
-    _WindowLengthIsSet = False
 
-    def __init__(self):
-        self._offset_lists = [[] for _ in range(self._DictionarySize)]
-        self._cur_window_length -= self._window_start
-        for i in range(self._window_start, 0):
-            self._offset_lists[0].append(i)
+def compress(file_in: bytearray, mode: Literal['fast', 'best'] = 'best') -> bytearray:
 
-    def Search(self, decomp_data: bytearray, cur_pos: int, file_length: int) -> List[int]:
-        self.RemoveOldEntries(decomp_data[cur_pos])
+    if file_in[:len(_FILE_SIGNATURE)] == _FILE_SIGNATURE:
+        return file_in
 
-        finished = file_length - cur_pos < self._min_match_length
+    if mode not in _COMPRESS_MODES:
+        raise ValueError(f'Unknown AKLZ compression mode: {mode}')
+    max_chain, lazy = _COMPRESS_MODES[mode]
 
-        if finished:  # removed pt1 to allow for negative zero seeding
-            return [0, 0]
-        best_match: List[int] = [0, 0]
+    file_size = len(file_in)
+    file_out = bytearray(_FILE_SIGNATURE)
+    file_out += file_size.to_bytes(length=4, byteorder=_ENDIAN)
+    match_finder = HashChainMatchFinder(file_in, max_chain=max_chain)
+    data = match_finder.data
+    offset = match_finder.offset
 
-        for match_start in reversed(self._offset_lists[decomp_data[cur_pos]]):
-            new_len: int = 1
-            while new_len < self._max_match_length:
-                if new_len >= self._cur_window_length:
-                    break
-                if cur_pos + new_len >= file_length:
-                    break
-                if match_start + new_len > cur_pos:
-                    if decomp_data[match_start + new_len] not in [0, decomp_data[cur_pos + new_len]]:
-                        break
-                if match_start + new_len >= 0:
-                    if decomp_data[cur_pos + new_len] != decomp_data[match_start + new_len]:
-                        break
-                else:
-                    if decomp_data[cur_pos + new_len] != 0:
-                        break
+    cur_byte = 0
+    next_match = None
+    while cur_byte < file_size:
+        flag_ptr = len(file_out)
+        file_out.append(0)
+        flag_byte = 0
 
-                new_len += 1
+        for i in range(8):
+            if next_match is None:
+                match_start, match_len = match_finder.find(cur_byte)
+            else:
+                match_start, match_len = next_match
+                next_match = None
+
+            # Emit a literal instead if the next byte starts a longer match
+            if lazy and 0 < match_len < _MAX_MATCH_LEN and cur_byte + 1 < file_size:
+                match_finder.insert(cur_byte)
+                next_match = match_finder.find(cur_byte + 1)
+                if next_match[1] > match_len:
+                    match_len = 0
+                else:
+                    next_match = None
+                    match_finder.insert_range(cur_byte + 1, match_len - 1)
+            elif match_len > 0:
+                match_finder.insert_range(cur_byte, match_len)
+            else:
+                match_finder.insert(cur_byte)
 
-            if new_len >= self._min_match_length and new_len >= best_match[1]:
-                if best_match[0] < 0 and match_start < -1 and new_len == best_match[1]:
-                    continue
-                best_match = [match_start, new_len]
-                if new_len == self._max_match_length:
-                    break
-        return best_match
+            if match_len > 0:
+                pos = match_start - 18
+                file_out.append(pos & 0xFF)
+                file_out.append((match_len - _MATCH_BEG) | ((pos & 0xF00) >> 4))
+                cur_byte += match_len
+            else:
+                flag_byte |= 1 << i
+                file_out.append(data[cur_byte + offset])
+                cur_byte += 1
 
-    def SlideWindow(self, amount: int):
-        if self._cur_window_length == self._max_window_length:
-            self._window_start += amount
-            return
+            if cur_byte >= file_size:
+                break
 
-        if self._cur_window_length + amount <= self._max_window_length:
-            self._cur_window_length += amount
-            return
+        file_out[flag_ptr] = flag_byte
 
-        amount -= self._max_window_length - self._cur_window_length
-        self._cur_window_length = self._max_window_length
-        self._window_start += amount
+    return file_out
 
-    def SlideBlock(self):
-        self._window_start += self._BlockSize
 
-    def RemoveOldEntries(self, index: int):
-        num: int = 0
-        while num < len(self._offset_lists[index]) and self._offset_lists[index][num] < self._window_start:
-            self._offset_lists[index].pop(0)
+def is_compressed(file_in: bytearray) -> bool:
+    return file_in[:len(_FILE_SIGNATURE)] == _FILE_SIGNATURE
 
-    def SetWindowSize(self, size: int):
-        self._max_window_length = size
 
-    def SetMinMatchAmount(self, amount: int):
-        self._min_match_length = amount
+class HashChainMatchFinder:
+    """Finds back-references using chains of prior positions keyed on a 3-byte hash.
 
-    def SetMaxMatchAmount(self, amount: int):
-        self._max_match_length = amount
+    Positions before the start of the data read as 0, matching the decompressor, so the data is
+    prefixed with zero bytes that may be referenced like any other position. The chain links are
+    kept in a ring index the size of the window, so they never need to be pruned."""
 
-    def SetBlockSize(self, size: int):
-        self._BlockSize = size
-        self._cur_window_length = size
+    def __init__(self, data: bytearray, max_chain: int = _BUFFER_SIZE):
+        self.offset = 18
+        self.data = bytes(self.offset) + bytes(data)
+        self.max_chain = max_chain
+        self._heads = {}
+        self._links = [-1] * _BUFFER_SIZE
+        self._inserted = 0
+        self._insert_to(self.offset)
 
-    def AddEntry(self, DecompressedData: bytearray, offset: int):
-        self._offset_lists[DecompressedData[offset]].append(offset)
+    def _hash(self, pos: int) -> int:
+        return (self.data[pos] << 16) | (self.data[pos + 1] << 8) | self.data[pos + 2]
 
-    def AddEntryRange(self, DecompressedData: bytearray, offset: int, length: int):
-        for i in range(length):
-            self.AddEntry(DecompressedData, offset + i)
+    def _insert_to(self, end: int):
+        """Adds each position up to end to its hash chain"""
+        end = min(end, len(self.data) - 2)
+        if self._inserted >= end:
+            return
+        data = self.data
+        heads = self._heads
+        links = self._links
+        pos = self._inserted
+        key = ((data[pos] << 8) | data[pos + 1])
+        while pos < end:
+            key = ((key << 8) | data[pos + 2]) & 0xFFFFFF
+            links[pos & _WINDOW_MASK] = heads.get(key, -1)
+            heads[key] = pos
+            pos += 1
+        self._inserted = end
+
+    def insert(self, cur_pos: int):
+        self._insert_to(cur_pos + self.offset + 1)
+
+    def insert_range(self, cur_pos: int, length: int):
+        self._insert_to(cur_pos + self.offset + length)
+
+    def find(self, cur_pos: int) -> Tuple[int, int]:
+        """Returns the start and length of the longest match for cur_pos, or (0, 0) if there is none"""
+        data = self.data
+        pos = cur_pos + self.offset
+        max_len = min(_MAX_MATCH_LEN, len(data) - pos)
+        if max_len < _MATCH_BEG:
+            return 0, 0
+        self._insert_to(pos)
+
+        best_start = 0
+        best_len = 0
+        min_pos = max(pos - _BUFFER_SIZE + 1, 0)
+        candidate = self._heads.get(self._hash(pos), -1)
+        chain = self.max_chain
+        while candidate >= min_pos and chain > 0:
+            chain -= 1
+            if data[candidate + best_len] == data[pos + best_len]:
+                if data[candidate:candidate + max_len] == data[pos:pos + max_len]:
+                    return candidate - self.offset, max_len
+                length = _MATCH_BEG
+                while length < max_len and data[candidate + length] == data[pos + length]:
+                    length += 1
+                if length > best_len:
+                    best_start = candidate
+                    best_len = length
+            candidate = self._links[candidate & _WINDOW_MASK]
+
+        if best_len < _MATCH_BEG:
+            return 0, 0
+        return best_start - self.offset, best_len
@@ -0,0 +1,30 @@
+"""Builds the native AKLZ library from aklz.c so that platforms without AKLZ.dll can use it.
+
+Run with: python -m SALSA.AKLZ.LIB.build_aklz
+"""
+import os
+import subprocess
+import sys
+import sysconfig
+
+from SALSA.AKLZ.LIB.aklz_dll import get_lib_name
+
+LIB_DIR = os.path.dirname(os.path.realpath(__file__))
+
+
+def build(compiler=None):
+    if compiler is None:
+        compiler = (sysconfig.get_config_var('CC') or 'cc').split()[0]
+    source = os.path.join(LIB_DIR, 'aklz.c')
+    target = os.path.join(LIB_DIR, get_lib_name())
+    cmd = [compiler, '-O2', '-shared', '-fPIC', '-o', target, source]
+    print(' '.join(cmd))
+    subprocess.run(cmd, check=True)
+    return target
+
+
+if __name__ == '__main__':
+    if os.name == 'nt':
+        print('AKLZ.dll is already provided for Windows')
+        sys.exit(0)
+    print(f'Built {build(*sys.argv[1:2])}')
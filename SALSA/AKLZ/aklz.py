@@ -2,6 +2,7 @@ from __future__ import annotations
 
 import sys
 import os
+from functools import partial
 
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 sys.path.append(os.path.dirname(SCRIPT_DIR))
@@ -14,16 +15,17 @@ aklz_slow = False
 
 
 class Aklz:
-    def __init__(self, use_slow=False):
+    def __init__(self, use_slow=False, mode='best'):
         self.use_slow = use_slow
-        if os.name != 'nt' or use_slow or aklz_slow:
+        self.is_native = not (use_slow or aklz_slow) and aklz_dll.is_available()
+        if not self.is_native:
             self._decompress = aklz_py.decompress
-            self._compress = aklz_py.compress
+            self._compress = partial(aklz_py.compress, mode=mode)
             self._is_compressed = aklz_py.is_compressed
 
         else:
             self._decompress = aklz_dll.decompress
-            self._compress = aklz_dll.compress
+            self._compress = partial(aklz_dll.compress, mode=mode)
             self._is_compressed = aklz_dll.is_compressed
 
     @classmethod
@@ -32,8 +34,26 @@ class Aklz:
         return a._decompress(buffer_in)
 
     @classmethod
-    def compress(cls, buffer_in: bytearray, use_slow=False):
+    def decompress_from_file(cls, file_h, progress_callback=None, use_slow=False) -> bytearray:
+        """Decompresses a file handle or mmap. The python implementation decodes the file as it is read
+        and passes the fraction complete to progress_callback"""
         a = cls(use_slow)
+        if a.is_native:
+            buffer_in = bytearray(file_h.read() if hasattr(file_h, 'read') else file_h)
+            return a._decompress(buffer_in)
+
+        decompressor = aklz_py.AklzDecompressor()
+        file_out = bytearray()
+        for chunk in decompressor.iter_decompress(file_h):
+            file_out += chunk
+            if progress_callback is not None:
+                progress_callback(decompressor.progress)
+        return file_out
+
+    @classmethod
+    def compress(cls, buffer_in: bytearray, use_slow=False, mode='best'):
+        """Mode is either 'fast' or 'best'. AKLZ.dll only has a single mode"""
+        a = cls(use_slow, mode)
         return a._compress(buffer_in)
 
     @classmethod
@@ -60,7 +80,7 @@ if __name__ == '__main__':
     file_dc = bytearray()
     file_dcd = bytearray()
 
-    if os.name == 'nt':
+    if aklz_dll.is_available():
         print('Testing python implementations')
 
         print('Checking for compression')
@@ -92,10 +112,10 @@ if __name__ == '__main__':
             print(
                 'File was not successfully decompressed, recompressed and decompressed again, Please check for errors')
 
-        print('\nTesting dll implementation')
+        print('\nTesting native implementation')
 
     else:
-        print('No dll implementation available, testing python implementation')
+        print('No native implementation available, testing python implementation')
 
     print('Decompressing')
     file_d = Aklz.decompress(buffer_in=file)
@@ -120,4 +140,11 @@ if __name__ == '__main__':
     if decomp_same:
         print('File successfully decompressed, recompressed, and decompressed again.')
     else:
-        print('File was not successfully decompressed, recompressed and decompressed again, Please check for errors')
\ No newline at end of file
+        print('File was not successfully decompressed, recompressed and decompressed again, Please check for errors')
+
+    if aklz_dll.is_available():
+        print('\nComparing native and python implementations')
+        if Aklz.decompress(buffer_in=file, use_slow=True) == file_d and aklz_py.decompress(file_dc) == file_d:
+            print('Native and python implementations produce the same output.')
+        else:
+            print('Native and python implementations differ, Please check for errors')
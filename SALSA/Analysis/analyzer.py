@@ -14,7 +14,8 @@ class SCTAnalyzer:
         'Ship_battles': KA.Ship_Battles
     }
 
-    temp_dir = 'E:\\temp'
+    # Directory for the differences too many to hold in memory, None uses the system temp directory
+    temp_dir = None
 
     def __init__(self, loc=None, verbose=False, temp_dir=None):
         if temp_dir is not None:
@@ -1,11 +1,11 @@
 from __future__ import annotations
 
-from typing import List, Optional
+from typing import List, Optional, Dict, Tuple, Set
 
 import enum
 
 from SALSA.BaseInstructions.bi_facade import BaseInstLibFacade
-from SALSA.Project.project_container import SCTProject, SCTSection, SCTScript
+from SALSA.Project.project_container import SCTProject, SCTSection, SCTScript, SCTLink
 
 
 class NodeType(enum.Enum):
@@ -26,19 +26,16 @@ class LinkNode:
         self.content_type = _type
         self.content_str = _str
         self.children = []
+        self._children_by_str: Dict[str, LinkNode] = {}
         self.content_display = None
         self.link_trace = None
 
     def find_child(self, content_str):
-        if self.children is None:
-            return None
-        for child in self.children:
-            if child.content_str == content_str:
-                return child
-        return None
+        return self._children_by_str.get(content_str, None)
 
     def add_child(self, child: LinkNode):
         self.children.append(child)
+        self._children_by_str.setdefault(child.content_str, child)
 
     def __repr__(self):
         if self.content_display:
@@ -71,41 +68,149 @@ class LinkNode:
         return rows
 
 
+class LinkGraph:
+    """Links between the sections of a script, by the section they leave and by the section they go to. Links are
+    kept as the project's link objects, so instruction targets within a section are always current"""
+
+    def __init__(self, script: SCTScript):
+        self.script = script
+        self.links_out: Dict[str, List[SCTLink]] = {}
+        self.links_in: Dict[str, List[SCTLink]] = {}
+        # The (origin, target) sections each link is kept under, by id of the link
+        self._link_sects: Dict[int, Tuple[str, str]] = {}
+        # Instruction positions and group parents, by section name
+        self._sect_paths: Dict[str, Tuple[Dict[str, int], Dict[str, tuple]]] = {}
+        for sect in script.sects.values():
+            for inst in sect.insts.values():
+                for link in inst.links_out:
+                    self.add_link(link)
+
+    def add_link(self, link: SCTLink):
+        if link.target_trace is None or link.type in ('String', 'Footer') or id(link) in self._link_sects:
+            return
+        origin_sect = link.origin_trace[0]
+        target_sect = link.target_trace[0]
+        self.links_out.setdefault(origin_sect, []).append(link)
+        self.links_in.setdefault(target_sect, []).append(link)
+        self._link_sects[id(link)] = (origin_sect, target_sect)
+
+    def remove_link(self, link: SCTLink):
+        sects = self._link_sects.pop(id(link), None)
+        if sects is None:
+            return
+        self._remove_from(self.links_out, sects[0], link)
+        self._remove_from(self.links_in, sects[1], link)
+
+    def update_link(self, link: SCTLink):
+        """Moves a link whose origin or target has changed"""
+        self.remove_link(link)
+        self.add_link(link)
+
+    @staticmethod
+    def _remove_from(links: Dict[str, List[SCTLink]], sect, link):
+        # Links are compared by value, so the link itself is found by identity
+        sect_links = links.get(sect, [])
+        for i, sect_link in enumerate(sect_links):
+            if sect_link is link:
+                sect_links.pop(i)
+                break
+        if len(sect_links) == 0:
+            links.pop(sect, None)
+
+    def refresh_section(self, sect_name):
+        """Finds the links out of a section and the positions of its instructions again"""
+        self._sect_paths.pop(sect_name, None)
+        for link in list(self.links_out.get(sect_name, [])):
+            self.remove_link(link)
+        sect = self.script.sects.get(sect_name, None)
+        if sect is None:
+            return
+        for inst in sect.insts.values():
+            for link in inst.links_out:
+                self.add_link(link)
+
+    def get_links_in(self, sect_name, inst_id=None) -> List[SCTLink]:
+        links = self.links_in.get(sect_name, [])
+        if inst_id is None:
+            return list(links)
+        return [link for link in links if link.target_trace[1] == inst_id]
+
+    def get_links_out(self, sect_name) -> List[SCTLink]:
+        return list(self.links_out.get(sect_name, []))
+
+    def get_sect_paths(self, sect: SCTSection):
+        """Returns the position of each instruction in a section and the (uuid, group type) of each group it is in"""
+        paths = self._sect_paths.get(sect.name, None)
+        if paths is None or len(paths[0]) != len(sect.inst_list):
+            positions = {inst_id: i for i, inst_id in enumerate(sect.inst_list)}
+            parents = {}
+            self._find_inst_parents(sect.inst_tree, (), parents)
+            self._sect_paths[sect.name] = (positions, parents)
+        return self._sect_paths[sect.name]
+
+    def _find_inst_parents(self, cur_tree, cur_parents, parents):
+        # Instructions are found in the same order as a depth first search of the tree would find them
+        if isinstance(cur_tree, dict):
+            return
+        for child in cur_tree:
+            if isinstance(child, str):
+                parents.setdefault(child, cur_parents)
+        for child in cur_tree:
+            if isinstance(child, str):
+                continue
+            dict_key = list(child.keys())[0]
+            parent_id, group_type = dict_key.split('|')
+            self._find_inst_parents(child[dict_key], (*cur_parents, (parent_id, group_type)), parents)
+
+    def get_callers(self, sect_name, transitive=False) -> Set[str]:
+        """Returns the other sections which link to a section, or every section that leads to it if transitive"""
+        return self._get_connected(sect_name, self.links_in, 0, transitive)
+
+    def get_callees(self, sect_name, transitive=False) -> Set[str]:
+        """Returns the other sections a section links to, or every section it leads to if transitive"""
+        return self._get_connected(sect_name, self.links_out, 1, transitive)
+
+    @staticmethod
+    def _get_connected(sect_name, links, trace_ind, transitive):
+        found = set()
+        to_check = [sect_name]
+        while len(to_check) > 0:
+            cur_sect = to_check.pop()
+            for link in links.get(cur_sect, []):
+                next_sect = link.origin_trace[0] if trace_ind == 0 else link.target_trace[0]
+                if next_sect == sect_name or next_sect in found:
+                    continue
+                found.add(next_sect)
+                if transitive:
+                    to_check.append(next_sect)
+        return found
+
+
 class LinkFinder:
     links_in: LinkNode
     links_out: LinkNode
     target_sct: str
     target_sect: str
     base_insts: BaseInstLibFacade
-
+    link_graph: LinkGraph
 
     def get_inst_path_recursive(self, sect: SCTSection, target_inst, cur_tree=None):
-        if cur_tree is None:
-            cur_tree = sect.inst_tree
-
-        if target_inst in cur_tree:
-            target_inst_idx = sect.inst_list.index(target_inst)
-            return [(NodeType.link, target_inst, (sect.name, target_inst),
-                              f'{target_inst_idx} - {self.base_insts.get_inst(sect.insts[target_inst].base_id).name}')]
-
-        for child in cur_tree:
-            if isinstance(child, str):
-                continue
-            dict_key = list(child.keys())[0]
-            result = self.get_inst_path_recursive(sect, target_inst, child[dict_key])
-            if result is None:
-                continue
-            parent_id, group_type = dict_key.split('|')
-            parent_index = sect.inst_list.index(parent_id)
-            return [(NodeType.group, parent_id, (sect.name, parent_id), f'{parent_index} - {group_type}'), *result]
+        positions, parents = self.link_graph.get_sect_paths(sect)
+        if target_inst not in parents:
+            return None
 
-        return None
+        path = [(NodeType.group, parent_id, (sect.name, parent_id), f'{positions[parent_id]} - {group_type}')
+                for parent_id, group_type in parents[target_inst]]
+        target_inst_name = self.base_insts.get_inst(sect.insts[target_inst].base_id).name
+        path.append((NodeType.link, target_inst, (sect.name, target_inst),
+                     f'{positions[target_inst]} - {target_inst_name}'))
+        return path
 
     def find_links_in(self, sct: SCTScript, sect_label_inst):
         root = LinkNode(NodeType.root, 'links_in')
         self.links_in = root
 
-        for link in sect_label_inst.links_in:
+        for link in self.link_graph.get_links_in(self.target_sect, sect_label_inst.ID):
             sect_name = link.origin_trace[0]
             sect_node = root.find_child(sect_name)
             if sect_node is None:
@@ -123,16 +228,10 @@ class LinkFinder:
                     inst_node.link_trace = spec[2]
                     inst_node.content_display = spec[3]
                     parent_node.add_child(inst_node)
-                    parent_node = inst_node
+                parent_node = inst_node
 
     def find_links_out(self, sct: SCTScript, sect: SCTSection):
-        all_links_out = []
-        for inst in sect.insts.values():
-            for link in inst.links_out:
-                if link.target_trace is None:
-                    continue
-                if link.target_trace[0] != sect.name:
-                    all_links_out.append(link)
+        all_links_out = [link for link in self.link_graph.get_links_out(sect.name) if link.target_trace[0] != sect.name]
 
         root = LinkNode(NodeType.root, 'links_out')
         self.links_out = root
@@ -149,22 +248,21 @@ class LinkFinder:
                     inst_node.link_trace = spec[2]
                     inst_node.content_display = spec[3]
                     parent_node.add_child(inst_node)
-                    parent_node = inst_node
+                parent_node = inst_node
             tgt_sect = link.target_trace[0]
             sect_node = parent_node.find_child(tgt_sect)
             if sect_node is None:
                 sect_node = LinkNode(NodeType.sect, tgt_sect)
                 parent_node.add_child(sect_node)
-            tgt_inst_idx = sct.sects[tgt_sect].inst_list.index(link.target_trace[1])
+            tgt_inst_idx = self.link_graph.get_sect_paths(sct.sects[tgt_sect])[0][link.target_trace[1]]
             tgt_node = LinkNode(NodeType.link, link.target_trace[1])
             tgt_inst_name = self.base_insts.get_inst(sct.sects[tgt_sect].insts[link.target_trace[1]].base_id).name
             tgt_node.content_display = f'{tgt_inst_idx} - {tgt_inst_name}'
             tgt_node.link_trace = link.target_trace
             sect_node.add_child(tgt_node)
 
-
     @classmethod
-    def find_links(cls, prj: SCTProject, sct, sect, base_insts: BaseInstLibFacade):
+    def find_links(cls, prj: SCTProject, sct, sect, base_insts: BaseInstLibFacade, link_graph: LinkGraph = None):
 
         if sct not in prj.scts:
             return None
@@ -180,6 +278,7 @@ class LinkFinder:
         lf.target_sect = sect
         lf.target_sct = sct
         lf.base_insts = base_insts
+        lf.link_graph = LinkGraph(target_sct) if link_graph is None else link_graph
 
         sect_label = target.insts[target.inst_list[0]]
         lf.find_links_in(target_sct, sect_label)
@@ -188,6 +287,12 @@ class LinkFinder:
 
         return lf
 
+    def get_callers(self, transitive=False):
+        return self.link_graph.get_callers(self.target_sect, transitive=transitive)
+
+    def get_callees(self, transitive=False):
+        return self.link_graph.get_callees(self.target_sect, transitive=transitive)
+
     def get_in_tree(self, full):
         return self.links_in.get_rows()
 
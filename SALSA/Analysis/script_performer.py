@@ -1,18 +1,109 @@
 import re
 import copy
-import json
 import math
 import multiprocessing as mp
 import os
+import pickle
 import shutil
 import sys
+import tempfile
+import zlib
+from collections import Counter
 from datetime import datetime
 from math import floor
-from typing import List, Dict
+from multiprocessing import shared_memory
+from typing import List, Dict, Tuple
 
 from SALSA.Common.console_progress_bar import printProgressBar
 
 
+class RAMState(dict):
+    """The RAM of a branch, an address to address details dict which is never changed in place.
+    Setting an address gives a new state sharing the details of every other address with this one,
+    so branches can hold the same state instead of copying it"""
+    __slots__ = ('items_by_path',)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.items_by_path = {}
+
+    def set_address(self, addr, details) -> 'RAMState':
+        new_state = RAMState(self)
+        dict.__setitem__(new_state, addr, details)
+        return new_state
+
+    def _read_only(self, *args, **kwargs):
+        raise TypeError('RAMState can not be changed in place, use set_address instead')
+
+    __setitem__ = __delitem__ = __ior__ = clear = pop = popitem = setdefault = update = _read_only
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __reduce__(self):
+        return RAMState, (dict(self),)
+
+
+class DifferenceSpool:
+    """The differences found at one level of a traceback group, kept in memory up to a threshold.
+    Past the threshold they are written to a spill file in the spill directory as zlib compressed pickled chunks,
+    and are read back a chunk at a time when iterated. Spools are merged in order, so the differences of a group
+    split between workers are iterated in the same order as if they had been found by one"""
+
+    def __init__(self, spill_dir, threshold):
+        self.spill_dir = spill_dir
+        self.threshold = threshold
+        self.items = []
+        self.spill_paths = []
+        self.spill_path = None
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def __iter__(self):
+        for path in self.spill_paths:
+            with open(path, 'rb') as file:
+                while True:
+                    try:
+                        chunk = pickle.load(file)
+                    except EOFError:
+                        break
+                    yield from pickle.loads(zlib.decompress(chunk))
+        yield from self.items
+
+    def append(self, difference):
+        self.items.append(difference)
+        self.size += 1
+        if len(self.items) >= self.threshold:
+            self._spill()
+
+    def extend(self, other: 'DifferenceSpool'):
+        if len(other.spill_paths) > 0:
+            self._spill()
+            self.spill_path = None
+            self.spill_paths.extend(other.spill_paths)
+        self.size += len(other.items)
+        self.items.extend(other.items)
+        if len(self.items) >= self.threshold:
+            self._spill()
+
+    def _spill(self):
+        if len(self.items) == 0:
+            return
+        if self.spill_path is None:
+            file_id, self.spill_path = tempfile.mkstemp(suffix=ScriptPerformer.temp_ext, dir=self.spill_dir)
+            os.close(file_id)
+            self.spill_paths.append(self.spill_path)
+        chunk = zlib.compress(pickle.dumps(self.items, protocol=pickle.HIGHEST_PROTOCOL))
+        with open(self.spill_path, 'ab') as file:
+            pickle.dump(chunk, file, protocol=pickle.HIGHEST_PROTOCOL)
+        self.items = []
+
+
 class ScriptPerformer:
     current_subscript = ''
     current_index = 0
@@ -35,6 +126,7 @@ class ScriptPerformer:
     max_chunks = 50
     results = []
     temp_ext = '.tmp'
+    diff_spill_threshold = 20000
     use_actions = True
 
     def __init__(self):
@@ -60,7 +152,29 @@ class ScriptPerformer:
 
         self.time = datetime.now()
 
-    def run(self, input_dict, inst_details, temp_dir, blacklist=None):
+        # The worker pool lasts for a run, and each stage publishes its branches to it once
+        self._pool = None
+        self._published_blocks = []
+        # Jump conditions are compiled once for each jumpif of the subscripts being run
+        self._compiled_conditions = {}
+
+    def __getstate__(self):
+        # Workers get their own performer, without the pool, the published branches, or the compiled conditions
+        state = self.__dict__.copy()
+        state['_pool'] = None
+        state['_published_blocks'] = []
+        state['_compiled_conditions'] = {}
+        return state
+
+    def run(self, input_dict, inst_details, temp_dir=None, blacklist=None):
+        try:
+            return self._run(input_dict, inst_details, temp_dir, blacklist)
+        finally:
+            self._release_published()
+            self._close_pool()
+
+    def _run(self, input_dict, inst_details, temp_dir, blacklist=None):
+        self._compiled_conditions = {}
         self.addrs = input_dict.get('addresses', {})
         temp_addrs = {}
         for key, value in self.addrs.items():
@@ -100,7 +214,7 @@ class ScriptPerformer:
                 branch_index = None
             else:
                 branch_index = 0
-                initial_ram = copy.deepcopy(self.new_opens[branch_index]['cur_ram'])
+                initial_ram = self.new_opens[branch_index]['cur_ram']
 
             iteration = 0
             with_mid = True
@@ -168,13 +282,13 @@ class ScriptPerformer:
                 for b in reversed(sorted(list(set(branches_to_transfer)))):
                     old_branch = self.new_opens.pop(b)
                     if 'init_ram' not in old_branch:
-                        old_branch['init_ram'] = {}
-                    old_branch['end_ram'] = copy.deepcopy(old_branch['cur_ram'])
+                        old_branch['init_ram'] = RAMState()
+                    old_branch['end_ram'] = old_branch['cur_ram']
                     self.new_closed.append(copy.deepcopy(old_branch))
                     if b not in ends:
                         new_branch = {'init_value': old_branch['out_value'],
-                                      'init_ram': copy.deepcopy(old_branch['cur_ram']),
-                                      'cur_ram': copy.deepcopy(old_branch['cur_ram']),
+                                      'init_ram': old_branch['cur_ram'],
+                                      'cur_ram': old_branch['cur_ram'],
                                       'actions': [], 'switch_states': [], 'jump_states': []}
                         all_open.append(new_branch)
 
@@ -183,94 +297,20 @@ class ScriptPerformer:
                 all_closed = [*all_closed, *self.new_closed]
                 self.new_closed = []
 
-                open_num = len(all_open)
-
                 branches_to_remove = []
                 for i, branch in enumerate(all_open):
                     if 'new_run' in branch.keys():
                         branches_to_remove.append(i)
 
                 # flag for removal identical open branches
-
-                should_parallel_open = ((open_num * open_num) / 2) > self.chunk_compare_num
-                if self.use_multiprocessing and should_parallel_open:
-                    print('Preparing Workers to flag identical open branches...')
-                    segments = []
-                    branch_num_for_chunk_calc = len(all_open)
-                    branch_num_for_index_calc = branch_num_for_chunk_calc - 1
-                    branch_num_sq = branch_num_for_chunk_calc * branch_num_for_chunk_calc
-                    compare_num = branch_num_sq / 2
-                    chunks = floor(compare_num / self.chunk_compare_num) + 1
-                    cpus = min(chunks, mp.cpu_count())
-                    compares_per_chunk = floor(compare_num / cpus)
-                    last_index = -1
-                    is_last_segment = False
-                    for i in range(cpus):
-                        first_index = last_index + 1
-                        quadratic_sqrt = math.sqrt((branch_num_for_index_calc * branch_num_for_index_calc) - (
-                                4 * (-1 / 2) * compares_per_chunk))
-                        numerator = abs((branch_num_for_index_calc * -1) + quadratic_sqrt)
-                        if numerator == 0:
-                            numerator = abs((branch_num_for_index_calc * -1) - quadratic_sqrt)
-                        index_num_for_chunk = math.ceil(abs(numerator / (2 * (-1 / 2))))
-                        last_index = first_index + index_num_for_chunk
-                        if last_index >= len(all_open):
-                            is_last_segment = True
-                            last_index = open_num - 1
-                        segments.append({'start_index': first_index, 'last_index': last_index, 'branches': all_open})
-                        if is_last_segment:
-                            break
-                        branch_num_for_index_calc -= (last_index - first_index) + 1
-                    if len(segments) == 0:
-                        segments.append({'start_index': 0, 'last_index': open_num - 1, 'branches': all_open})
-                    else:
-                        segments[-1]['last_index'] = open_num - 1
-                    pool = mp.Pool(cpus)
-                    results = pool.map(self._open_branch_duplicate_flagging, segments)
-                    pool.close()
-                    pool.join()
-                    for result in results:
-                        branches_to_remove = [*branches_to_remove, *result]
-                    print()
-                else:
-                    results = self._open_branch_duplicate_flagging(
-                        args_in={'start_index': 0, 'last_index': (len(all_open) - 1), 'branches': all_open})
-
-                    branches_to_remove = [*branches_to_remove, *results]
+                print('Flagging identical open branches...')
+                branches_to_remove = [*branches_to_remove, *self._open_branch_duplicate_flagging(all_open)]
 
                 # flag for removal open branches with the same conditions as a closed branch
-                total_closed = len(all_closed)
-                should_parallel_closed = (total_closed * open_num) > self.chunk_compare_num
-                if self.use_multiprocessing and should_parallel_closed:
-                    print('Preparing Workers to flag mirrored open branches...')
-                    segments = []
-                    branch_num = len(all_closed)
-                    cpus = mp.cpu_count()
-                    last_index = -1
-                    for i in range(cpus):
-                        first_index = last_index + 1
-                        last_index = floor(branch_num * ((i + 1) / cpus))
-                        if last_index >= branch_num:
-                            last_index = branch_num - 1
-                        segments.append({'start_index': first_index, 'last_index': last_index, 'with_mid': with_mid,
-                                         'branches_to_remove': branches_to_remove, 'branches': all_open,
-                                         'closed_branches': all_closed[first_index:last_index]})
-                    if not len(segments) == 0:
-                        segments[-1]['last_index'] = (len(all_closed) - 1)
-                    pool = mp.Pool(cpus)
-                    results = pool.map(self._closed_branch_duplicate_flagging, segments)
-                    pool.close()
-                    pool.join()
-                    for result in results:
-                        branches_to_remove = [*branches_to_remove, *result]
-                    print()
-                else:
-                    print('Flagging mirrored open branches...')
-                    results = self._closed_branch_duplicate_flagging(
-                        args_in={'start_index': 0, 'last_index': (len(all_closed) - 1), 'with_mid': with_mid,
-                                 'branches_to_remove': branches_to_remove,
-                                 'closed_branches': all_closed, 'branches': all_open})
-                    branches_to_remove = [*branches_to_remove, *results]
+                print('Flagging mirrored open branches...')
+                branches_to_remove = [*branches_to_remove, *self._closed_branch_duplicate_flagging(
+                    branches=all_open, closed_branches=all_closed, branches_to_remove=branches_to_remove,
+                    with_mid=with_mid)]
 
                 # Remove flagged branches
                 branches_to_remove = sorted(list(set(branches_to_remove)))
@@ -297,8 +337,8 @@ class ScriptPerformer:
                 else:
                     branch_index = 0
                     updated_branch = all_open.pop(0)
-                    mid_ram = copy.deepcopy(updated_branch['cur_ram'])
-                    initial_ram = copy.deepcopy(mid_ram)
+                    mid_ram = updated_branch['cur_ram']
+                    initial_ram = mid_ram
                     if 'new_run' in updated_branch.keys():
                         new_run_dict = updated_branch['new_run']
                         new_run_dict['value'] = new_run_dict['value'] + 1
@@ -311,8 +351,13 @@ class ScriptPerformer:
             print('\n')
             # Remove duplicates and any branch which goes past the out value, and any branch which contains a choice without modification
 
-        tree_difference_summary = self._make_all_out_summary(inst_details=inst_details, temp_dir=temp_dir,
-                                                             all_branches=all_closed)
+        # Differences past the spill threshold are written to a directory of this run in the temp directory
+        spill_dir = tempfile.mkdtemp(prefix='salsa-', dir=temp_dir)
+        try:
+            tree_difference_summary = self._make_all_out_summary(inst_details=inst_details, spill_dir=spill_dir,
+                                                                 all_branches=all_closed)
+        finally:
+            shutil.rmtree(spill_dir, ignore_errors=True)
         print('Done with tree summary')
 
         # Extract start from values
@@ -348,55 +393,48 @@ class ScriptPerformer:
 
         return {'trees_detail': self.new_closed, 'ram_stats': self.addrs, 'summary': sorted_summary}
 
-    def _open_branch_duplicate_flagging(self, args_in):
-        start_index = args_in['start_index']
-        last_index = args_in['last_index']
-        branches = args_in['branches']
+    def _open_branch_duplicate_flagging(self, branches):
+        """Flags each open branch that an earlier one is equal to. Every branch is filed under its least common item,
+        so a branch is only compared with the earlier branches filed under one of its own items"""
+        branch_items = [self._get_items(branch) for branch in branches]
+        item_counts = Counter(item for items in branch_items for item in items)
+        filed_branches = {}
         branches_to_remove = []
-        current_open_branch_num = last_index - start_index + 1
-        if last_index == -1:
-            current_open_branch_num = len(branches) - start_index
-        for i, open1 in enumerate(branches[start_index:last_index]):
-            printProgressBar(prefix='Flagging identical open branches',
-                             suffix=f'total_branches: {current_open_branch_num}',
-                             total=current_open_branch_num, iteration=i, length=119)
-            sys.stdout.flush()
-            for j, open2 in enumerate(branches[start_index + i + 1:]):
-                ind2 = start_index + i + 1 + j
-                if self._variables_are_equal_recursive(open1, open2):
-                    branches_to_remove.append(ind2)
-        printProgressBar(prefix='Flagging identical open branches', suffix=f'total_branches: {current_open_branch_num}',
-                         total=current_open_branch_num, iteration=current_open_branch_num, length=119)
+        for j, items in enumerate(branch_items):
+            for item in items:
+                if any(branch_items[i] <= items and self._variables_are_equal_recursive(branches[i], branches[j])
+                       for i in filed_branches.get(item, [])):
+                    branches_to_remove.append(j)
+                    break
+            filed_branches.setdefault(min(items, key=item_counts.__getitem__), []).append(j)
 
         return branches_to_remove
 
-    def _closed_branch_duplicate_flagging(self, args_in):
+    def _closed_branch_duplicate_flagging(self, branches, closed_branches, branches_to_remove, with_mid):
+        """Flags each open branch that starts from the same conditions as a closed branch. A mirrored closed branch
+        has every condition item of the open branch, so only closed branches with its least common item are compared"""
+        closed_items = []
+        closed_by_item = {}
+        for c, out_branch in enumerate(closed_branches):
+            items = self._get_condition_items(out_branch, is_closed=True, with_req=True, with_mid=with_mid)
+            closed_items.append(items)
+            for item in items:
+                closed_by_item.setdefault(item, []).append(c)
+
+        already_flagged = set(branches_to_remove)
         repeats = []
-        branches_to_remove = args_in['branches_to_remove']
-        start_index = args_in['start_index']
-        last_index = args_in['last_index']
-        with_mid = args_in['with_mid']
-        closed_branches = args_in['closed_branches']
-        branches = args_in['branches']
-        current_outs = last_index - start_index + 1
-        for i, out_branch in enumerate(closed_branches):
-            printProgressBar(prefix='Removing open branches which mirror closed branches', length=100,
-                             total=current_outs, iteration=i)
-            sys.stdout.flush()
-            for j, open_branch in enumerate(branches):
-                if j in branches_to_remove:
-                    continue
-                elif self._branch_has_same_conditions(out_branch=out_branch, open_branch=open_branch,
-                                                      with_req=True, with_mid=with_mid):
-                    branches_to_remove.append(j)
+        for j, open_branch in enumerate(branches):
+            if j in already_flagged:
+                continue
+            items = self._get_condition_items(open_branch, with_req=True, with_mid=with_mid)
+            least_common = min(items, key=lambda item: len(closed_by_item.get(item, [])))
+            for c in closed_by_item.get(least_common, []):
+                if items <= closed_items[c] and self._branch_has_same_conditions(
+                        out_branch=closed_branches[c], open_branch=open_branch, with_req=True, with_mid=with_mid):
                     repeats.append(j)
+                    break
 
-        printProgressBar(prefix='Removing open branches which mirror closed branches',
-                         total=current_outs, length=100,
-                         iteration=current_outs)
-        sys.stdout.flush()
-
-        return branches_to_remove
+        return repeats
 
     def _run_subscript_branch(self, name, subscripts, ram=None, branch_index=None, hit_requested=False,
                               back_log=None, ptr=None, traceback=None, depth=0, blacklist=None) -> bool:
@@ -452,7 +490,7 @@ class ScriptPerformer:
             if 'set' in inst:
                 new_ram = self._set_memory_pos(inst['set'], cur_ram)
                 if branch_index is None:
-                    new_branch = {'init_ram': {}, 'cur_ram': copy.deepcopy(new_ram), 'switch_states': [], 'actions': [],
+                    new_branch = {'init_ram': RAMState(), 'cur_ram': new_ram, 'switch_states': [], 'actions': [],
                                   'jump_states': [], 'init_value': {'instruction': 'all', 'traceback': [{'name': 'Start', 'pos': 0}]}}
                     self.new_opens.append(new_branch)
                     branch_index = 0
@@ -499,8 +537,8 @@ class ScriptPerformer:
             elif 'jumpif' in inst or 'subscript_jumpif' in inst:
                 inst_name = list(inst.keys())[0]
                 if branch_index is None:
-                    self.new_opens.append({'init_value': {'instruction': 'all', 'traceback': [{'name': 'Start', 'pos': 0}]}, 'init_ram': copy.deepcopy(cur_ram), 'switch_states': [],
-                                           'actions': [], 'jump_states': [], 'cur_ram': copy.deepcopy(cur_ram)})
+                    self.new_opens.append({'init_value': {'instruction': 'all', 'traceback': [{'name': 'Start', 'pos': 0}]}, 'init_ram': cur_ram, 'switch_states': [],
+                                           'actions': [], 'jump_states': [], 'cur_ram': cur_ram})
                     branch_index = 0
 
                 if 'subscript' in inst_name:
@@ -521,16 +559,18 @@ class ScriptPerformer:
 
                 has_condition = False
                 condition_index = None
-                condition_string = self._generate_condition_string(jump_condition[list(jump_condition.keys())[0]])
+                compiled_condition = self._get_compiled_condition(jump_condition)
+                condition_string = compiled_condition['string']
 
-                addresses = re.findall('0x[0-9,a-d]{8}', condition_string)
                 compare_address_dict = {}
-                for address in addresses:
+                for address in compiled_condition['addresses']:
                     value = self._get_memory_pos(address, cur_ram)
                     if value is not None:
                         compare_address_dict[address] = value
-                        new_string = f'{address}({value})'
-                        condition_string = condition_string.replace(address, new_string)
+                        # The condition string with values is only needed to find assumed jump states
+                        if self.with_compare_assumption:
+                            new_string = f'{address}({value})'
+                            condition_string = condition_string.replace(address, new_string)
 
                 if len(compare_address_dict) > 0:
                     action_jump_dict['address_dict'] = compare_address_dict
@@ -545,11 +585,11 @@ class ScriptPerformer:
                 if has_condition and self.with_compare_assumption:
                     jump = self.new_opens[branch_index]['jump_states'][condition_index]['jumped']
                 else:
-                    can_jump = self._can_jump(jump_condition, copy.deepcopy(cur_ram))
+                    can_jump = compiled_condition['can_jump'](cur_ram)
 
                     if not force_branch:
                         if can_jump:
-                            should_jump = not self._should_not_jump(compare=jump_condition, ram=cur_ram, isBase=True)
+                            should_jump = not compiled_condition['should_not_jump'](cur_ram)
                             if should_jump:
                                 jump = True
                                 make_branch = False
@@ -584,7 +624,7 @@ class ScriptPerformer:
 
                     self.new_opens.append(new_branch)
 
-                    new_ram = copy.deepcopy(self.new_opens[new_branch_index]['cur_ram'])
+                    new_ram = self.new_opens[new_branch_index]['cur_ram']
 
                     sub_hit_requested = self._run_subscript_branch(name=next_name, subscripts=subscripts, ptr=inst_ptr,
                                                                    ram=new_ram, back_log=copy.deepcopy(back_log),
@@ -685,7 +725,7 @@ class ScriptPerformer:
                     else:
                         closing_branch = f'{branch_index}: Start'
                 else:
-                    out_branch = {'end_ram': copy.deepcopy(cur_ram), 'actions': [{'requested': req_dict}],
+                    out_branch = {'end_ram': cur_ram, 'actions': [{'requested': req_dict}],
                                   'init_value': {'instruction': current_inst_code,
                                                  'traceback': [{'name': 'Start', 'pos': 0}]},
                                   'switch_states': [], 'jump_states': []}
@@ -698,8 +738,8 @@ class ScriptPerformer:
 
             elif 'switch' in inst:
                 if branch_index is None:
-                    self.new_opens.append({'init_value': {'instruction': 'all', 'traceback': [{'name': 'Start', 'pos': 0}]}, 'init_ram': copy.deepcopy(cur_ram),
-                                           'cur_ram': copy.deepcopy(cur_ram), 'actions': [], 'switch_states': [],
+                    self.new_opens.append({'init_value': {'instruction': 'all', 'traceback': [{'name': 'Start', 'pos': 0}]}, 'init_ram': cur_ram,
+                                           'cur_ram': cur_ram, 'actions': [], 'switch_states': [],
                                            'jump_states': []})
                     branch_index = 0
 
@@ -766,7 +806,7 @@ class ScriptPerformer:
 
                         new_branch_index = len(self.new_opens)
                         self.new_opens.append(new_branch)
-                        new_ram = copy.deepcopy(self.new_opens[new_branch_index]['cur_ram'])
+                        new_ram = self.new_opens[new_branch_index]['cur_ram']
 
                         sub_hit_requested = self._run_subscript_branch(name=name, subscripts=subscripts, ptr=inst_ptr,
                                                                        ram=new_ram, depth=depth + 1,
@@ -817,8 +857,8 @@ class ScriptPerformer:
 
             elif 'choice' in inst:
                 if branch_index is None:
-                    self.new_opens.append({'init_value': {'instruction': 'all', 'traceback': [{'name': 'Start', 'pos': 0}]}, 'init_ram': copy.deepcopy(cur_ram),
-                                           'cur_ram': copy.deepcopy(cur_ram), 'switch_states': [], 'actions': [],
+                    self.new_opens.append({'init_value': {'instruction': 'all', 'traceback': [{'name': 'Start', 'pos': 0}]}, 'init_ram': cur_ram,
+                                           'cur_ram': cur_ram, 'switch_states': [], 'actions': [],
                                            'jump_states': []})
                     branch_index = 0
                 force_branch = True
@@ -892,7 +932,7 @@ class ScriptPerformer:
                 done = True
 
         if branch_index is not None:
-            self.new_opens[branch_index]['cur_ram'] = copy.deepcopy(cur_ram)
+            self.new_opens[branch_index]['cur_ram'] = cur_ram
         return hit_requested
 
     @staticmethod
@@ -924,7 +964,45 @@ class ScriptPerformer:
 
         return new_trace
 
-    def _make_all_out_summary(self, inst_details, temp_dir, all_branches) -> dict:
+    # --------------------- #
+    # Worker pool functions #
+    # --------------------- #
+
+    def _get_pool(self):
+        if self._pool is None:
+            self._pool = mp.Pool(mp.cpu_count(), initializer=_init_worker, initargs=(self,))
+        return self._pool
+
+    def _close_pool(self):
+        if self._pool is None:
+            return
+        self._pool.close()
+        self._pool.join()
+        self._pool = None
+
+    def _publish_branches(self, branches) -> Tuple[str, int]:
+        """Pickles branches into shared memory once, so that tasks only need the keys of the branches they work on.
+        Returns the name of the shared memory block and the size of the pickle"""
+        data = pickle.dumps(branches, protocol=pickle.HIGHEST_PROTOCOL)
+        block = shared_memory.SharedMemory(create=True, size=max(len(data), 1))
+        block.buf[:len(data)] = data
+        self._published_blocks.append(block)
+        return block.name, len(data)
+
+    def _release_published(self):
+        for block in self._published_blocks:
+            block.close()
+            block.unlink()
+        self._published_blocks = []
+
+    def _map_published(self, method_name, published, tasks: List[Tuple[tuple, dict]]) -> list:
+        """Runs a method in the worker pool for each (branch key, args_in) task. The branches of a task are found in
+        the published branches by following its branch key"""
+        block_name, size = published
+        tasks = [(method_name, block_name, size, branch_key, args_in) for branch_key, args_in in tasks]
+        return self._get_pool().map(_run_published_task, tasks)
+
+    def _make_all_out_summary(self, inst_details, spill_dir, all_branches) -> dict:
         num_branches = len(all_branches)
 
         parallel_processes = False
@@ -990,16 +1068,16 @@ class ScriptPerformer:
                 # place holder for debugging multiprocessing, not formatted for multiprocessing
                 for value, branches in values.items():
                     grouped_branches[inst][value] = {}
-                    all_args.append({'inst': inst, 'value': value, 'branches': branches})
+                    all_args.append(((inst, value), {'inst': inst, 'value': value, 'as_indexes': True}))
 
         if parallel_processes:
-            pool = mp.Pool(mp.cpu_count())
-            results = pool.map(self._get_traceback_groups, all_args)
-            pool.close()
-            pool.join()
+            results = self._map_published('_get_traceback_groups', self._publish_branches(groups), all_args)
+            self._release_published()
 
             for out in results:
-                grouped_branches[out['inst']][out['value']] = out['groups']
+                branches = groups[out['inst']][out['value']]
+                grouped_branches[out['inst']][out['value']] = {trace: [branches[i] for i in indexes]
+                                                               for trace, indexes in out['groups'].items()}
                 all_trace_levels[out['inst']][out['value']] = out['trace_level']
 
         # calculate the number of calcs per worker
@@ -1048,17 +1126,17 @@ class ScriptPerformer:
                                 numerator = abs((branch_num_for_index_calc * -1) - quadratic_sqrt)
                             index_num_for_chunk = math.ceil(abs(numerator / (2 * (-1 / 2))))
                             last_index = first_index + index_num_for_chunk
-                            all_args.append({'inst': inst, 'value': value, 'branches': branches, 'trace': trace,
-                                             'start_index': first_index, 'last_index': last_index})
+                            all_args.append(((inst, value, trace),
+                                             {'inst': inst, 'value': value, 'trace': trace,
+                                              'start_index': first_index, 'last_index': last_index}))
                             branch_num_for_index_calc -= (last_index - first_index) + 1
-                        all_args[-1]['last_index'] = len(branches) - 1
+                        all_args[-1][1]['last_index'] = len(branches) - 1
                         duplicates[inst][value][trace] = []
 
         if parallel_processes:
-            pool = mp.Pool(mp.cpu_count())
-            results = pool.map(self._remove_traceback_duplicate_branches, all_args)
-            pool.close()
-            pool.join()
+            results = self._map_published('_remove_traceback_duplicate_branches',
+                                          self._publish_branches(grouped_branches), all_args)
+            self._release_published()
 
             for i, out in enumerate(results):
                 duplicates[out['inst']][out['value']][out['trace']] = [
@@ -1085,14 +1163,6 @@ class ScriptPerformer:
                     group_calc_num[inst][value][trace] = cur_calc_num
                     total_calc_num += cur_calc_num
 
-        # Remove anything that is in the temporary directory in case anything was left over from a previous run
-        for d in os.listdir(temp_dir):
-            path = os.path.join(temp_dir, d)
-            if os.path.isdir(path):
-                shutil.rmtree(path)
-            else:
-                os.remove(path)
-
         print('\nLooking for branch differences')
         all_args = []
         difference_dicts = {}
@@ -1116,7 +1186,7 @@ class ScriptPerformer:
                         last_index = len(branches) - 1
                         args_in = {'inst': inst, 'value': value, 'branches': branches, 'first_index': first_index,
                                    'trace': trace, 'inst_details': inst_details[inst], 'last_index': last_index,
-                                   'temp_dir': temp_dir, 'file_index': i}
+                                   'spill_dir': spill_dir}
                         out = self._get_traceback_group_details(args_in=args_in)
                         difference_dicts[out['inst']][out['value']][out['trace']] = out
                         if out['internal']:
@@ -1137,21 +1207,22 @@ class ScriptPerformer:
                                 numerator = abs((branch_num_for_index_calc * -1) - quadratic_sqrt)
                             index_num_for_chunk = math.ceil(abs(numerator / (2 * (-1 / 2))))
                             last_index = first_index + index_num_for_chunk
-                            all_args.append({'inst': inst, 'value': value, 'branches': branches, 'trace': trace,
-                                             'inst_details': inst_details[inst], 'temp_dir': temp_dir, 'file_index': i,
-                                             'first_index': first_index, 'last_index': last_index})
+                            all_args.append(((inst, value, trace),
+                                             {'inst': inst, 'value': value, 'trace': trace,
+                                              'inst_details': inst_details[inst], 'spill_dir': spill_dir,
+                                              'first_index': first_index, 'last_index': last_index}))
                             branch_num_for_index_calc -= (last_index - first_index) + 1
-                        all_args[-1]['last_index'] = len(branches) - 1
+                        all_args[-1][1]['last_index'] = len(branches) - 1
 
+        # The grouped branches do not change from here on, so they are published once for the rest of the summary
+        published_branches = None
         if parallel_processes:
-            pool = mp.Pool(mp.cpu_count())
-            results = pool.map(self._get_traceback_group_details, all_args)
-            pool.close()
-            pool.join()
+            published_branches = self._publish_branches(grouped_branches)
+            results = self._map_published('_get_traceback_group_details', published_branches, all_args)
 
             for i, out in enumerate(results):
                 if out['trace'] not in difference_dicts[out['inst']][out['value']].keys():
-                    difference_dicts[out['inst']][out['value']][out['trace']] = copy.deepcopy(out)
+                    difference_dicts[out['inst']][out['value']][out['trace']] = out
                 else:
                     cur_out = difference_dicts[out['inst']][out['value']][out['trace']]
                     cur_out['diff_levels'] = sorted(list({*cur_out['diff_levels'], *out['diff_levels']}))
@@ -1159,11 +1230,11 @@ class ScriptPerformer:
                         cur_out['has_differences'] = out['has_differences']
                     if cur_out['internal']:
                         cur_out['internal'] = out['internal']
-                    for level in out['file_sizes']:
-                        if level not in cur_out['file_sizes'].keys():
-                            cur_out['file_sizes'][level] = out['file_sizes'][level]
+                    for level, spool in out['differences'].items():
+                        if level not in cur_out['differences'].keys():
+                            cur_out['differences'][level] = spool
                         else:
-                            cur_out['file_sizes'][level] += out['file_sizes'][level]
+                            cur_out['differences'][level].extend(spool)
                     difference_dicts[out['inst']][out['value']][out['trace']] = cur_out
 
             for inst in difference_dicts.keys():
@@ -1172,27 +1243,6 @@ class ScriptPerformer:
                         if difference_dicts[inst][value][trace]['internal']:
                             all_internals[inst][value].append(trace)
 
-        # Combine Temp Files - d includes the inst, value, trace, and level
-        for d in os.listdir(temp_dir):
-            dir_path = os.path.join(temp_dir, d)
-            files = []
-            filenames = {}
-            for f in os.listdir(dir_path):
-                new_filename = f'{d}{self.temp_ext}'
-                path = os.path.join(temp_dir, new_filename)
-                if not os.path.exists(path):
-                    new_index = len(files)
-                    filenames[new_filename] = new_index
-                    files.append(open(path, 'w', encoding='shiftjis'))
-                old_file = open(os.path.join(dir_path, f))
-                lines = old_file.readlines()
-                files[filenames[new_filename]].writelines(lines)
-                old_file.close()
-            for file in files:
-                file.close()
-
-            shutil.rmtree(dir_path)
-
         print('Making Summaries...')
         summary = {}
         all_args = []
@@ -1202,7 +1252,7 @@ class ScriptPerformer:
                 summary[inst][value] = {}
                 if not parallel_processes:
                     for trace, branches in traces.items():
-                        args_in = {**difference_dicts[inst][value][trace], 'branches': branches, 'temp_dir': temp_dir,
+                        args_in = {**difference_dicts[inst][value][trace], 'branches': branches,
                                    'trace_level': all_trace_levels[inst][value]}
 
                         result = [self._generate_difference_summaries(args_in=args_in)]
@@ -1210,21 +1260,16 @@ class ScriptPerformer:
                             summary[out['inst']][out['value']][out['trace']] = out['summary']
                 else:
                     # place holder for debugging multiprocessing, not formatted for multiprocessing
-                    for trace, branches in traces.items():
-                        all_args.append({**difference_dicts[inst][value][trace], 'branches': branches,
-                                         'temp_dir': temp_dir, 'trace_level': all_trace_levels[inst][value]})
+                    for trace in traces:
+                        all_args.append(((inst, value, trace),
+                                         {**difference_dicts[inst][value][trace],
+                                          'trace_level': all_trace_levels[inst][value]}))
         if parallel_processes:
-            pool = mp.Pool(mp.cpu_count())
-            results = pool.map(self._generate_difference_summaries, all_args)
-            pool.close()
-            pool.join()
+            results = self._map_published('_generate_difference_summaries', published_branches, all_args)
+            self._release_published()
             for out in results:
                 summary[out['inst']][out['value']][out['trace']] = out['summary']
 
-        # Clean up any temp files
-        for f in os.listdir(temp_dir):
-            os.remove(os.path.join(temp_dir, f))
-
         # Remove internal summaries and append them to external summaries
         print('Appending internal summaries to their external counterparts...')
         appended_summary = {}
@@ -1310,13 +1355,15 @@ class ScriptPerformer:
                 new_trace_level = self._get_traceback_diff_level(trace1, trace2)
                 traceback_level = min(traceback_level, new_trace_level)
 
-        for branch in branches:
+        # Workers group the indexes of the branches, so that the branches are not sent back
+        as_indexes = args_in.get('as_indexes', False)
+        for i, branch in enumerate(branches):
             diff_traceback = branch['init_value']['traceback']
             trace_key = self._get_traceback_string(diff_traceback, traceback_level)
             if trace_key not in grouped_values.keys():
                 print(f'Created group: Value: {value}, Trace: {trace_key}{" " * 150}')
                 grouped_values[trace_key] = []
-            grouped_values[trace_key].append(branch)
+            grouped_values[trace_key].append(i if as_indexes else branch)
 
         return {'groups': grouped_values, 'trace_level': traceback_level, 'inst': inst, 'value': value}
 
@@ -1400,8 +1447,7 @@ class ScriptPerformer:
         trace = args_in['trace']
         param_name = args_in['inst_details']
         branches = args_in['branches']
-        temp_dir = args_in['temp_dir']
-        index = args_in['file_index']
+        spill_dir = args_in['spill_dir']
         first_index = args_in['first_index']
         last_index = args_in['last_index']
 
@@ -1432,12 +1478,10 @@ class ScriptPerformer:
             out_trace = branch['out_value']['traceback']
             branch_outs.append({'value': out_value, 'traceback': out_trace, 'exit': True})
 
-        diffs_file_header = f'{inst}-{value}-{trace}'
+        diffs_header = f'{inst}-{value}-{trace}'
         diff_levels = []
         has_differences = False
-        dir_index = {}
-        files = []
-        level_sizes = {}
+        differences = {}
         if branch_num > 1:
             for i, branch1 in enumerate(branches[first_index: last_index]):
                 ind1 = i + first_index
@@ -1457,26 +1501,14 @@ class ScriptPerformer:
                         continue
                     diff_level = temp_difference.pop('level')
                     diff_levels.append(diff_level)
-                    dir_name = f'{diffs_file_header}-{diff_level}'
-                    dir_path = os.path.join(temp_dir, dir_name)
-
-                    if diff_level not in level_sizes.keys():
-                        if not os.path.exists(dir_path):
-                            try:
-                                os.mkdir(dir_path)
-                            except FileExistsError as e:
-                                print(f'Tried to make dir but already exists {e}')
-                        diffs_file_name = f'{dir_name}-{index}{self.temp_ext}'
-                        new_file_index = len(files)
-                        dir_index[diff_level] = new_file_index
-                        files.append(open(os.path.join(dir_path, diffs_file_name), 'w'))
-                        level_sizes[diff_level] = 0
+
+                    if diff_level not in differences.keys():
+                        differences[diff_level] = DifferenceSpool(spill_dir, self.diff_spill_threshold)
 
                     deets = temp_difference.pop('diff_deets')
                     difference = {'branches': [ind1, ind2], 'level': diff_level, 'diff': temp_difference,
                                   'diff_details': deets}
-                    files[dir_index[diff_level]].write(f'{json.dumps(difference)}\n')
-                    level_sizes[diff_level] += 1
+                    differences[diff_level].append(difference)
                     has_differences = True
 
             progress_suffix = ' \tDONE\t\t\t\t '
@@ -1486,12 +1518,9 @@ class ScriptPerformer:
 
             diff_levels = sorted(list(set(diff_levels)))
 
-        for file in files:
-            file.close()
-
         output = {'outs': branch_outs, 'diff_levels': diff_levels, 'internal': is_internal, 'inst': inst,
-                  'value': value, 'trace': trace, 'diffs_header': diffs_file_header, 'has_differences': has_differences,
-                  'file_sizes': level_sizes}
+                  'value': value, 'trace': trace, 'diffs_header': diffs_header, 'has_differences': has_differences,
+                  'differences': differences}
 
         return output
 
@@ -1597,7 +1626,7 @@ class ScriptPerformer:
     def _generate_difference_summaries(self, args_in) -> dict:
         diff_levels = args_in['diff_levels']
         dif_header = args_in['diffs_header']
-        file_sizes = args_in['file_sizes']
+        differences = args_in['differences']
         branch_outs = args_in['outs']
         trace_level = args_in['trace_level']
         branches = args_in['branches']
@@ -1612,7 +1641,7 @@ class ScriptPerformer:
 
                 stratified_diff_summary = self._get_stratified_differences(
                     dif_header=dif_header, outs=copy.deepcopy(branch_outs), value=value, trace=trace,
-                    diff_levels=copy.deepcopy(diff_levels), temp_dir=args_in['temp_dir'], file_sizes=file_sizes)
+                    diff_levels=copy.deepcopy(diff_levels), differences=differences)
 
                 condensed_diff_summary = self._condense_stratified_differences(
                     copy.deepcopy(stratified_diff_summary))
@@ -1630,7 +1659,7 @@ class ScriptPerformer:
 
         return {'summary': summary, 'inst': inst, 'value': value, 'trace': trace}
 
-    def _get_stratified_differences(self, outs, diff_levels, temp_dir, dif_header, file_sizes, value, trace,
+    def _get_stratified_differences(self, outs, diff_levels, differences, dif_header, value, trace,
                                     valid_ids=None) -> dict:
         strat_diff = {}
         rem_levels = diff_levels[1:]
@@ -1638,15 +1667,8 @@ class ScriptPerformer:
         child_ids = {}
         progress_prefix = f'Summarizing {dif_header}:{level}'
         progressbar_length = 200 - len(progress_prefix)
-        cur_line = 0
-        dif_file_name = f'{dif_header}-{level}{self.temp_ext}'
-        diff_path = os.path.join(temp_dir, dif_file_name)
-        file = open(diff_path, 'r')
-        while True:
-            line = file.readline()
-            if not line:
-                break
-            diff: dict = json.loads(line)
+        level_differences = differences[level]
+        for cur_line, diff in enumerate(level_differences):
             if not diff['level'] == level:
                 continue
             b_keys = diff['branches']
@@ -1774,21 +1796,20 @@ class ScriptPerformer:
             else:
                 print(f'make new category: {diff_inst}')
 
-            printProgressBar(prefix=progress_prefix, suffix=f'{cur_line}/{file_sizes[level]}',
-                             length=progressbar_length, total=file_sizes[level], iteration=cur_line, printEnd='\r')
+            printProgressBar(prefix=progress_prefix, suffix=f'{cur_line}/{len(level_differences)}',
+                             length=progressbar_length, total=len(level_differences), iteration=cur_line,
+                             printEnd='\r')
             sys.stdout.flush()
-            cur_line += 1
-        file.close()
 
         printProgressBar(prefix=progress_prefix, suffix=f'\tDONE{" " * 25}', length=progressbar_length,
-                         total=file_sizes[level], iteration=file_sizes[level], printEnd='')
+                         total=len(level_differences), iteration=len(level_differences), printEnd='')
         sys.stdout.flush()
 
         temp_children = child_ids
         if len(temp_children) == 0:
             if len(rem_levels) > 0:
                 return self._get_stratified_differences(outs=outs, diff_levels=rem_levels, valid_ids=valid_ids,
-                                                        temp_dir=temp_dir, dif_header=dif_header, file_sizes=file_sizes,
+                                                        differences=differences, dif_header=dif_header,
                                                         value=value, trace=trace)
             else:
                 cur_outs = []
@@ -1803,8 +1824,8 @@ class ScriptPerformer:
             if not len(option_list) == 1:
                 if len(rem_levels) > 0:
                     out_dict = self._get_stratified_differences(outs=outs, diff_levels=rem_levels,
-                                                                valid_ids=option_list, temp_dir=temp_dir,
-                                                                dif_header=dif_header, file_sizes=file_sizes,
+                                                                valid_ids=option_list, differences=differences,
+                                                                dif_header=dif_header,
                                                                 value=value, trace=trace)
                 else:
                     cur_outs = []
@@ -1927,6 +1948,50 @@ class ScriptPerformer:
     # Branch manipulation functions #
     # ----------------------------- #
 
+    def _get_condition_items(self, branch, is_closed=False, with_req=False, with_mid=False) -> frozenset:
+        """Gets the items of the conditions compared by _branch_has_same_conditions. The mid ram of a closed
+        branch is under the same path as the current ram of an open branch"""
+        items = set(self._get_ram_items(branch['init_ram'], ('init_ram',)))
+        if with_req:
+            self._add_items(branch['init_value'], ('init_value',), items)
+        if with_mid:
+            if is_closed and 'new_run' in branch.keys():
+                items |= self._get_ram_items(branch['new_run']['mid_ram'][0], ('mid_ram',))
+            else:
+                items |= self._get_ram_items(branch['cur_ram'], ('mid_ram',))
+        return frozenset(items)
+
+    def _get_ram_items(self, ram: RAMState, path) -> frozenset:
+        # RAM states do not change, so their items are kept with them
+        if path not in ram.items_by_path:
+            items = set()
+            self._add_items(ram, path, items)
+            ram.items_by_path[path] = frozenset(items)
+        return ram.items_by_path[path]
+
+    def _get_items(self, var) -> frozenset:
+        """Gets the path of every container and value in a variable. When _variables_are_equal_recursive finds var1
+        equal to var2, the items of var1 are a subset of the items of var2"""
+        items = set()
+        self._add_items(var, (), items)
+        return frozenset(items)
+
+    def _add_items(self, var, path, items):
+        if isinstance(var, dict):
+            items.add((path, type(var)))
+            for key, value in var.items():
+                self._add_items(value, (*path, key), items)
+        elif isinstance(var, list):
+            items.add((path, type(var), len(var)))
+            for i, value in enumerate(var):
+                self._add_items(value, (*path, i), items)
+        else:
+            try:
+                hash(var)
+            except TypeError:
+                var = repr(var)
+            items.add((path, type(var), var))
+
     def _branch_has_same_conditions(self, out_branch, open_branch, with_req=False, with_mid=False):
         is_same = True
 
@@ -1957,6 +2022,9 @@ class ScriptPerformer:
         return is_same
 
     def _variables_are_equal_recursive(self, var1, var2):
+        # Branches often share RAM states and their details
+        if var1 is var2:
+            return True
         if not type(var1) == type(var2):
             return False
         if isinstance(var1, dict):
@@ -1998,22 +2066,27 @@ class ScriptPerformer:
                 self.addrs[addr]['addr_not_init'] = True
             if 'init_loc' not in self.addrs[addr].keys():
                 self.addrs[addr]['init_loc'] = 'internal'
-            ram[addr] = self.addrs[addr]
-        cur_value = ram[addr].get('value', None)
-        if ram[addr]['init_loc'] == 'external':
-            ram[addr]['init_loc'] += '->internal'
+            if self.addrs[addr]['init_loc'] == 'external':
+                self.addrs[addr]['init_loc'] += '->internal'
+            addr_details = dict(self.addrs[addr])
+        else:
+            # Address details are shared between RAM states, so they are changed on a copy
+            addr_details = dict(ram[addr])
+        cur_value = addr_details.get('value', None)
+        if addr_details['init_loc'] == 'external':
+            addr_details['init_loc'] += '->internal'
         if addr_type == 'bit':
             if details['action'] == 'set':
-                ram[addr]['value'] = 1
+                addr_details['value'] = 1
             elif details['action'] == 'unset':
-                ram[addr]['value'] = 0
+                addr_details['value'] = 0
             elif details['action'] == 'invert':
                 if cur_value is None:
                     cur_value = 0
-                ram[addr]['value'] = 1 - cur_value
+                addr_details['value'] = 1 - cur_value
         else:
-            ram[addr]['value'] = details['value']
-        return ram
+            addr_details['value'] = details['value']
+        return ram.set_address(addr, addr_details)
 
     def _get_memory_pos(self, addr, ram, addr_type=None):
         if addr not in ram.keys():
@@ -2037,102 +2110,129 @@ class ScriptPerformer:
         return cur_value
 
     def _get_defined_ram(self, branch=None):
+        if branch is not None:
+            return branch['current ram']
         ram = {}
-        if branch is None:
-            for addr, addr_dict in self.addrs.items():
-                if 'value' in addr_dict.keys():
-                    if addr_dict['value'] is not None:
-                        ram[addr] = addr_dict
-        else:
-            ram = branch['current ram']
-        return ram
+        for addr, addr_dict in self.addrs.items():
+            if 'value' in addr_dict.keys():
+                if addr_dict['value'] is not None:
+                    ram[addr] = dict(addr_dict)
+        return RAMState(ram)
 
     # ------------ #
     # Jump testing #
     # ------------ #
 
-    def _should_not_jump(self, compare, ram, isBase=False):
-        params = []
-        comparison = ''
-        for short_compare, value in compare.items():
-            if isinstance(value, dict):
-                for comp, param in value.items():
-                    comparison = comp
-                    if isinstance(param, dict):
-                        for sub_param in param.values():
-                            if isinstance(sub_param, dict):
-                                params.append(self._should_not_jump(sub_param, ram))
-                            else:
-                                params.append(sub_param)
-                    elif isinstance(param, float) or \
-                            isinstance(param, int) or \
-                            isinstance(param, str):
-                        params.append(param)
-                        comparison = short_compare
-                    else:
-                        print(f'WARNING: unable to process param of type {type(param)}. Not performing jump')
-                        return False
-            else:
-                params.append(value)
-
-        param_values = []
-        for param in params:
-            if isinstance(param, str):
-                done = False
-                value = param
-                while not done:
-                    if re.search(': ', value):
-                        addr = value.split(': ')[1].rstrip()
-                    else:
-                        addr = value
-                    value = self._get_memory_pos(addr, ram, 'control')
-                    if value is None:
-                        done = True
-                    elif not isinstance(value, str):
-                        done = True
-                param_values.append(value)
-            else:
-                param_values.append(param)
-        if len(param_values) > 1:
-            try:
-                result = self.scpt_codes[comparison](param_values[0], param_values[1])
-            except KeyError as e:
-                print(f'Error comparison not performed: {e}')
-                return False
-        else:
-            result = param_values[0]
+    def _get_compiled_condition(self, jump_condition) -> dict:
+        """Compiles a jump condition the first time it is tested. Conditions belong to the subscripts of the run,
+        so they are kept by the identity of their dict"""
+        compiled = self._compiled_conditions.get(id(jump_condition), None)
+        if compiled is not None and compiled['condition'] is jump_condition:
+            return compiled
+        condition_string = self._generate_condition_string(jump_condition[list(jump_condition.keys())[0]])
+        compiled = {'condition': jump_condition, 'string': condition_string,
+                    'addresses': re.findall('0x[0-9,a-d]{8}', condition_string),
+                    'can_jump': self._compile_can_jump(jump_condition),
+                    'should_not_jump': self._compile_should_not_jump(jump_condition, is_base=True)}
+        self._compiled_conditions[id(jump_condition)] = compiled
+        return compiled
+
+    def _compile_can_jump(self, compare):
+        """Returns a function of the ram which is True when every address in the comparison has a value"""
+        addrs = []
+        has_invalid = self._get_compare_addrs(compare, addrs)
+
+        def can_jump(ram):
+            # Every address is looked up, as looking up an address records its use
+            has_values = True
+            for addr in addrs:
+                if self._get_address_value(addr, ram, 'control') is None:
+                    has_values = False
+            return has_values and not has_invalid
 
-        if isBase:
-            if result == 1:
-                return True
-            else:
-                return False
-        return result
+        return can_jump
 
-    def _can_jump(self, compare, ram):
-        can_jump = True
+    def _get_compare_addrs(self, compare, addrs) -> bool:
+        """Adds the addresses in a comparison to addrs, returns whether it has a value which is not a number"""
+        has_invalid = False
         for value in compare.values():
             if isinstance(value, dict):
-                if not self._can_jump(value, ram):
-                    can_jump = False
+                if self._get_compare_addrs(value, addrs):
+                    has_invalid = True
             elif isinstance(value, str):
-                done = False
-                while not done:
-                    if re.search(': ', value):
-                        addr = value.split(': ')[1].rstrip()
-                    else:
-                        addr = value
-                    value = self._get_memory_pos(addr, ram, 'control')
-                    if value is None:
-                        can_jump = False
-                        done = True
-                    elif not isinstance(value, str):
-                        done = True
+                addrs.append(self._get_param_addr(value))
+            elif not isinstance(value, (int, float)):
+                has_invalid = True
+        return has_invalid
+
+    def _compile_should_not_jump(self, compare, is_base=False):
+        """Returns a function of the ram which gives the result of the comparison. When is_base is True the function
+        returns whether the result is 1"""
+        # Each operand is ('nested', compiled comparison), ('addr', address), ('value', value), or ('invalid', type)
+        operands = []
+        comparison = ''
+        for short_compare, value in compare.items():
+            if not isinstance(value, dict):
+                operands.append(self._get_operand(value))
+                continue
+            for comp, param in value.items():
+                comparison = comp
+                if isinstance(param, dict):
+                    for sub_param in param.values():
+                        if isinstance(sub_param, dict):
+                            operands.append(('nested', self._compile_should_not_jump(sub_param)))
+                        else:
+                            operands.append(self._get_operand(sub_param))
+                elif isinstance(param, (float, int, str)):
+                    operands.append(self._get_operand(param))
+                    comparison = short_compare
+                else:
+                    operands.append(('invalid', type(param)))
+                    break
+            if len(operands) > 0 and operands[-1][0] == 'invalid':
+                break
+        compare_func = self.scpt_codes.get(comparison, None)
+
+        def should_not_jump(ram):
+            params = []
+            for kind, operand in operands:
+                if kind == 'invalid':
+                    print(f'WARNING: unable to process param of type {operand}. Not performing jump')
+                    return False
+                params.append(operand(ram) if kind == 'nested' else operand)
+            param_values = [self._get_address_value(param, ram, 'control') if kind == 'addr' else param
+                            for (kind, _), param in zip(operands, params)]
+            if len(param_values) > 1:
+                if compare_func is None:
+                    print(f'Error comparison not performed: {KeyError(comparison)}')
+                    return False
+                result = compare_func(param_values[0], param_values[1])
             else:
-                is_number = isinstance(value, int) or isinstance(value, float)
-                if not is_number:
-                    can_jump = False
-        return can_jump
+                result = param_values[0]
+
+            if is_base:
+                return result == 1
+            return result
+
+        return should_not_jump
+
+    def _get_operand(self, param):
+        if isinstance(param, str):
+            return 'addr', self._get_param_addr(param)
+        return 'value', param
+
+    @staticmethod
+    def _get_param_addr(param: str) -> str:
+        if ': ' in param:
+            return param.split(': ')[1].rstrip()
+        return param
+
+    def _get_address_value(self, addr, ram, addr_type=None):
+        """Gets the value of an address, following addresses which hold another address"""
+        value = self._get_memory_pos(addr, ram, addr_type)
+        while isinstance(value, str):
+            value = self._get_memory_pos(self._get_param_addr(value), ram, addr_type)
+        return value
 
     def _can_switch(self, addr, ram):
         value = self._get_memory_pos(addr, ram, 'control')
@@ -2236,3 +2336,29 @@ class ScriptPerformer:
             for value in inp.values():
                 size = max(self._get_dict_depth(value, size), size)
         return size
+
+
+_worker_performer = None
+_worker_published = {}
+
+
+def _init_worker(performer):
+    global _worker_performer
+    _worker_performer = performer
+
+
+def _run_published_task(task):
+    method_name, block_name, size, branch_key, args_in = task
+    if block_name not in _worker_published:
+        # Only the branches of the current stage are kept by the worker
+        _worker_published.clear()
+        block = shared_memory.SharedMemory(name=block_name)
+        try:
+            with block.buf[:size] as data:
+                _worker_published[block_name] = pickle.loads(data)
+        finally:
+            block.close()
+    branches = _worker_published[block_name]
+    for key in branch_key:
+        branches = branches[key]
+    return getattr(_worker_performer, method_name)({**args_in, 'branches': branches})
@@ -2,10 +2,12 @@ from SALSA.Project.project_container import SCTProject
 
 
 class VarUsage:
-    bits_used = {}
-    bytes_used = {}
-    ints_used = {}
-    floats_used = {}
+
+    def __init__(self):
+        self.bits_used = {}
+        self.bytes_used = {}
+        self.ints_used = {}
+        self.floats_used = {}
 
     def get_container_by_type_string(self, var_type):
         if var_type == 'BitVar':
@@ -27,15 +29,13 @@ class VarUsage:
                 if var_id not in var_container:
                     var_container[var_id] = []
 
-        for sct_name, sct in prj.scts.items():
-            for var_type, var_dict in sct.variables.items():
-                var_container = usage.get_container_by_type_string(var_type)
-                for var_id, locs in var_dict.items():
-                    if var_id not in var_container:
-                        var_container[var_id] = []
-                    for use in locs['usage']:
-                        new_use = tuple([sct_name, *use])
-                        var_container[var_id].append(new_use)
+        if prj.var_usage is None:
+            prj.build_var_usage()
+        for var_type, var_id in prj.var_usage.keys():
+            var_container = usage.get_container_by_type_string(var_type)
+            if var_id not in var_container:
+                var_container[var_id] = []
+            var_container[var_id] += prj.get_var_usage(var_type, var_id)
 
         return usage
 
@@ -1,4 +1,4 @@
-from typing import List
+from typing import List, NamedTuple, Tuple, Union
 from SALSA.BaseInstructions.bi_defaults import inst_defaults
 
 
@@ -195,12 +195,31 @@ class BaseInst:
         return return_diffs
 
 
+class BaseInstLayout(NamedTuple):
+    """Order in which the parameters of an instruction are read, shared by all decoded instances"""
+    instruction_id: int
+    params_before: Tuple[BaseParam, ...]
+    loop: Tuple[BaseParam, ...]
+    loop_iter: Union[int, None]
+    loop_cond: Union[dict, None]
+    params_after: Tuple[BaseParam, ...]
+
+    @classmethod
+    def from_inst(cls, inst: BaseInst):
+        loop = () if inst.loop is None else tuple(inst.params[p_id] for p_id in inst.loop)
+        return cls(instruction_id=inst.instruction_id,
+                   params_before=tuple(inst.params[p_id] for p_id in inst.params_before),
+                   loop=loop, loop_iter=inst.loop_iter, loop_cond=inst.loop_cond,
+                   params_after=tuple(inst.params[p_id] for p_id in inst.params_after))
+
+
 class BaseInstLib:
     """Takes in a dictionary containing instruction information and produces an object containing
         the necessary information to decode *.sct files"""
 
     def __init__(self):
         self.insts = [BaseInst(k, v) for k, v in inst_defaults.items()]
+        self.layouts = [BaseInstLayout.from_inst(_) for _ in self.insts]
         insts_with_a_parameter = [_ for _ in self.insts if len(_.params) > 0]
         self.p1_scpt = [_.instruction_id for _ in insts_with_a_parameter if 'scpt' in _.params[0].type]
         self.p1_int = [_.instruction_id for _ in insts_with_a_parameter if 'int' in _.params[0].type]
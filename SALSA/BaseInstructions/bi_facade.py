@@ -3,7 +3,7 @@ import json
 import os.path
 from typing import List, Dict
 
-from SALSA.BaseInstructions.bi_container import BaseInstLib, BaseInst, locked_conversions
+from SALSA.BaseInstructions.bi_container import BaseInstLib, BaseInst, BaseInstLayout, locked_conversions
 from SALSA.FileModels.instruction_model import InstructionModel
 from SALSA.Common.constants import LOCK
 
@@ -42,6 +42,9 @@ class BaseInstLibFacade:
     def get_inst(self, inst_id) -> BaseInst:
         return self.lib.insts[inst_id]
 
+    def get_inst_layout(self, inst_id) -> BaseInstLayout:
+        return self.lib.layouts[inst_id]
+
     def _get_default_inst_details(self):
         return {k: v.get_default_inst_details() for k, v in enumerate(self.lib.insts)}
 
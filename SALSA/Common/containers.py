@@ -1,3 +1,5 @@
+import threading
+from collections import OrderedDict
 from dataclasses import dataclass
 
 
@@ -11,3 +13,50 @@ class Vector2:
 class Dimension:
     width: int
     height: int
+
+
+class LRUCache:
+    """A bounded mapping which drops its least recently used entry when full, counting hits and misses.
+    Values are shared between everyone that gets them, so they should not be changed"""
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, default=None):
+        # Lookups are not locked, an entry dropped by another thread in between counts as a miss
+        try:
+            value = self._entries[key]
+            self._entries.move_to_end(key)
+        except KeyError:
+            self.misses += 1
+            return default
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def get_counts(self):
+        return self.hits, self.misses
+
+    @property
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups > 0 else 0.0
@@ -1,23 +1,80 @@
+import copy
+import gc
 import json
 import os.path
 import pickle
+import struct
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import List, Tuple
 
 from SALSA.Common.setting_class import settings
+from SALSA.Project.project_container import SCTScriptDict
+
+# Projects are saved as a header, a table of contents, and then one chunk per entry in the table of contents.
+# The first chunk is the pickled project without its scripts, each following chunk is one pickled script.
+# Chunks are compressed separately so that they can be packed and unpacked in parallel.
+prj_magic = b'SALSAPRJ'
+prj_format_version = 1
+# magic, format version, project version, number of chunks
+prj_header = struct.Struct('>8sHHI')
+# offset, stored size, unpacked size, is compressed, length of the chunk name
+prj_toc_entry = struct.Struct('>QQQ?H')
+
+
+@contextmanager
+def gc_paused():
+    """Pauses garbage collection while pickling or unpickling a project. Either creates millions of objects,
+    which would otherwise set off many full collections"""
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+class ScriptChunkReader:
+    """Loads single scripts from a chunked project file, for projects that load their scripts when first accessed"""
+
+    def __init__(self, filepath, version, toc):
+        self.filepath = filepath
+        self.version = version
+        self.entries = {entry[0]: entry[1:] for entry in toc[1:]}
+
+    def read_stored(self, name) -> Tuple[bytes, int, bool]:
+        offset, stored_size, size, compressed = self.entries[name]
+        with open(self.filepath, 'rb') as fh:
+            fh.seek(offset)
+            return fh.read(stored_size), size, compressed
+
+    def __call__(self, name):
+        data = ProjectModel.unpack_chunk(*self.read_stored(name))
+        with gc_paused():
+            return pickle.loads(data)
 
 
 class ProjectModel:
 
     log_key = 'PrjFileModel'
 
+    compress_level = 1
+
     def __init__(self):
         self.callbacks = {}
         if self.log_key not in settings.keys():
             settings.add_group(self.log_key)
+        if settings[self.log_key].get('compress', None) is None:
+            settings.set_single(self.log_key, 'compress', 'True')
+        if settings[self.log_key].get('lazy_load', None) is None:
+            settings.set_single(self.log_key, 'lazy_load', 'True')
         self.recent_files = []
         self.max_recents = 10
         self._load_recent_filelist()
 
-    def load_project(self, filepath, ignore_dir=False):
+    def load_project(self, filepath, ignore_dir=False, lazy=None):
         if filepath == '' or filepath is None:
             print('Unable to save file, no filepath')
             return
@@ -27,8 +84,15 @@ class ProjectModel:
 
         if not ignore_dir:
             settings.set_single(self.log_key, 'directory', os.path.dirname(filepath))
-        with open(filepath, 'rb') as fh:
-            proj = pickle.load(fh)
+        with gc_paused(), open(filepath, 'rb') as fh:
+            if fh.read(len(prj_magic)) != prj_magic:
+                # Projects saved before the chunked format are a single pickle
+                fh.seek(0)
+                return pickle.load(fh)
+            fh.seek(0)
+            if lazy is None:
+                lazy = settings[self.log_key].get('lazy_load', 'True') == 'True'
+            proj = self._read_chunked_project(fh, filepath, lazy)
 
         return proj
 
@@ -38,11 +102,134 @@ class ProjectModel:
             return
 
         settings.set_single(self.log_key, 'directory', os.path.dirname(filepath))
-        with open(filepath, 'wb') as file:
-            pickle.dump(proj, file)
+
+        scripts = proj.scts
+        # Scripts that were never loaded are copied from the file they would be loaded from, as long as they
+        # do not need to be updated to a newer project version first
+        reader = None
+        if isinstance(scripts, SCTScriptDict) and isinstance(scripts.loader, ScriptChunkReader):
+            if scripts.loader.version == proj.version:
+                reader = scripts.loader
+
+        # The scripts are saved separately from the rest of the project
+        proj_base = copy.copy(proj)
+        proj_base.scts = {}
+        with gc_paused():
+            chunks = [('', pickle.dumps(proj_base, protocol=pickle.HIGHEST_PROTOCOL))]
+            for name in scripts:
+                if reader is not None and not scripts.is_loaded(name):
+                    chunks.append((name, None))
+                    continue
+                chunks.append((name, pickle.dumps(scripts[name], protocol=pickle.HIGHEST_PROTOCOL)))
+
+        compress = settings[self.log_key].get('compress', 'True') == 'True'
+
+        def pack_chunk(chunk):
+            if chunk[1] is None:
+                return chunk[0], *reader.read_stored(chunk[0])
+            return self._pack_chunk(chunk, compress)
+
+        with ThreadPoolExecutor(max_workers=os.cpu_count()) as pool:
+            packed = list(pool.map(pack_chunk, chunks))
+
+        # Write to a temporary file first so that a failed save does not overwrite the previous one
+        temp_filepath = f'{filepath}.tmp'
+        with open(temp_filepath, 'wb') as file:
+            toc = self._write_chunked_project(file, proj.version, packed)
+        os.replace(temp_filepath, filepath)
+
+        # Scripts still to be loaded are now read from the new file
+        if isinstance(scripts, SCTScriptDict):
+            scripts.loader = ScriptChunkReader(filepath, proj.version, toc)
 
         print(f'{self.log_key}: Project Saved: {filepath}')
 
+    # ---------------------------- #
+    # Chunked project file methods #
+    # ---------------------------- #
+
+    def _pack_chunk(self, chunk: Tuple[str, bytes], compress: bool) -> Tuple[str, bytes, int, bool]:
+        name, data = chunk
+        if compress:
+            packed = zlib.compress(data, self.compress_level)
+            if len(packed) < len(data):
+                return name, packed, len(data), True
+        return name, data, len(data), False
+
+    @staticmethod
+    def unpack_chunk(data: bytes, size: int, compressed: bool) -> bytes:
+        if compressed:
+            data = zlib.decompress(data)
+        if len(data) != size:
+            raise ValueError(f'Project chunk is {len(data)} bytes, expected {size}')
+        return data
+
+    @staticmethod
+    def _write_chunked_project(file, version: int, packed: List[Tuple[str, bytes, int, bool]]):
+        """Writes the chunks and returns the table of contents, as given by read_project_header"""
+        names = [chunk[0].encode('utf-8') for chunk in packed]
+        offset = prj_header.size + sum(prj_toc_entry.size + len(name) for name in names)
+        file.write(prj_header.pack(prj_magic, prj_format_version, version, len(packed)))
+        toc = []
+        for name, (str_name, data, size, compressed) in zip(names, packed):
+            file.write(prj_toc_entry.pack(offset, len(data), size, compressed, len(name)))
+            file.write(name)
+            toc.append((str_name, offset, len(data), size, compressed))
+            offset += len(data)
+        for _, data, _, _ in packed:
+            file.write(data)
+        return toc
+
+    @staticmethod
+    def read_project_header(file) -> Tuple[int, int, List[Tuple[str, int, int, int, bool]]]:
+        """Reads the header and table of contents of a chunked project file. Returns the file format version,
+        the project version, and (name, offset, stored size, size, is compressed) for each chunk"""
+        magic, format_version, version, chunk_num = prj_header.unpack(file.read(prj_header.size))
+        if magic != prj_magic:
+            raise ValueError('Not a chunked project file')
+        if format_version > prj_format_version:
+            raise ValueError(f'Project file format v{format_version} is newer than the supported '
+                             f'v{prj_format_version}, please update SALSA to read this project')
+        toc = []
+        for _ in range(chunk_num):
+            offset, stored_size, size, compressed, name_len = prj_toc_entry.unpack(file.read(prj_toc_entry.size))
+            toc.append((file.read(name_len).decode('utf-8'), offset, stored_size, size, compressed))
+        return format_version, version, toc
+
+    def _read_chunked_project(self, file, filepath, lazy=False):
+        try:
+            _, version, toc = self.read_project_header(file)
+        except (ValueError, struct.error) as e:
+            print(f'{self.log_key}: Unable to read project: {e}')
+            return None
+
+        # Only the project chunk is read when scripts are loaded as they are needed
+        stored = []
+        for _, offset, stored_size, size, compressed in (toc[:1] if lazy else toc):
+            file.seek(offset)
+            stored.append((file.read(stored_size), size, compressed))
+
+        try:
+            with ThreadPoolExecutor(max_workers=os.cpu_count()) as pool:
+                chunks = list(pool.map(lambda chunk: self.unpack_chunk(*chunk), stored))
+        except (ValueError, zlib.error) as e:
+            print(f'{self.log_key}: Unable to read project: {e}')
+            return None
+
+        proj = pickle.loads(chunks[0])
+        if proj.version != version:
+            print(f'{self.log_key}: Project version v{proj.version} does not match the file header v{version}')
+
+        if lazy:
+            names = [entry[0] for entry in toc[1:]]
+            proj.scts = SCTScriptDict(names, loader=ScriptChunkReader(filepath, version, toc))
+            return proj
+
+        for (name, *_), chunk in zip(toc[1:], chunks[1:]):
+            proj.scts[name] = pickle.loads(chunk)
+
+        return proj
+
     def get_project_directory(self):
         return settings[self.log_key].get('directory', None)
 
@@ -1,11 +1,25 @@
+import hashlib
+import json
+import multiprocessing as mp
 import os
+import pickle
 import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed, wait, FIRST_COMPLETED
+from typing import List, Dict, Tuple
+
+from SALSA.Project.project_container import SCTScript, SCTSection, SCTParameter
 
 from SALSA.Common.setting_class import settings
+from SALSA.AKLZ import aklz
 from SALSA.AKLZ.aklz import Aklz
 from SALSA.Scripts.script_decoder import SCTDecoder
 from SALSA.Scripts.script_encoder import SCTEncoder
 
+export_manifest_name = 'salsa_export_manifest.json'
+export_manifest_version = 1
+
 
 class SCTModel:
     """Creates an object which can read in and decode *.sct files based on an instruction object"""
@@ -24,38 +38,218 @@ class SCTModel:
             return settings[self.log_key]['directory']
         return ''
 
-    def export_script_as_sct(self, filepath, script, base_insts, options, compress=False):
+    def export_script_as_sct(self, filepath, script, base_insts, options, compress=False, compress_mode='best'):
         print(f'Exporting {script.name}...', end='\r')
-        sct_file = SCTEncoder.encode_sct_file_from_project_script(project_script=script, base_insts=base_insts, **options)
-        self.save_sct_file(filepath=filepath, sct_file=sct_file, compress=compress)
+        results = list(self.export_scts({script.name: (script, filepath)}, base_insts, options, compress=compress,
+                                        compress_mode=compress_mode, max_workers=1))
+        return len(results) > 0 and results[0][1]
+
+    def export_scts(self, scripts: Dict[str, Tuple[SCTScript, str]], base_insts, options, compress=False,
+                    compress_mode='best', status: queue.SimpleQueue = None, max_workers=None):
+        """Encodes, compresses and saves scripts in a process pool, yielding (name, saved) for each script as it
+        finishes. scripts maps each script name to (script, filepath). Encoding errors and offsets are copied back
+        onto the given scripts, as when exporting them one at a time.
+
+        Scripts whose content, export settings and file on disk match the export manifest of their directory are not
+        exported again. Content hashes are taken from the scripts as they are now, since not every edit marks its
+        script as changed. Offsets set by encoding are left out of the hash, so a script hashes the same before and
+        after it is exported"""
+        if len(scripts) == 0:
+            return
+
+        settings_hash = _get_export_settings_hash(base_insts, options, compress, compress_mode)
+        manifests = {}
+        to_export = {}
+        num_done = 0
+        for name, (script, filepath) in scripts.items():
+            directory, filename = os.path.split(filepath)
+            if directory not in manifests:
+                manifests[directory] = self.load_export_manifest(directory)
+            entry = manifests[directory].get(filename, None)
+            if entry is not None and entry.get('content', None) == get_script_content_hash(script) and \
+                    entry.get('settings', None) == settings_hash and _is_file_unchanged(filepath, entry):
+                num_done += 1
+                if status is not None:
+                    status.put({'msg': f'Exporting scripts: {num_done}/{len(scripts)}',
+                                'sub_msg': f'{name} (unchanged)'})
+                yield name, True
+                continue
+            manifests[directory].pop(filename, None)
+            to_export[name] = (script, filepath)
+
+        if len(to_export) == 0:
+            return
+        if max_workers is None:
+            max_workers = os.cpu_count() or 1
+        max_workers = min(max_workers, len(to_export))
+
+        start_time = time.perf_counter()
+        bytes_out = 0
+
+        def report(name):
+            if status is None:
+                return
+            elapsed = max(time.perf_counter() - start_time, 1e-6)
+            status.put({'msg': f'Exporting scripts: {num_done}/{len(scripts)}',
+                        'sub_msg': f'{name} ({num_done / elapsed:.1f} scripts/s, '
+                                   f'{bytes_out / elapsed / 2**20:.2f} MB/s)'})
+
+        def save(name, sct_file, body_hash):
+            nonlocal bytes_out
+            script, filepath = scripts[name]
+            if not self.save_sct_file(filepath=filepath, sct_file=sct_file):
+                return False
+            bytes_out += len(sct_file)
+            directory, filename = os.path.split(filepath)
+            manifests[directory][filename] = {'content': get_script_content_hash(script), 'settings': settings_hash,
+                                              'body': body_hash, 'output': _get_hash(sct_file),
+                                              'size': len(sct_file)}
+            return True
+
+        try:
+            # A single worker would only add the cost of starting a process and copying the scripts
+            if max_workers == 1:
+                for name, (script, filepath) in to_export.items():
+                    if status is not None:
+                        status.put({'msg': f'Encoding {name}.sct'})
+                    sct_file, body_hash = _encode_sct_file(script, base_insts, options, compress, compress_mode,
+                                                           aklz.aklz_slow)
+                    saved = save(name, sct_file, body_hash)
+                    num_done += 1
+                    report(name)
+                    yield name, saved
+                return
+
+            # Scripts are copied to the workers when submitted, so only a few are in flight at once
+            max_in_flight = max_workers * 2
+            pending = iter(to_export.items())
+            with ProcessPoolExecutor(max_workers=max_workers, mp_context=mp.get_context('spawn'),
+                                     initializer=_init_worker, initargs=(base_insts, aklz.aklz_slow)) as pool:
+                in_flight = {}
+
+                def submit_next():
+                    item = next(pending, None)
+                    if item is not None:
+                        name, (script, _) = item
+                        in_flight[pool.submit(_export_sct_worker, script, options, compress, compress_mode)] = name
 
-    def save_sct_file(self, filepath, sct_file, compress=False):
+                for _ in range(max_in_flight):
+                    submit_next()
+
+                while len(in_flight) > 0:
+                    done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        name = in_flight.pop(future)
+                        submit_next()
+                        num_done += 1
+                        try:
+                            sct_file, body_hash, errors, offsets = future.result()
+                        except Exception as e:
+                            print(f'{self.log_key}: Unable to export {name}: {e}')
+                            yield name, False
+                            continue
+                        _apply_export_results(scripts[name][0], errors, offsets)
+                        saved = save(name, sct_file, body_hash)
+                        report(name)
+                        yield name, saved
+        finally:
+            for directory, manifest in manifests.items():
+                self.save_export_manifest(directory, manifest)
+
+    def load_export_manifest(self, directory) -> Dict[str, dict]:
+        """Returns the hashes of the scripts last exported to a directory, by file name"""
+        filepath = os.path.join(directory, export_manifest_name)
+        if not os.path.exists(filepath):
+            return {}
+        try:
+            with open(filepath, 'r') as fh:
+                manifest = json.load(fh)
+        except (OSError, ValueError) as e:
+            print(f'{self.log_key}: Unable to read export manifest, all scripts will be exported: {e}')
+            return {}
+        if not isinstance(manifest, dict) or manifest.get('version', None) != export_manifest_version:
+            return {}
+        return manifest.get('scripts', {})
+
+    def save_export_manifest(self, directory, scripts: Dict[str, dict]):
+        if not os.path.isdir(directory):
+            return
+        filepath = os.path.join(directory, export_manifest_name)
+        try:
+            with open(filepath, 'w') as fh:
+                json.dump({'version': export_manifest_version, 'scripts': scripts}, fh, indent=1)
+        except OSError as e:
+            print(f'{self.log_key}: Unable to save export manifest: {e}')
+
+    def save_sct_file(self, filepath, sct_file, compress=False, compress_mode='best'):
         path_dir = os.path.dirname(filepath)
         if not os.path.exists(path_dir):
             print(f'{self.log_key}: Unable to save, directory does not exist: {path_dir}')
-            return
+            return False
 
         if compress:
             print(f'{self.log_key}: Compressing sct file')
-            sct_file = Aklz.compress(sct_file)
+            sct_file = Aklz.compress(sct_file, mode=compress_mode)
             print(f'{self.log_key}: Finished compressing sct file')
 
         with open(filepath, 'wb') as sct:
             sct.write(sct_file)
 
         print(f'{self.log_key}: SCT file saved to {filepath}')
+        return True
+
+    def load_scts(self, insts, files: List[str], status: queue.SimpleQueue = None, max_workers=None):
+        """Decodes sct files in a process pool, one file per task, yielding (name, script) as each finishes.
+        The progress of each file in the workers is passed on to status as its sub message"""
+        if len(files) == 0:
+            return
+        if max_workers is None:
+            max_workers = os.cpu_count() or 1
+        max_workers = min(max_workers, len(files))
 
-    def load_sct(self, insts, file: str, status: queue.SimpleQueue = None):
-        out = self.read_sct_file(file)
-        if out is None:
-            return None
-        name = out[0]
-        status.put({'msg': f'Decoding script file: {name}'})
-        sct_raw = out[1]
-        sct_out = SCTDecoder.decode_sct_from_file(name=name, sct=sct_raw, inst_lib=insts, status=status)
-        return name, sct_out
-
-    def read_sct_file(self, filepath: str, use_slow=False) -> (str, bytearray):
+        if status is not None:
+            status.put({'msg': f'Decoding script files: 0/{len(files)}', 'sub_msg': ''})
+
+        # Workers are spawned so that they do not inherit the state of the GUI threads
+        mp_context = mp.get_context('spawn')
+        manager = None
+        progress_queue = None
+        forwarder = None
+        if status is not None:
+            manager = mp_context.Manager()
+            progress_queue = manager.Queue()
+            forwarder = threading.Thread(target=_forward_progress, args=(progress_queue, status), daemon=True)
+            forwarder.start()
+
+        scpt_hits = scpt_misses = 0
+        try:
+            with ProcessPoolExecutor(max_workers=max_workers, mp_context=mp_context, initializer=_init_worker,
+                                     initargs=(insts, aklz.aklz_slow, progress_queue)) as pool:
+                futures = {pool.submit(_decode_sct_worker, filepath): filepath for filepath in files}
+                for num_done, future in enumerate(as_completed(futures), start=1):
+                    filepath = futures[future]
+                    try:
+                        name, script, (hits, misses) = future.result()
+                    except Exception as e:
+                        print(f'{self.log_key}: Unable to decode {filepath}: {e}')
+                        continue
+                    scpt_hits += hits
+                    scpt_misses += misses
+                    if status is not None:
+                        status.put({'msg': f'Decoding script files: {num_done}/{len(files)}', 'sub_msg': name})
+                    yield name, script
+        finally:
+            if manager is not None:
+                progress_queue.put(None)
+                forwarder.join()
+                manager.shutdown()
+
+        lookups = scpt_hits + scpt_misses
+        if lookups > 0:
+            print(f'{self.log_key}: SCPT analysis cache hit rate: {scpt_hits / lookups:.1%} '
+                  f'({scpt_hits}/{lookups} lookups)')
+
+    def read_sct_file(self, filepath: str, use_slow=False, status: queue.SimpleQueue = None) -> (str, bytearray):
         if '/' not in filepath:
             filename = filepath.split('.')[0]
             if 'directory' not in settings[self.log_key]:
@@ -65,13 +259,144 @@ class SCTModel:
             filepath = os.path.join(directory, filepath)
         else:
             filename = filepath.split('/')[-1].split('.')[0]
-        if os.path.exists(filepath):
-            with open(filepath, 'rb') as fh:
-                ba = bytearray(fh.read())
-        else:
+        if not os.path.exists(filepath):
             raise FileExistsError(f'{self.log_key}: {filename} does not exist.')
 
-        if Aklz.is_compressed(ba):
-            ba = Aklz.decompress(ba)
+        progress_callback = None
+        if status is not None:
+            status.put({'msg': f'Reading script file: {filename}'})
+            last_percent = -1
+
+            def progress_callback(progress):
+                nonlocal last_percent
+                percent = int(progress * 100)
+                if percent != last_percent:
+                    last_percent = percent
+                    status.put({'sub_msg': f'Decompressing... {percent}%'})
+
+        with open(filepath, 'rb') as fh:
+            ba = Aklz.decompress_from_file(fh, progress_callback=progress_callback, use_slow=use_slow)
 
         return filename, ba
+
+
+_worker_insts = None
+_worker_use_slow = False
+_worker_progress = None
+
+
+def _init_worker(insts, use_slow, progress_queue=None):
+    global _worker_insts, _worker_use_slow, _worker_progress
+    _worker_insts = insts
+    _worker_use_slow = use_slow
+    _worker_progress = progress_queue
+
+
+class _FileStatus:
+    """Status queue for one file decoded in a worker. Messages are put on the progress queue of load_scts as
+    sub messages naming the file, since the main message shows the progress of all files"""
+
+    def __init__(self, progress_queue, filepath):
+        self.progress_queue = progress_queue
+        self.filename = os.path.basename(filepath)
+
+    def put(self, item):
+        text = item.get('sub_msg', item.get('msg', ''))
+        self.progress_queue.put({'sub_msg': f'{self.filename}: {text}'})
+
+
+def _forward_progress(progress_queue, status):
+    while True:
+        item = progress_queue.get()
+        if item is None:
+            return
+        status.put(item)
+
+
+def _decode_sct_worker(filepath):
+    # The SCPT cache is kept by the worker between files, so only the lookups for this file are returned
+    hits, misses = SCTDecoder.get_scpt_cache_counts()
+    status = None if _worker_progress is None else _FileStatus(_worker_progress, filepath)
+    name, sct_raw = SCTModel().read_sct_file(filepath, use_slow=_worker_use_slow, status=status)
+    script = SCTDecoder.decode_sct_from_file(name=name, sct=sct_raw, inst_lib=_worker_insts, status=status)
+    end_hits, end_misses = SCTDecoder.get_scpt_cache_counts()
+    return name, script, (end_hits - hits, end_misses - misses)
+
+
+def _encode_sct_file(script, base_insts, options, compress, compress_mode, use_slow):
+    sct_file = SCTEncoder.encode_sct_file_from_project_script(project_script=script, base_insts=base_insts, **options)
+    body_hash = _get_hash(sct_file)
+    if compress:
+        sct_file = Aklz.compress(sct_file, use_slow=use_slow, mode=compress_mode)
+    return sct_file, body_hash
+
+
+def _export_sct_worker(script, options, compress, compress_mode):
+    sct_file, body_hash = _encode_sct_file(script, _worker_insts, options, compress, compress_mode, _worker_use_slow)
+    errors = [e for e in script.errors if 'Encoding' in e]
+    offsets = {}
+    for name, section in script.sects.items():
+        offsets[name] = (section.absolute_offset, {i_id: inst.absolute_offset for i_id, inst in section.insts.items()})
+    return sct_file, body_hash, errors, offsets
+
+
+def _apply_export_results(script, errors, offsets):
+    # Replaces the encoding errors and offsets of the exported script with those of the copy that was encoded
+    script.errors[:] = [e for e in script.errors if 'Encoding' not in e]
+    script.errors.extend(errors)
+    for name, (sect_offset, inst_offsets) in offsets.items():
+        section = script.sects.get(name, None)
+        if section is None:
+            continue
+        section.absolute_offset = sect_offset
+        for inst_id, inst_offset in inst_offsets.items():
+            if inst_id in section.insts:
+                section.insts[inst_id].absolute_offset = inst_offset
+
+
+def _get_hash(data) -> str:
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def get_script_content_hash(script: SCTScript) -> str:
+    """Hashes what the encoder reads from a script, any change to it gives a different hash. The content is walked
+    explicitly, so a script hashes the same however its objects are laid out, as after saving and reopening a project.
+    Offsets, errors and link ids are left out since they are set by encoding or differ between sessions"""
+    content = (script.name, tuple(script.sect_list), tuple(script.strings.items()),
+               tuple((name, tuple(group)) for name, group in script.string_groups.items()),
+               tuple(script.string_garbage.items()),
+               tuple(_get_section_content(script.sects[name]) for name in script.sect_list))
+    return _get_hash(repr(content).encode('utf-8'))
+
+
+def _get_section_content(section: SCTSection) -> tuple:
+    insts = []
+    for inst_id in section.inst_list:
+        inst = section.insts[inst_id]
+        garbage = tuple(e for e in inst.errors if e[0] == 'Garbage')
+        delay = None if inst.delay_param is None else _get_param_content(inst.delay_param)
+        params = tuple((p_id, _get_param_content(param)) for p_id, param in inst.params.items())
+        l_params = tuple(tuple((p_id, _get_param_content(param)) for p_id, param in loop.items())
+                         for loop in inst.l_params)
+        insts.append((inst_id, inst.base_id, inst.skip_refresh, inst.encode_inst, inst.label, garbage, delay, params,
+                      l_params))
+    return section.name, section.type, section.is_compound, tuple(section.garbage.items()), tuple(insts)
+
+
+def _get_param_content(param: SCTParameter) -> tuple:
+    target = None if param.link is None or param.link.target_trace is None else tuple(param.link.target_trace)
+    return (param.ID, param.type, param.value, param.override, param.linked_string, param.arithmetic_value,
+            target)
+
+
+def _get_export_settings_hash(base_insts, options, compress, compress_mode) -> str:
+    # The base instructions are included since editing them changes how scripts are encoded
+    settings_key = (sorted(options.items()), compress, compress_mode if compress else None)
+    return _get_hash(pickle.dumps((settings_key, base_insts.lib), protocol=pickle.HIGHEST_PROTOCOL))
+
+
+def _is_file_unchanged(filepath, entry) -> bool:
+    if not os.path.exists(filepath) or os.path.getsize(filepath) != entry.get('size', None):
+        return False
+    with open(filepath, 'rb') as fh:
+        return _get_hash(fh.read()) == entry.get('output', None)
@@ -101,6 +101,8 @@ class ProjectEditorController:
 
         self.cur_mem_offset = 0
         self.script_refresh_offset_queue = []
+        # Sections changed in each queued script, None if the whole script needs its offsets refreshed
+        self.script_refresh_offset_starts = {}
         self.encoding_errors = []
 
         self.trees: Dict[str, DataTreeview] = {
@@ -134,10 +136,21 @@ class ProjectEditorController:
     def delay_set_refresh_flag(self, delay):
         self.view.after(delay, self.set_refresh_flag)
 
-    def set_refresh_flag(self, script=None):
-        script = self.current.get('script', None) if script is None else script
-        if script not in self.script_refresh_offset_queue and script is not None:
-            self.script_refresh_offset_queue.append(script)
+    def set_refresh_flag(self, script=None, section=None):
+        # Changes without a script are to the current section, changes to a script without a section refresh all of it
+        if script is None:
+            script = self.current.get('script', None)
+            section = self.current.get('section', None) if section is None else section
+        if script is not None:
+            self.project.set_section_changed(script, section)
+            if script not in self.script_refresh_offset_queue:
+                self.script_refresh_offset_queue.append(script)
+                self.script_refresh_offset_starts[script] = set()
+            changed_sections = self.script_refresh_offset_starts.get(script, None)
+            if section is None:
+                self.script_refresh_offset_starts[script] = None
+            elif changed_sections is not None:
+                changed_sections.add(section)
 
         self.set_has_changes()
 
@@ -1025,7 +1038,7 @@ class ProjectEditorController:
                                                           self.current['script'], self.current['section'],
                                                           cur_inst_uuid))
             self.project.remove_inst(self.current['script'], self.current['section'], cur_inst_uuid, None)
-        self.set_refresh_flag(self.current['script'])
+        self.set_refresh_flag(self.current['script'], self.current['section'])
 
     def finish_remove_inst(self, result, cur_inst_uuid, remaining_sel_iids):
         if result is None:
@@ -1036,7 +1049,7 @@ class ProjectEditorController:
         if len(remaining_sel_iids) > 0:
             self.rcm_remove_inst(remaining_sel_iids)
         else:
-            self.set_refresh_flag(self.current['script'])
+            self.set_refresh_flag(self.current['script'], self.current['section'])
 
     def rcm_change_inst(self):
         sel_iid = self.trees['instruction'].focus()
@@ -1078,7 +1091,7 @@ class ProjectEditorController:
             if inst_uuid is None:
                 continue
             self.project.set_encode_flag(self.current['script'], self.current['section'], inst_uuid, value)
-        self.set_refresh_flag(self.current['script'])
+        self.set_refresh_flag(self.current['script'], self.current['section'])
         self.refresh_tree('instruction')
 
     # -------------------------------------- #
@@ -11,7 +11,7 @@ class SCTExportPopup(tk.Toplevel):
     t = 'Export Script(s) as SCT file'
     log_key = 'SCTExportPopup'
     w = 250
-    h = 400
+    h = 460
 
     option_settings_check = {
         'use_garbage': {'text': 'Add garbage from original files', 'default': 'True'},
@@ -20,7 +20,8 @@ class SCTExportPopup(tk.Toplevel):
         'compress_aklz': {'text': 'Compress file using AKLZ compression', 'default': 'False'}
     }
     option_settings_radio = {
-        'system': {'label': 'Select target system:', 'entries': ['Dreamcast', 'GameCube'], 'default': 'GameCube'}
+        'system': {'label': 'Select target system:', 'entries': ['Dreamcast', 'GameCube'], 'default': 'GameCube'},
+        'aklz_mode': {'label': 'AKLZ compression:', 'entries': ['Fast', 'Best'], 'default': 'Best'}
     }
 
     def __init__(self, parent, callbacks, name, selected, theme, *args, **kwargs):
@@ -165,6 +166,7 @@ class SCTExportPopup(tk.Toplevel):
             'combine_footer_links': self.option_vars['combine_footer'].get() == 'True',
             'add_spurious_refresh': self.option_vars['all_refresh'].get() == 'True',
             'compress_aklz': compress,
+            'aklz_mode': self.option_vars['aklz_mode'].get().lower(),
             'endian': 'little' if self.option_vars['system'].get() == 'Dreamcast' else 'big'
         }
         scripts = [self.script_ids[int(s)] for s in self.scripts.selection()]
@@ -13,14 +13,32 @@ class ProjectUpdater:
 
     log_key = 'PrjUpdater'
 
+    def __init__(self, include_scripts=True):
+        self.include_scripts = include_scripts
+
     @classmethod
-    def update_project(cls, prj: SCTProject) -> SCTProject:
-        updater = cls()
+    def update_project(cls, prj: SCTProject, include_scripts=True) -> SCTProject:
+        """Updates the project to the current version. If include_scripts is False, only the project itself is
+        updated and each script must be updated with update_script"""
+        updater = cls(include_scripts=include_scripts)
         while prj.version in update_tasks:
             prj = updater._upgrade_version(prj)
             prj.version += 1
         return prj
 
+    @classmethod
+    def update_script(cls, script: SCTScript, version: int) -> SCTScript:
+        """Updates a single script saved at the given project version"""
+        updater = cls()
+        script_level = p_levels.index(PP.script)
+        while version in update_tasks:
+            # Versions that only change the project itself are skipped
+            if p_levels.index(p_max_depth[version]) >= script_level:
+                script = updater._upgrade_version(script, cur_version=version, p_level_ind=script_level,
+                                                  tasks=update_tasks[version])
+            version += 1
+        return script
+
     def _upgrade_version(self, p_piece: Union[SCTProject, SCTScript, SCTSection, SCTParameter, SCTInstruction, SCTLink],
                          cur_version=None, p_level_ind=0, tasks=None, cur_script=None):
         if cur_script is None and isinstance(p_piece, SCTScript):
@@ -40,11 +58,14 @@ class ProjectUpdater:
         if p_level == PP.section:
             print(f'{self.log_key}: Now updating section: {p_piece.name}', end='\r')
 
-        if p_level != max_level and p_level_ind + 1 < len(p_levels):
+        # Scripts that are loaded later are updated on their own by update_script
+        skip_children = p_level == PP.project and not self.include_scripts
+
+        if not skip_children and p_level != max_level and p_level_ind + 1 < len(p_levels):
 
             p_attr_name = p_attrs[cur_version][p_level_ind]
-            if p_attr_name in p_piece.__dict__:
-                child_entries = p_piece.__getattribute__(p_attr_name)
+            if self._has_attr(p_piece, p_attr_name):
+                child_entries = self._get_attr(p_piece, p_attr_name)
 
                 not_dict = False
                 if not isinstance(child_entries, dict):
@@ -62,21 +83,21 @@ class ProjectUpdater:
                 if not_dict:
                     updated_children = updated_children[nd_index]
 
-                p_piece.__setattr__(p_attr_name, updated_children)
+                self._set_attr(p_piece, p_attr_name, updated_children)
 
         # Handle loop parameters of instructions since those won't be captured by the other recursive section above
         if p_level == PP.instruction and p_level != max_level:
             loop_params = []
             loop_attr_name = loop_attrs[cur_version]
-            if loop_attr_name in p_piece.__dict__:
-                for loop in p_piece.__getattribute__(loop_attr_name):
+            if self._has_attr(p_piece, loop_attr_name):
+                for loop in self._get_attr(p_piece, loop_attr_name):
                     new_loop = {}
                     for param_id, param in loop.items():
                         param = self._upgrade_version(p_piece=param, cur_version=cur_version, cur_script=cur_script,
                                                       p_level_ind=p_level_ind + 1, tasks=tasks)
                         new_loop[param_id] = param
                     loop_params.append(new_loop)
-                p_piece.__setattr__(loop_attr_name, loop_params)
+                self._set_attr(p_piece, loop_attr_name, loop_params)
 
         if p_level in tasks:
             for task_num, task in tasks[p_level].items():
@@ -89,6 +110,27 @@ class ProjectUpdater:
 
         return p_piece
 
+    @staticmethod
+    def _has_attr(cur_piece, attr):
+        # Instructions and parameters keep their attributes in slots rather than __dict__
+        if hasattr(cur_piece, '__dict__'):
+            return attr in cur_piece.__dict__
+        return cur_piece.has_attr(attr)
+
+    @staticmethod
+    def _get_attr(cur_piece, attr):
+        # Containers of instructions and parameters that were never written to are read as real empty containers
+        if hasattr(cur_piece, '__dict__'):
+            return getattr(cur_piece, attr)
+        return cur_piece.get_attr(attr)
+
+    @staticmethod
+    def _set_attr(cur_piece, attr, value):
+        if hasattr(cur_piece, '__dict__'):
+            setattr(cur_piece, attr, value)
+        else:
+            cur_piece.set_attr(attr, value)
+
     @staticmethod
     def _retype_link_v1(cur_piece):
         if cur_piece.link is None:
@@ -105,24 +147,24 @@ class ProjectUpdater:
     @staticmethod
     def _del_attr(cur_piece, *attrs):
         for attr in attrs:
-            if attr in cur_piece.__dict__:
+            if ProjectUpdater._has_attr(cur_piece, attr):
                 cur_piece.__delattr__(attr)
         return cur_piece
 
     @staticmethod
     def _add_attr(cur_piece, *attrs):
         for new_attr in attrs:
-            if new_attr[0] not in cur_piece.__dict__:
-                setattr(cur_piece, new_attr[0], new_attr[1])
+            if not ProjectUpdater._has_attr(cur_piece, new_attr[0]):
+                ProjectUpdater._set_attr(cur_piece, new_attr[0], new_attr[1])
         return cur_piece
 
     @staticmethod
     def _change_attribute_names(cur_piece, *changes):
         for change in changes:
             old_attr = change[0]
-            if old_attr in cur_piece.__dict__:
+            if ProjectUpdater._has_attr(cur_piece, old_attr):
                 new_attr = change[1]
-                setattr(cur_piece, new_attr, getattr(cur_piece, old_attr))
+                ProjectUpdater._set_attr(cur_piece, new_attr, ProjectUpdater._get_attr(cur_piece, old_attr))
                 cur_piece.__delattr__(old_attr)
         return cur_piece
 
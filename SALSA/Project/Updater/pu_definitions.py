@@ -1,5 +1,14 @@
 from SALSA.Project.Updater.pu_constants import PP, UP
 
+v8 = {
+    PP.project: {
+        1: {
+            UP.callable: '_add_attr',
+            UP.arguments: [('var_usage', None)]
+        }
+    }
+}
+
 v7 = {
     PP.project: {
         1: {
@@ -115,7 +124,8 @@ update_tasks = {
     3: v4,
     4: v5,
     5: v6,
-    6: v7
+    6: v7,
+    7: v8
 }
 
 p_max_depth = {
@@ -124,5 +134,6 @@ p_max_depth = {
     3: PP.script,
     4: PP.parameter,
     5: PP.instruction,
-    6: PP.project
+    6: PP.project,
+    7: PP.project
 }
@@ -1,13 +1,232 @@
+import threading
 import uuid
-from copy import copy
-from itertools import count
+from copy import copy, deepcopy
+from collections import deque
+from itertools import count, repeat
 from dataclasses import dataclass, field as dc_field
-from typing import List, Union, Dict, Tuple, Literal
+from typing import List, Union, Dict, Tuple, Literal, Callable
 
 from SALSA.Common.constants import sep, uuid_sep
 from SALSA.Scripts import scpt_condition_changes as cond_changes
 
 
+class _Unallocated:
+    """Stands in for a container attribute that has not been created yet. Reads behave like an empty container,
+    writes create the container on the owner first. It is not an instance of the container type and has no buffer
+    protocol, so isinstance checks, memoryview and json see the proxy until the container is written to. Use
+    _CompactContainer.get_attr where a real container is needed"""
+
+    __slots__ = ('_owner', '_attr')
+
+    _mutators = {'append', 'extend', 'insert', 'remove', 'pop', 'clear', 'sort', 'reverse',
+                 'update', 'setdefault', 'popitem'}
+
+    def __init__(self, owner, attr):
+        self._owner = owner
+        self._attr = attr
+
+    def _peek(self):
+        value = getattr(self._owner, self._attr.slot)
+        return self._attr.factory() if value is None else value
+
+    def _allocate(self):
+        return self._attr.allocate(self._owner)
+
+    def __getattr__(self, name):
+        if name in self._mutators:
+            return getattr(self._allocate(), name)
+        return getattr(self._peek(), name)
+
+    def __len__(self):
+        return len(self._peek())
+
+    def __iter__(self):
+        return iter(self._peek())
+
+    def __reversed__(self):
+        return reversed(self._peek())
+
+    def __contains__(self, item):
+        return item in self._peek()
+
+    def __getitem__(self, item):
+        return self._peek()[item]
+
+    def __setitem__(self, key, value):
+        self._allocate()[key] = value
+
+    def __delitem__(self, key):
+        del self._allocate()[key]
+
+    def __iadd__(self, other):
+        value = self._allocate()
+        value += other
+        return value
+
+    def __add__(self, other):
+        return self._peek() + other
+
+    def __radd__(self, other):
+        return other + self._peek()
+
+    def __bool__(self):
+        return len(self._peek()) > 0
+
+    def __eq__(self, other):
+        return self._peek() == other
+
+    __hash__ = None
+
+    def __repr__(self):
+        return repr(self._peek())
+
+    def __copy__(self):
+        return copy(self._peek())
+
+    def __deepcopy__(self, memo):
+        return deepcopy(self._peek(), memo)
+
+    def __reduce_ex__(self, protocol):
+        return self._peek().__reduce_ex__(protocol)
+
+
+class _LazyContainer:
+    """Container attribute kept in the slot '_<name>', which stays None until the container is written to"""
+
+    __slots__ = ('slot', 'factory')
+
+    def __init__(self, factory):
+        self.factory = factory
+        self.slot = None
+
+    def __set_name__(self, owner, name):
+        self.slot = f'_{name}'
+
+    def __get__(self, obj, objtype=None):
+        if obj is None:
+            return self
+        value = getattr(obj, self.slot)
+        return _Unallocated(obj, self) if value is None else value
+
+    def __set__(self, obj, value):
+        setattr(obj, self.slot, value)
+
+    def __delete__(self, obj):
+        setattr(obj, self.slot, None)
+
+    def allocate(self, obj):
+        value = getattr(obj, self.slot)
+        if value is None:
+            value = self.factory()
+            setattr(obj, self.slot, value)
+        return value
+
+
+class _CompactContainer:
+    """Base for the project containers that exist once per instruction or parameter. Attributes are kept in slots,
+    empty containers are only created when written to, and attributes from older project versions are kept
+    in _legacy so that ProjectUpdater can still rename or remove them"""
+
+    __slots__ = ('_legacy',)
+
+    # Attributes that are saved with the object, in order
+    _fields: Tuple[str, ...] = ()
+    # Values given to attributes that are missing from a saved object
+    _defaults: Dict[str, object] = {}
+    # Attributes derived from others, which are not saved
+    _computed: Tuple[str, ...] = ()
+    # Slots that are saved, set for each subclass
+    _state_names: Tuple[str, ...] = ()
+
+    def __getattr__(self, name):
+        # Only called when an attribute is not found normally
+        if name != '_legacy':
+            legacy = self._legacy
+            if legacy is not None and name in legacy:
+                return legacy[name]
+        raise AttributeError(f"'{type(self).__name__}' object has no attribute '{name}'")
+
+    def __delattr__(self, name):
+        legacy = self._legacy
+        if legacy is not None and name in legacy:
+            legacy.pop(name)
+            if len(legacy) == 0:
+                self._legacy = None
+            return
+        object.__delattr__(self, name)
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._state_names = cls.__slots__ + _CompactContainer.__slots__
+
+    def __getstate__(self):
+        # Saved as the slot names and their values, the names tuple is only written once per pickle
+        return self._state_names, tuple(map(getattr, repeat(self), self._state_names))
+
+    def __setstate__(self, state):
+        if isinstance(state, tuple):
+            names, values = state
+            if names == self._state_names:
+                # Sets each slot without a python level loop
+                deque(map(setattr, repeat(self), names, values), 0)
+                return
+            state = self._state_from_slots(dict(zip(names, values)))
+
+        # Objects saved before slots were used
+        self._legacy = None
+        for name, value in self._defaults.items():
+            setattr(self, name, value)
+        for name, value in state.items():
+            if name in self._defaults:
+                # Empty containers from older saves are dropped so that they are only created when written to
+                if isinstance(getattr(type(self), name, None), _LazyContainer) and value is not None and len(value) == 0:
+                    continue
+                setattr(self, name, value)
+            elif name not in self._computed:
+                if self._legacy is None:
+                    self._legacy = {}
+                self._legacy[name] = value
+
+    def _state_from_slots(self, slots: dict) -> dict:
+        legacy = slots.pop('_legacy', None)
+        state = {}
+        for name, value in slots.items():
+            if name[0] == '_' and name[1:] in self._defaults:
+                name = name[1:]
+            state[name] = value
+        if legacy is not None:
+            state.update(legacy)
+        return state
+
+    def has_attr(self, name) -> bool:
+        """Returns whether the attribute is part of this object, in place of a check against __dict__"""
+        return name in self._defaults or (self._legacy is not None and name in self._legacy)
+
+    def set_attr(self, name, value):
+        """Sets an attribute, keeping it with the legacy attributes if it is not part of this version"""
+        if name in self._defaults:
+            setattr(self, name, value)
+            return
+        if self._legacy is None:
+            self._legacy = {}
+        self._legacy[name] = value
+
+    def get_attr(self, name):
+        """Returns an attribute with a container that has not been written to as a real empty container, in place
+        of getattr where the container type is checked"""
+        value = getattr(self, name)
+        return value._peek() if isinstance(value, _Unallocated) else value
+
+    def as_dict(self) -> dict:
+        """Returns all attributes by name, in place of __dict__"""
+        fields = {}
+        for name in (*self._fields, *self._computed):
+            fields[name] = self.get_attr(name)
+        if self._legacy is not None:
+            fields.update(self._legacy)
+        return fields
+
+
 @dataclass
 class SCTTrace:
     sect: str
@@ -56,7 +275,7 @@ class SCTLink:
         return True
 
 
-class SCTParameter:
+class SCTParameter(_CompactContainer):
 
     value: Union[int, float, str, dict, bytearray, None]
     formatted_value: str
@@ -66,23 +285,41 @@ class SCTParameter:
     link_value: (str, str)
     link: Union[None, SCTLink]
 
+    __slots__ = ('ID', 'type', 'link', '_errors', '_analyze_log', 'value', '_raw_bytes', 'linked_string', 'override',
+                 'arithmetic_value')
+
+    errors = _LazyContainer(list)
+    analyze_log = _LazyContainer(dict)
+    raw_bytes = _LazyContainer(bytearray)
+
+    _fields = ('ID', 'type', 'link', 'errors', 'analyze_log', 'value', 'raw_bytes', 'linked_string', 'override',
+               'arithmetic_value')
+    _defaults = {'ID': None, 'type': None, 'link': None, 'errors': None, 'analyze_log': None, 'value': None,
+                 'raw_bytes': None, 'linked_string': None, 'override': None, 'arithmetic_value': None}
+    _computed = ('formatted_value',)
+
     def __init__(self, _id, _type):
+        self._legacy = None
         self.ID = _id
         self.type = _type
         self.link = None
-        self.errors = []
-        self.analyze_log = {}
+        self._errors = None
+        self._analyze_log = None
         self.value = None
-        self.formatted_value = ''
-        self.raw_bytes = bytearray(b'')
+        self._raw_bytes = None
         self.linked_string = None
         self.override = None
         self.arithmetic_value = None
 
+    @property
+    def formatted_value(self) -> str:
+        if self.value is None:
+            return ''
+        return self._unpack_result_dict(self.value, 0) if isinstance(self.value, dict) else str(self.value)
+
     def set_value(self, value: Union[int, float, str, dict, bytearray], override_value=None):
         self.override = override_value
         self.value = value
-        self.formatted_value = self._unpack_result_dict(value, 0) if isinstance(value, dict) else str(value)
         if isinstance(value, int) or isinstance(value, float):
             self.set_arithmetic_result(value)
 
@@ -95,6 +332,19 @@ class SCTParameter:
     def set_param_log(self, log):
         self.analyze_log = log
 
+    def get_variables(self) -> List[str]:
+        """Returns the variables used by an SCPT value as '<var_type>: <var_id>' strings"""
+        return self._find_variables(self.value, [])
+
+    def _find_variables(self, cur_element, var_list):
+        if isinstance(cur_element, dict):
+            for value in cur_element.values():
+                self._find_variables(value, var_list)
+        elif isinstance(cur_element, str):
+            if 'Var:' in cur_element:
+                var_list.append(cur_element)
+        return var_list
+
     def _unpack_result_dict(self, cur_dict, level):
         returnValue = ''
         for key, value in cur_dict.items():
@@ -123,7 +373,7 @@ class SCTParameter:
         self.arithmetic_value = result
 
 
-class SCTInstruction:
+class SCTInstruction(_CompactContainer):
 
     errors: List[Tuple[str, Union[int, str, bytearray]]]
     links_out: List[SCTLink]
@@ -133,22 +383,43 @@ class SCTInstruction:
     ungrouped_position: int
     delay_param: Union[None, SCTParameter]
 
+    __slots__ = ('ID', 'base_id', 'absolute_offset', 'skip_refresh', 'delay_param', '_errors', '_links_out',
+                 '_links_in', '_params', '_l_params', 'condition', 'synopsis', 'ungrouped_position',
+                 '_my_goto_uuids', '_my_master_uuids', 'label', 'encode_inst')
+
+    errors = _LazyContainer(list)
+    links_out = _LazyContainer(list)
+    links_in = _LazyContainer(list)
+    params = _LazyContainer(dict)
+    l_params = _LazyContainer(list)
+    my_goto_uuids = _LazyContainer(list)
+    my_master_uuids = _LazyContainer(list)
+
+    _fields = ('ID', 'base_id', 'absolute_offset', 'skip_refresh', 'delay_param', 'errors', 'links_out', 'links_in',
+               'params', 'l_params', 'condition', 'synopsis', 'ungrouped_position', 'my_goto_uuids',
+               'my_master_uuids', 'label', 'encode_inst')
+    _defaults = {'ID': None, 'base_id': None, 'absolute_offset': None, 'skip_refresh': False, 'delay_param': None,
+                 'errors': None, 'links_out': None, 'links_in': None, 'params': None, 'l_params': None,
+                 'condition': '', 'synopsis': '', 'ungrouped_position': -1, 'my_goto_uuids': None,
+                 'my_master_uuids': None, 'label': '', 'encode_inst': True}
+
     def __init__(self):
+        self._legacy = None
         self.ID: str = str(uuid.uuid4()).replace('-', uuid_sep)
         self.base_id = None
         self.absolute_offset = None
         self.skip_refresh = False
         self.delay_param = None
-        self.errors = []
-        self.links_out = []
-        self.links_in = []
-        self.params = {}
-        self.l_params = []
+        self._errors = None
+        self._links_out = None
+        self._links_in = None
+        self._params = None
+        self._l_params = None
         self.condition = ''
         self.synopsis = ''
         self.ungrouped_position = -1
-        self.my_goto_uuids = []
-        self.my_master_uuids = []
+        self._my_goto_uuids = None
+        self._my_master_uuids = None
         self.label = ''
         self.encode_inst = True
 
@@ -369,12 +640,97 @@ class SCTScript:
         return [sect.name for sect in self.sects.values() if sect.type != 'String']
 
 
+class SCTScriptDict(dict):
+    """Scripts of a project by name, where each script is only loaded the first time it is accessed. Every name is
+    a key from the start, scripts that have not been loaded yet are held as None"""
+
+    def __init__(self, names=(), loader: Callable[[str], 'SCTScript'] = None):
+        super().__init__((name, None) for name in names)
+        self.loader = loader
+        # Called with (name, script) after a script is loaded
+        self.load_callbacks: List[Callable[[str, 'SCTScript'], None]] = []
+        self._lock = threading.RLock()
+
+    def _load(self, name):
+        with self._lock:
+            script = super().__getitem__(name)
+            if script is not None:
+                return script
+            script = self.loader(name)
+            # Stored before the callbacks run so that they can access the script through the project
+            super().__setitem__(name, script)
+            for callback in self.load_callbacks:
+                callback(name, script)
+            return script
+
+    def is_loaded(self, name) -> bool:
+        return super().get(name, None) is not None
+
+    def get_loaded(self) -> List[str]:
+        return [name for name, script in super().items() if script is not None]
+
+    def sort(self, key=None):
+        """Reorders the scripts by name without loading them"""
+        entries = sorted(super().items(), key=lambda e: e[0] if key is None else key(e[0]))
+        super().clear()
+        super().update(entries)
+
+    def __getitem__(self, name):
+        script = super().__getitem__(name)
+        return script if script is not None else self._load(name)
+
+    def get(self, name, default=None):
+        if name not in self:
+            return default
+        return self[name]
+
+    def values(self):
+        return [self[name] for name in self]
+
+    def items(self):
+        return [(name, self[name]) for name in self]
+
+    def pop(self, name, *default):
+        if name not in self:
+            return super().pop(name, *default)
+        script = self[name]
+        super().pop(name)
+        return script
+
+    def popitem(self):
+        name = next(reversed(self))
+        return name, self.pop(name)
+
+    def setdefault(self, name, default=None):
+        if name not in self:
+            self[name] = default
+        return self[name]
+
+    def copy(self):
+        return dict(self.items())
+
+    def __eq__(self, other):
+        return dict(self.items()) == other
+
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f'{type(self).__name__}({list(self.keys())}, loaded={self.get_loaded()})'
+
+    def __reduce__(self):
+        # Saved as a plain dictionary of every script
+        return dict, (self.copy(),)
+
+
 class SCTProject:
 
     file_name: str
     scts: Dict[str, SCTScript]
 
-    cur_version = 7
+    cur_version = 8
 
     def __init__(self):
         self.scts = {}
@@ -383,6 +739,57 @@ class SCTProject:
         self.global_variables = {'BitVar': {}, 'IntVar': {}, 'ByteVar': {}, 'FloatVar': {}}
         self.version = copy(self.cur_version)
         self.inst_id_colors: Dict[int, str] = {}
+        # Variable usages of every script, by (var_type, var_id): {script name: [(section, instruction, parameter)]}.
+        # Saved with the project so that scripts do not need to be loaded to find usages, None until first built
+        self.var_usage: Union[None, Dict[Tuple[str, int], Dict[str, List[tuple]]]] = None
+
+    def build_var_usage(self):
+        self.var_usage = {}
+        for name, script in self.scts.items():
+            self.add_script_var_usage(name, script)
+
+    def add_script_var_usage(self, name, script: SCTScript):
+        if self.var_usage is None:
+            return
+        self.remove_script_var_usage(name)
+        if not isinstance(script.variables, dict):
+            return
+        for var_type, var_dict in script.variables.items():
+            for var_id, var in var_dict.items():
+                if len(var.get('usage', [])) > 0:
+                    self.var_usage.setdefault((var_type, var_id), {})[name] = list(var['usage'])
+
+    def remove_script_var_usage(self, name):
+        if self.var_usage is None:
+            return
+        for key in [k for k, usage in self.var_usage.items() if name in usage]:
+            self.var_usage[key].pop(name)
+            if len(self.var_usage[key]) == 0:
+                self.var_usage.pop(key)
+
+    def add_var_usage(self, name, var_type, var_id, trace):
+        if self.var_usage is None:
+            return
+        self.var_usage.setdefault((var_type, var_id), {}).setdefault(name, []).append(trace)
+
+    def remove_var_usage(self, name, var_type, var_id, trace):
+        if self.var_usage is None:
+            return
+        usage = self.var_usage.get((var_type, var_id), {}).get(name, None)
+        if usage is None or trace not in usage:
+            return
+        usage.remove(trace)
+        if len(usage) == 0:
+            self.var_usage[(var_type, var_id)].pop(name)
+            if len(self.var_usage[(var_type, var_id)]) == 0:
+                self.var_usage.pop((var_type, var_id))
+
+    def get_var_usage(self, var_type, var_id) -> List[tuple]:
+        """Returns every usage of a variable as (script name, section, instruction, parameter), in script order"""
+        if self.var_usage is None:
+            self.build_var_usage()
+        usage = self.var_usage.get((var_type, var_id), {})
+        return [(name, *trace) for name in self.scts.keys() if name in usage for trace in usage[name]]
 
     def set_color(self, inst_id, color = ''):
         if isinstance(inst_id, str):
@@ -4,12 +4,14 @@ from typing import Union, Tuple, Literal
 from Project.project_container import SCTScript
 from SALSA.Common.string_utils import get_padding_for_number
 from SALSA.Project.project_searcher import ProjectSearcher
+from SALSA.Analysis.link_finder import LinkGraph
 from SALSA.Project.RepairTools.texbox_disappear_repair import TBStringToParamRepair
 from SALSA.Project.Updater.project_updater import ProjectUpdater
 from SALSA.BaseInstructions.bi_defaults import loop_count_name
 from SALSA.Common.script_string_utils import SAstr_to_head_and_body, head_and_body_to_SAstr, blank_string
 from SALSA.Project.description_formatting import format_description
-from SALSA.Project.project_container import SCTProject, SCTSection, SCTParameter, SCTInstruction, SCTLink
+from SALSA.Project.project_container import SCTProject, SCTSection, SCTParameter, SCTInstruction, SCTLink, \
+    SCTScriptDict
 from SALSA.BaseInstructions.bi_facade import BaseInstLibFacade
 from SALSA.Common.setting_class import settings
 from SALSA.Common.constants import sep, alt_sep, alt_alt_sep, uuid_sep, label_name_sep, compound_sect_suffix, \
@@ -37,15 +39,24 @@ class SCTProjectFacade:
         self.cur_script = None
         self.searcher = None
 
+        # Sections encoded for Dolphin, by script: (script object, {section name: encoded section})
+        self._dolphin_section_cache = {}
+        # Links between the sections of each script, by script: (script object, link graph)
+        self._link_graphs = {}
+
     def load_project(self, prj: SCTProject):
         # version numbers were not given for the first version
         if getattr(prj, 'version', None) is None:
             prj.version = 1
 
+        # Scripts of a lazily loaded project are updated and cleaned up when they are first loaded
+        lazy = isinstance(getattr(prj, 'scts', None), SCTScriptDict)
+        saved_version = prj.version
+
         # Check that the loaded project is the current version and update if possible
         if prj.version != SCTProject.cur_version:
             if prj.version < SCTProject.cur_version:
-                prj = ProjectUpdater.update_project(prj)
+                prj = ProjectUpdater.update_project(prj, include_scripts=not lazy)
                 self.callbacks['delay_set_change'](100)
             else:
                 print(f'{self.log_key}: This project was created in a newer version of SALSA. '
@@ -54,30 +65,50 @@ class SCTProjectFacade:
                 return False
 
         self.project = prj
-        self.project_cleanup_placeholder_insts()
-        self.project_cleanup_string_headers()
+        self._dolphin_section_cache = {}
+        self._link_graphs = {}
+        if lazy:
+            prj.scts.load_callbacks.append(lambda name, script: self._prepare_loaded_script(name, script,
+                                                                                            saved_version))
+        else:
+            self.project_cleanup_placeholder_insts()
+            self.project_cleanup_string_headers()
         self.searcher = ProjectSearcher(self.base_insts, self.project)
         return True
 
+    def _prepare_loaded_script(self, sct_name, script, saved_version):
+        if saved_version < SCTProject.cur_version:
+            ProjectUpdater.update_script(script, saved_version)
+        # Scripts can be loaded first from worker threads, and loading a script is not an edit of it,
+        # so the GUI is not told of the placeholders removed here
+        self.cleanup_placeholder_insts(sct_name, set_change=False)
+        self.cleanup_string_headers(sct_name)
+
     def project_cleanup_placeholder_insts(self):
         for sct_name in self.project.scts:
-            script = self.project.scts[sct_name]
-            for sect_name in script.sects:
-                section = script.sects[sect_name]
-                insts_to_remove = []
-                for inst in section.insts:
-                    if section.insts[inst].base_id is None:
-                        insts_to_remove.append(inst)
+            self.cleanup_placeholder_insts(sct_name)
 
-                for inst in insts_to_remove:
-                    self.remove_inst(sct_name, sect_name, inst, None)
+    def cleanup_placeholder_insts(self, sct_name, set_change=True):
+        script = self.project.scts[sct_name]
+        for sect_name in script.sects:
+            section = script.sects[sect_name]
+            insts_to_remove = []
+            for inst in section.insts:
+                if section.insts[inst].base_id is None:
+                    insts_to_remove.append(inst)
+
+            for inst in insts_to_remove:
+                self.remove_inst(sct_name, sect_name, inst, None, set_change=set_change)
 
     def project_cleanup_string_headers(self):
         for sct_name in self.project.scts:
-            cur_script = self.project.scts[sct_name]
-            for string in cur_script.strings:
-                if '\\h' not in cur_script.strings[string]:
-                    cur_script.strings[string] = '\\h()' + cur_script.strings[string]
+            self.cleanup_string_headers(sct_name)
+
+    def cleanup_string_headers(self, sct_name):
+        cur_script = self.project.scts[sct_name]
+        for string in cur_script.strings:
+            if '\\h' not in cur_script.strings[string]:
+                cur_script.strings[string] = '\\h()' + cur_script.strings[string]
 
     def create_new_project(self):
         self.project = SCTProject()
@@ -104,7 +135,11 @@ class SCTProjectFacade:
             return
         if script is None:
             scripts = self.project.scts
-            tree_list = self._create_tree(group=scripts, key_list=list(scripts.keys()), headers=headers)
+            if isinstance(scripts, SCTScriptDict) and all(header == 'name' for header in headers):
+                # Only the names are shown, so the scripts do not need to be loaded
+                tree_list = [{'row_data': name, **{header: name for header in headers}} for name in scripts.keys()]
+            else:
+                tree_list = self._create_tree(group=scripts, key_list=list(scripts.keys()), headers=headers)
         elif section is None:
             self.cur_script = script
             section_list = self.project.scts[script].get_sect_list(style)
@@ -180,7 +215,7 @@ class SCTProjectFacade:
                 if isinstance(element, SCTSection):
                     if element.type == 'String':
                         continue
-                element_dict = element.__dict__
+                element_dict = element.as_dict() if hasattr(element, 'as_dict') else element.__dict__
                 values = {'row_data': key}
                 for header_key in headers:
                     value_dict = element_dict
@@ -277,7 +312,7 @@ class SCTProjectFacade:
         base_inst = self.base_insts.get_inst(instruction.base_id)
         instruction_details = copy.deepcopy(base_inst.__dict__)
         instruction_details['base_parameters'] = instruction_details['params']
-        for key, value in instruction.__dict__.items():
+        for key, value in instruction.as_dict().items():
             instruction_details[key] = value
         instruction_details['description'] = format_description(inst=instruction, base_inst=base_inst, callbacks=self.desc_callbacks)
         return instruction_details
@@ -291,6 +326,10 @@ class SCTProjectFacade:
 
     def _add_script_to_project(self, script_name, script):
         self.project.scts[script_name] = script
+        self.project.add_script_var_usage(script_name, script)
+        if isinstance(self.project.scts, SCTScriptDict):
+            self.project.scts.sort(key=str.casefold)
+            return
         script_keys = sorted(list(self.project.scts.keys()), key=str.casefold)
         self.project.scts = {k: self.project.scts[k] for k in script_keys}
 
@@ -298,6 +337,7 @@ class SCTProjectFacade:
         if rowdata not in self.project.scts:
             return
         self.project.scts.pop(rowdata)
+        self.project.remove_script_var_usage(rowdata)
 
     def get_project_script_by_name(self, name):
         if name not in self.project.scts.keys():
@@ -310,13 +350,16 @@ class SCTProjectFacade:
 
     def set_delay_parameter(self, delay_parameter, script, section, instruction, **kwargs):
         self.project.scts[script].sects[section].insts[instruction].delay_param = delay_parameter
+        self.callbacks['set_change'](script, section)
 
     def remove_delay_parameter(self, script, section, instruction, **kwargs):
         self.project.scts[script].sects[section].insts[instruction].delay_param = None
+        self.callbacks['set_change'](script, section)
 
     def update_inst_field(self, field, value, script, section, instruction, **kwargs):
         inst = self.project.scts[script].sects[section].insts[instruction]
         inst.__setattr__(field, value)
+        self.callbacks['set_change'](script, section)
 
     # ---------------------------- #
     # Instruction position methods #
@@ -381,11 +424,7 @@ class SCTProjectFacade:
     def get_variable_usages(self, script, var_type, var_id):
         if script is not None:
             return self.project.scts[script].variables[var_type][var_id]['usage']
-        usage = []
-        for name, cur_script in self.project.scts.items():
-            if var_id in cur_script.variables[var_type]:
-                usage += [(name, *_) for _ in list(cur_script.variables[var_type][var_id]['usage'])]
-        return usage
+        return self.project.get_var_usage(var_type, var_id)
 
     def update_var_usage(self, changes, script, section, instruction, parameter):
         trace = (section, instruction, parameter)
@@ -398,6 +437,7 @@ class SCTProjectFacade:
                 self.project.scts[script].variables[var_type][var_key]['usage'].append(trace)
             else:
                 self.project.scts[script].variables[var_type][var_key] = {'alias': '', 'usage': [trace]}
+            self.project.add_var_usage(script, var_type, var_key, trace)
 
         for change in changes['remove']:
             var_parts = change.split(': ')
@@ -407,6 +447,31 @@ class SCTProjectFacade:
                 print(f'{self.log_key}: No variable usage to remove for {trace} in {var_type}: {var_key}')
                 continue
             self.project.scts[script].variables[var_type][var_key]['usage'].remove(trace)
+            self.project.remove_var_usage(script, var_type, var_key, trace)
+
+    def _update_inst_var_usage(self, script, section, inst_id, remove=False):
+        """Adds or removes the variable usages of every parameter of an instruction"""
+        cur_script = self.project.scts[script]
+        inst = cur_script.sects[section].insts[inst_id]
+        params = [(f'{p_id}', param) for p_id, param in inst.params.items()]
+        for loop_id, loop in enumerate(inst.l_params):
+            params += [(f'{loop_id}{sep}{p_id}', param) for p_id, param in loop.items()]
+
+        for p_id, param in params:
+            if not isinstance(param.value, dict):
+                continue
+            trace = (section, inst_id, p_id)
+            for var in param.get_variables():
+                var_parts = var.split(': ')
+                var_type = var_parts[0]
+                var_key = int(var_parts[1])
+                var_dict = cur_script.variables.setdefault(var_type, {})
+                if not remove:
+                    var_dict.setdefault(var_key, {'alias': '', 'usage': []})['usage'].append(trace)
+                    self.project.add_var_usage(script, var_type, var_key, trace)
+                elif var_key in var_dict and trace in var_dict[var_key]['usage']:
+                    var_dict[var_key]['usage'].remove(trace)
+                    self.project.remove_var_usage(script, var_type, var_key, trace)
 
     # ------------------------------ #
     # String Editor Callback Methods #
@@ -448,7 +513,7 @@ class SCTProjectFacade:
         if 'body' in changes:
             body = changes['body']
         self.project.scts[script].strings[string_id] = head_and_body_to_SAstr(no_head, head, body)
-        self.callbacks['set_change'](script)
+        self.callbacks['set_change'](script, self.project.scts[script].string_locations[string_id])
 
     def add_string_group(self, script, string_group=''):
         if string_group == '':
@@ -458,7 +523,7 @@ class SCTProjectFacade:
 
         self.create_section(script, new_name=string_group, inst_list=[9])
 
-        self.callbacks['set_change'](script)
+        self.callbacks['set_change'](script, string_group)
 
         return string_group
 
@@ -481,7 +546,7 @@ class SCTProjectFacade:
         self.project.scts[script].strings[string_id] = string
         self.project.scts[script].string_locations[string_id] = string_group
 
-        self.callbacks['set_change'](script)
+        self.callbacks['set_change'](script, string_group)
 
         return string_id
 
@@ -491,10 +556,11 @@ class SCTProjectFacade:
         self.project.scts[script].string_locations.pop(string_id)
         self.project.scts[script].string_groups[group].remove(string_id)
 
-        self.callbacks['set_change'](script)
+        self.callbacks['set_change'](script, group)
 
     def change_string_id(self, script, string_id, new_string_id):
         cur_script = self.project.scts[script]
+        self.set_section_changed(script)
         group = cur_script.string_locations[string_id]
         cur_script.string_groups[group].remove(string_id)
         cur_script.string_groups[group].append(new_string_id)
@@ -534,7 +600,10 @@ class SCTProjectFacade:
 
     def refresh_links(self, script, section, instruction):
         inst = self.project.scts[script].sects[section].insts[instruction]
+        link_graph = self._get_kept_link_graph(script)
         for l in inst.links_out:
+            if link_graph is not None:
+                link_graph.remove_link(l)
             if l.type in ['String', 'Footer']:
                 continue
             target_inst = self.project.scts[script].sects[l.target_trace[0]].insts[l.target_trace[1]]
@@ -548,6 +617,8 @@ class SCTProjectFacade:
                 inst.links_out.append(p.link)
                 target_inst = self.project.scts[script].sects[p.link.target_trace[0]].insts[p.link.target_trace[1]]
                 target_inst.links_in.append(p.link)
+                if link_graph is not None:
+                    link_graph.add_link(p.link)
 
     def get_jmp_inst_dict(self, script, section, goto_inst):
         dict_out = self.get_jmp_section_list(script, section, False)
@@ -616,6 +687,7 @@ class SCTProjectFacade:
             self.project.scts[script].string_groups[section] = []
         elif change == 'remove':
             self.project.scts[script].string_groups.pop(section)
+        self.callbacks['set_change'](script, section)
 
     # ----------------------- #
     # Script analysis methods #
@@ -697,6 +769,7 @@ class SCTProjectFacade:
 
     def change_section_name(self, script, section, instruction, new_name):
         cur_script = self.project.scts[script]
+        self.set_section_changed(script)
         cur_section = cur_script.sects[section]
 
         old_sect_name = cur_section.name
@@ -979,7 +1052,7 @@ class SCTProjectFacade:
         else:
             self.project.scts[script].sects[section].inst_list = temp_list
 
-        self.callbacks['set_change']()
+        self.callbacks['set_change'](script, section)
 
         if section is None:
             return
@@ -1070,7 +1143,7 @@ class SCTProjectFacade:
         cur_group[index] = {f'{switch_uuid}{sep}switch': new_cases}
         switch_inst.l_params = new_l_params
 
-        self.callbacks['set_change']()
+        self.callbacks['set_change'](script, section)
 
     # ---------------------------- #
     # Section manipulation methods #
@@ -1146,6 +1219,9 @@ class SCTProjectFacade:
             t_t = link.target_trace
             cur_script.sects[t_t[0]].insts[t_t[1]].links_in.remove(link)
 
+        for inst_id in cur_sect.insts.keys():
+            self._update_inst_var_usage(script, section, inst_id, remove=True)
+
         cur_script.sects.pop(section)
         self.callbacks['set_change'](script)
 
@@ -1258,7 +1334,7 @@ class SCTProjectFacade:
             self.change_inst(script, section, new_inst_UUID, new_id=12)
             cur_sect.set_type('SCT')
 
-        self.callbacks['set_change']()
+        self.callbacks['set_change'](script, section)
 
     # ---------------------------------------------- #
     # Instruction and parameter manipulation methods #
@@ -1274,7 +1350,7 @@ class SCTProjectFacade:
         self.add_inst_sub_group(script, section, instruction, parent_list, index, str(next_case))
         self.update_loop_param_num(cur_sect.insts[instruction])
 
-        self.callbacks['set_change']()
+        self.callbacks['set_change'](script, section)
 
     def remove_switch_case(self, script, section, instruction, case, result, **kwargs):
         return self.change_inst(script, section, instruction, case=case, change_type=result)
@@ -1290,16 +1366,21 @@ class SCTProjectFacade:
         pos = 0 if position is None else position
         if position == -1:
             pos = len(inst.l_params)
+        # Loop parameters after the new loop move, so their variable usages are replaced
+        self._update_inst_var_usage(script, section, instruction, remove=True)
         inst.l_params.insert(pos, loop)
         self.update_loop_param_num(inst)
+        self._update_inst_var_usage(script, section, instruction)
         return True
 
     def remove_loop_param(self, script, section, instruction, loop_num, **kwargs):
         inst = self.project.scts[script].sects[section].insts[instruction]
         if len(inst.l_params) <= loop_num:
             return False
+        self._update_inst_var_usage(script, section, instruction, remove=True)
         inst.l_params.pop(loop_num)
         self.update_loop_param_num(inst)
+        self._update_inst_var_usage(script, section, instruction)
         return True
 
     def update_loop_param_num(self, inst):
@@ -1307,13 +1388,14 @@ class SCTProjectFacade:
             if loop_count_name in param.type:
                 inst.params[int(key)].set_value(len(inst.l_params))
 
-    def remove_inst(self, script, section, inst, result, custom_link_tgt=None):
+    def remove_inst(self, script, section, inst, result, custom_link_tgt=None, set_change=True):
         self.remove_inst_links(script, section, inst, custom_tgt=custom_link_tgt)
         # This will handle inst group children, remove any inst links in the group
         # and remove the inst from the grouped representation of insts
-        self.change_inst(script, section, inst, change_type=result)
+        self.change_inst(script, section, inst, change_type=result, set_change=set_change)
         cur_sect = self.project.scts[script].sects[section]
         inst_is_label = cur_sect.insts[inst].base_id == 9
+        self._update_inst_var_usage(script, section, inst, remove=True)
         cur_sect.insts.pop(inst)
         if inst in cur_sect.inst_list:
             cur_sect.inst_list.remove(inst)
@@ -1390,7 +1472,7 @@ class SCTProjectFacade:
 
         return new_inst.ID
 
-    def change_inst(self, script, section, inst, new_id=None, case=None, change_type=None):
+    def change_inst(self, script, section, inst, new_id=None, case=None, change_type=None, set_change=True):
         # not entering a new_id will remove the instruction
         cur_section = self.project.scts[script].sects[section]
         cur_inst = cur_section.insts[inst]
@@ -1414,7 +1496,8 @@ class SCTProjectFacade:
                         continue
 
                 if goto in cur_section.insts:
-                    self.remove_inst(script, section, goto, custom_link_tgt=custom_link_tgt, result=None)
+                    self.remove_inst(script, section, goto, custom_link_tgt=custom_link_tgt, result=None,
+                                     set_change=set_change)
 
             inst_group = self.get_inst_group(script, section, inst)
             if cur_inst.base_id == 3:
@@ -1495,6 +1578,7 @@ class SCTProjectFacade:
             self.check_for_compound_sect(script, section)
 
         # Remove any current parameters and loop parameters
+        self._update_inst_var_usage(script, section, inst, remove=True)
         self.remove_inst_parameters(script, section, inst)
 
         # Add in default parameter values with no loops
@@ -1510,6 +1594,7 @@ class SCTProjectFacade:
             cur_inst.params[i] = new_param
 
         self.inst_specific_setup(script, section, cur_inst)
+        self._update_inst_var_usage(script, section, inst)
 
         if int(new_id) in self.base_insts.group_inst_list:
             self.setup_group_type_inst(script, section, inst, cur_inst, parent_list, index)
@@ -1596,7 +1681,8 @@ class SCTProjectFacade:
         cur_inst.generate_condition(self.get_script_variables_with_aliases(script))
         self._refresh_inst_positions(script, section)
 
-        self.callbacks['set_change']()
+        if set_change:
+            self.callbacks['set_change'](script, section)
 
         return True
 
@@ -2145,6 +2231,7 @@ class SCTProjectFacade:
             cur_group = cur_group[parent]
 
         new_tgt_inst_uuid = custom_tgt
+        link_graph = self._get_kept_link_graph(script)
 
         if 'in' in direction:
             for link in cur_inst.links_in:
@@ -2155,6 +2242,8 @@ class SCTProjectFacade:
                 ori_inst = self.project.scts[script].sects[ori_sect].insts[ori_inst_uuid]
                 if new_tgt_inst_uuid is None or remove_link:
                     ori_inst.links_out.pop(ori_inst.links_out.index(link))
+                    if link_graph is not None:
+                        link_graph.remove_link(link)
                 else:
                     self.change_link_tgt(tgt_sect=cur_sect, link=link, new_tgt_uuid=new_tgt_inst_uuid, remove_from_old_tgt=False)
 
@@ -2167,6 +2256,8 @@ class SCTProjectFacade:
                 tgt_sect = link.target_trace[0]
                 tgt_inst_uuid = link.target_trace[1]
                 self.project.scts[script].sects[tgt_sect].insts[tgt_inst_uuid].links_in.remove(link)
+                if link_graph is not None:
+                    link_graph.remove_link(link)
 
             cur_inst.links_out = []
 
@@ -2181,30 +2272,44 @@ class SCTProjectFacade:
                 master_inst.my_master_uuids.remove(cur_inst.ID)
 
 
-    @staticmethod
-    def change_link_tgt(tgt_sect: SCTSection, link: SCTLink, new_tgt_uuid: str, remove_from_old_tgt=True):
+    def change_link_tgt(self, tgt_sect: SCTSection, link: SCTLink, new_tgt_uuid: str, remove_from_old_tgt=True):
         prev_tgt_uuid = link.target_trace[1]
         if remove_from_old_tgt:
             tgt_sect.insts[prev_tgt_uuid].links_in.remove(link)
         tgt_sect.insts[new_tgt_uuid].links_in.append(link)
         link.target_trace[1] = new_tgt_uuid
+        link_graph = self._get_kept_link_graph(link.script)
+        if link_graph is not None:
+            link_graph.update_link(link)
 
     def repair_text_box_fade(self, sct_model, queue):
         project = TBStringToParamRepair.repair_project(project=self.project, inst_lib=self.base_insts, sct_model=sct_model, status_queue=queue)
         if project is None:
             return
         self.project = project
+        self._dolphin_section_cache = {}
+        self._link_graphs = {}
+        self.searcher = ProjectSearcher(self.base_insts, self.project)
+        # Repaired parameters can use variables, so usages are found again when next needed
+        self.project.var_usage = None
 
     # #  Refresh Methods  # #
 
-    def refresh_abs_poses(self, scripts, queue):
+    def refresh_abs_poses(self, scripts, queue, start_sections=None):
+        """Lays out each script again to update its offsets. start_sections can give the sections changed in a
+        script, in which case the layout is only redone from the earliest of them"""
+        start_sections = {} if start_sections is None else start_sections
         error_scts = []
         for script in scripts:
             queue.put({'sub_msg': f'{script}'})
-            SCTEncoder.encode_sct_file_from_project_script(project_script=self.project.scts[script], use_garbage=True,
-                                                           combine_footer_links=False, add_spurious_refresh=True,
-                                                           base_insts=self.base_insts, update_inst_pos=True,
-                                                           endian='big')
+            cur_script = self.project.scts[script]
+            start_section = None
+            changed_sections = start_sections.get(script, None)
+            if changed_sections and all(s in cur_script.sect_list for s in changed_sections):
+                start_section = min(changed_sections, key=cur_script.sect_list.index)
+            SCTEncoder.layout_sct_from_project_script(project_script=cur_script, use_garbage=True,
+                                                      add_spurious_refresh=True, base_insts=self.base_insts,
+                                                      endian='big', start_section=start_section)
             for error in self.project.scts[script].errors:
                 if 'Encoding' in error:
                     error_scts.append(script)
@@ -2227,13 +2332,45 @@ class SCTProjectFacade:
         return errors
 
     # # Update SCT Methods # #
+    def set_section_changed(self, script, section=None):
+        """Drops what is kept for a changed section, or for every section if none is given: its encoding for
+        Dolphin, its search index and its links"""
+        if self.searcher is not None:
+            self.searcher.set_changed(script, section)
+        if section is None:
+            self._dolphin_section_cache.pop(script, None)
+            self._link_graphs.pop(script, None)
+            return
+        if script in self._link_graphs:
+            self._link_graphs[script][1].refresh_section(section)
+        if script in self._dolphin_section_cache:
+            self._dolphin_section_cache[script][1].pop(section, None)
+
+    def get_link_graph(self, script) -> LinkGraph:
+        cur_script = self.project.scts[script]
+        cached = self._link_graphs.get(script, None)
+        if cached is None or cached[0] is not cur_script:
+            cached = self._link_graphs[script] = (cur_script, LinkGraph(cur_script))
+        return cached[1]
+
+    def _get_kept_link_graph(self, script) -> Union[LinkGraph, None]:
+        # Link graphs are only updated once they have been made
+        cached = self._link_graphs.get(script, None)
+        if cached is None or cached[0] is not self.project.scts[script]:
+            return None
+        return cached[1]
+
     def get_script(self, script, queue):
         queue.put({'sub_msg': f'Encoding {script}'})
-        ind, sct = SCTEncoder.encode_sct_file_from_project_script(project_script=self.project.scts[script],
+        cur_script = self.project.scts[script]
+        cached = self._dolphin_section_cache.get(script, None)
+        if cached is None or cached[0] is not cur_script:
+            cached = self._dolphin_section_cache[script] = (cur_script, {})
+        ind, sct = SCTEncoder.encode_sct_file_from_project_script(project_script=cur_script,
                                                                   use_garbage=False, combine_footer_links=True,
                                                                   add_spurious_refresh=False, endian='big',
                                                                   base_insts=self.base_insts, update_inst_pos=True,
-                                                                  separate_index=True)
+                                                                  separate_index=True, section_cache=cached[1])
         for error in self.project.scts[script].errors:
             if 'Encoding' in error:
                 return script
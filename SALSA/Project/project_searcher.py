@@ -2,7 +2,7 @@ from __future__ import annotations
 
 import enum
 from dataclasses import dataclass
-from typing import Union, List
+from typing import Union, List, Dict, Tuple, Set
 
 from SALSA.Common.script_string_utils import SAstr_to_visible
 from SALSA.Common.constants import sep, alt_sep
@@ -163,6 +163,84 @@ class PrjResultGroup:
         return self.name == other.name
 
 
+def _add_result(groups: Dict[str, PrjResultGroup], sct_name, row_data, display):
+    group = groups.get(sct_name, None)
+    if group is None:
+        group = groups[sct_name] = PrjResultGroup(sct_name, [])
+    group.contents.append(PrjResult(row_data, display))
+
+
+def _get_ngrams(string: str):
+    return {string[i:i + ngram_size] for i in range(len(string) - ngram_size + 1)}
+
+
+ngram_size = 3
+
+
+class _SectionIndex:
+    """Lookups from base instruction ids and parameter values to the instructions of a section. Instructions are
+    given as their position in section.insts so results can be sorted back into the order of a full scan"""
+
+    def __init__(self, section):
+        self.section = section
+        self.inst_ids = list(section.insts.keys())
+        self.inst_pos = {inst_id: i for i, inst_id in enumerate(section.inst_list)}
+        self.base_ids: Dict[int, List[int]] = {}
+        # Parameters found by equal values, by lowercase value
+        self.values: Dict[str, List[int]] = {}
+        # Delays and strings, which are found by partial values, as (lowercase value, instruction)
+        self.texts: List[Tuple[str, int]] = []
+
+        for ind, inst in enumerate(section.insts.values()):
+            self.base_ids.setdefault(inst.base_id, []).append(ind)
+            if inst.delay_param is not None:
+                self.texts.append((str(inst.delay_param.value).lower(), ind))
+            values = []
+            for param in inst.params.values():
+                if 'jump' in param.type:
+                    continue
+                if 'footer' in param.type or 'string' in param.type:
+                    self.texts.append((str(param.linked_string).lower(), ind))
+                else:
+                    values.append(str(param.value).lower())
+            for loop in inst.l_params:
+                values.extend(str(param.value).lower() for param in loop.values())
+            for value in set(values):
+                self.values.setdefault(value, []).append(ind)
+
+
+class _StringIndex:
+    """Visible dialogue strings of a script with the strings containing each n-gram of lowercase characters"""
+
+    def __init__(self, script):
+        self.script = script
+        self.string_ids = list(script.strings.keys())
+        self.visible = [SAstr_to_visible(s).replace('\n', ' ') for s in script.strings.values()]
+        self.lower = [s.lower() for s in self.visible]
+        self.lower_ids: Dict[str, List[int]] = {}
+        for ind, sid in enumerate(self.string_ids):
+            self.lower_ids.setdefault(sid.lower(), []).append(ind)
+        self.ngrams: Dict[str, Set[int]] = {}
+        for ind, string in enumerate(self.lower):
+            for ngram in _get_ngrams(string):
+                self.ngrams.setdefault(ngram, set()).add(ind)
+
+    def find(self, value) -> Set[int]:
+        """Returns the strings which could match a lowercase search value, by id or by containing it"""
+        found = set(self.lower_ids.get(value, ()))
+        if len(value) < ngram_size:
+            found.update(i for i, string in enumerate(self.lower) if value in string)
+            return found
+        candidates = None
+        for ngram in _get_ngrams(value):
+            strings = self.ngrams.get(ngram, None)
+            if strings is None:
+                return found
+            candidates = set(strings) if candidates is None else candidates & strings
+        found.update(i for i in candidates if value in self.lower[i])
+        return found
+
+
 class ProjectSearcher:
 
     def __init__(self, base_insts: BaseInstLibFacade, project: SCTProject):
@@ -177,6 +255,35 @@ class ProjectSearcher:
 
         self.keep_case = False
 
+        # Indexes are built as they are first searched and dropped when their script or section changes
+        self.sect_indexes: Dict[str, Dict[str, _SectionIndex]] = {}
+        self.string_indexes: Dict[str, _StringIndex] = {}
+
+    def set_changed(self, script, section=None):
+        if section is None:
+            self.sect_indexes.pop(script, None)
+        elif script in self.sect_indexes:
+            self.sect_indexes[script].pop(section, None)
+        self.string_indexes.pop(script, None)
+
+    def get_section_indexes(self, sct_name, sct):
+        indexes = self.sect_indexes.setdefault(sct_name, {})
+        if len(indexes) > len(sct.sects):
+            # Removed sections are dropped
+            for sect_name in [n for n in indexes.keys() if n not in sct.sects]:
+                indexes.pop(sect_name)
+        for sect_name, sect in sct.sects.items():
+            index = indexes.get(sect_name, None)
+            if index is None or index.section is not sect:
+                index = indexes[sect_name] = _SectionIndex(sect)
+            yield sect_name, index
+
+    def get_string_index(self, sct_name, sct):
+        index = self.string_indexes.get(sct_name, None)
+        if index is None or index.script is not sct or len(index.string_ids) != len(sct.strings):
+            index = self.string_indexes[sct_name] = _StringIndex(sct)
+        return index
+
     def search(self, search_string, keep_case):
         self.keep_case = keep_case
         tokens = SearchTokens.tokenize(search_string, list(loc_tokens.keys()), list(filter_tokens.keys()))
@@ -232,28 +339,27 @@ class ProjectSearcher:
 
             else:
                 r_insts = [i for i, _ in enumerate(self.b_insts.get_all_insts())]
+        r_insts = set(r_insts)
 
         sct_filters = tokens.get_filter_list('sct:')
         sect_filters = tokens.get_filter_list('sect:')
-        links = []
+        links = {}
         for sct_name, sct in self.prj.scts.items():
             if len(sct_filters) > 0:
                 if sct_name not in sct_filters:
                     continue
-            for sect_name, sect in sct.sects.items():
+            for sect_name, index in self.get_section_indexes(sct_name, sct):
                 if len(sect_filters) > 0:
                     if sect_name not in sect_filters:
                         continue
-                for inst_id, inst in sect.insts.items():
-                    if inst.base_id in r_insts:
-                        row_data = f'{sect_name}{alt_sep}{inst_id}'
-                        display = f'{sect_name} - {sect.inst_list.index(inst_id)}'
-                        if PrjResultGroup(sct_name, []) not in links:
-                            links.append(PrjResultGroup(sct_name, [PrjResult(row_data, display)]))
-                        else:
-                            links[(links.index(sct_name))].contents.append(PrjResult(row_data, display))
+                inds = [i for base_id, inds in index.base_ids.items() if base_id in r_insts for i in inds]
+                for ind in sorted(inds):
+                    inst_id = index.inst_ids[ind]
+                    row_data = f'{sect_name}{alt_sep}{inst_id}'
+                    display = f'{sect_name} - {index.inst_pos[inst_id]}'
+                    _add_result(links, sct_name, row_data, display)
 
-        return links
+        return list(links.values())
 
     def search_params(self, tokens: SearchTokens):
         if len(tokens.search) == 0:
@@ -261,80 +367,85 @@ class ProjectSearcher:
 
         sct_filters = tokens.get_filter_list('sct:')
         sect_filters = tokens.get_filter_list('sect:')
-        inst_filters = tokens.get_filter_list('inst:')
-        links = []
+        # Instruction filters which are not numbers match no instruction, as when comparing the tokens themselves
+        inst_filter_tokens = tokens.get_filter_list('inst:')
+        inst_filters = {int(t.value) for t in inst_filter_tokens if t.value.isdecimal()}
+        values = [t.value.lower() for t in tokens.search]
+        links = {}
         for sct_name, sct in self.prj.scts.items():
             if len(sct_filters) > 0:
                 if sct_name not in sct_filters:
                     continue
 
-            for sect_name, sect in sct.sects.items():
+            for sect_name, index in self.get_section_indexes(sct_name, sct):
                 if len(sect_filters) > 0:
                     if sect_name not in sect_filters:
                         continue
 
-                for inst_id, inst in sect.insts.items():
-                    if len(inst_filters) > 0:
+                inds = set()
+                for value in values:
+                    inds.update(index.values.get(value, ()))
+                    inds.update(ind for text, ind in index.texts if value in text)
+
+                for ind in sorted(inds):
+                    inst_id = index.inst_ids[ind]
+                    inst = index.section.insts[inst_id]
+                    if len(inst_filter_tokens) > 0:
                         if inst.base_id not in inst_filters:
                             continue
-
-                    for token in tokens.search:
-                        if inst.delay_param is not None:
-                            if self.str_comp(token.value, str(inst.delay_param.value), in_=True):
-                                row_data = f'{sect_name}{alt_sep}{inst_id}{alt_sep}delay'
-                                display = f'{sect_name} - {sect.inst_list.index(inst_id)}'
-                                if PrjResultGroup(sct_name, []) not in links:
-                                    links.append(PrjResultGroup(sct_name, [PrjResult(row_data, display)]))
-                                else:
-                                    links[(links.index(sct_name))].contents.append(PrjResult(row_data, display))
-                        for param_id, param in inst.params.items():
-                            if 'jump' in param.type:
-                                continue
-                            if 'footer' in param.type or 'string' in param.type:
-                                if self.str_comp(token.value, str(param.linked_string), in_=True):
-                                    row_data = f'{sect_name}{alt_sep}{inst_id}{alt_sep}{param_id}'
-                                    display = f'{sect_name} - {sect.inst_list.index(inst_id)}'
-                                    if PrjResultGroup(sct_name, []) not in links:
-                                        links.append(PrjResultGroup(sct_name, [PrjResult(row_data, display)]))
-                                    else:
-                                        links[(links.index(sct_name))].contents.append(PrjResult(row_data, display))
-                            else:
-                                if self.str_comp(token.value, str(param.value)):
-                                    row_data = f'{sect_name}{alt_sep}{inst_id}{alt_sep}{param_id}'
-                                    display = f'{sect_name} - {sect.inst_list.index(inst_id)}'
-                                    if PrjResultGroup(sct_name, []) not in links:
-                                        links.append(PrjResultGroup(sct_name, [PrjResult(row_data, display)]))
-                                    else:
-                                        links[(links.index(sct_name))].contents.append(PrjResult(row_data, display))
-                        for loop_ind, loop in enumerate(inst.l_params):
-                            for param_id, param in loop.items():
-                                if self.str_comp(token.value, str(param.value)):
-                                    row_data = f'{sect_name}{alt_sep}{inst_id}{alt_sep}{loop_ind}{sep}{param_id}'
-                                    display = f'{sect_name} - {sect.inst_list.index(inst_id)} - {loop_ind} {param_id}'
-                                    if PrjResultGroup(sct_name, []) not in links:
-                                        links.append(PrjResultGroup(sct_name, [PrjResult(row_data, display)]))
-                                    else:
-                                        links[(links.index(sct_name))].contents.append(PrjResult(row_data, display))
-
-        return links
+                    self._search_inst_params(tokens, links, sct_name, sect_name, inst_id, inst,
+                                             index.inst_pos[inst_id])
+
+        return list(links.values())
+
+    def _search_inst_params(self, tokens, links, sct_name, sect_name, inst_id, inst, inst_pos):
+        for token in tokens.search:
+            if inst.delay_param is not None:
+                if self.str_comp(token.value, str(inst.delay_param.value), in_=True):
+                    row_data = f'{sect_name}{alt_sep}{inst_id}{alt_sep}delay'
+                    _add_result(links, sct_name, row_data, f'{sect_name} - {inst_pos}')
+            for param_id, param in inst.params.items():
+                if 'jump' in param.type:
+                    continue
+                if 'footer' in param.type or 'string' in param.type:
+                    if self.str_comp(token.value, str(param.linked_string), in_=True):
+                        row_data = f'{sect_name}{alt_sep}{inst_id}{alt_sep}{param_id}'
+                        _add_result(links, sct_name, row_data, f'{sect_name} - {inst_pos}')
+                else:
+                    if self.str_comp(token.value, str(param.value)):
+                        row_data = f'{sect_name}{alt_sep}{inst_id}{alt_sep}{param_id}'
+                        _add_result(links, sct_name, row_data, f'{sect_name} - {inst_pos}')
+            for loop_ind, loop in enumerate(inst.l_params):
+                for param_id, param in loop.items():
+                    if self.str_comp(token.value, str(param.value)):
+                        row_data = f'{sect_name}{alt_sep}{inst_id}{alt_sep}{loop_ind}{sep}{param_id}'
+                        display = f'{sect_name} - {inst_pos} - {loop_ind} {param_id}'
+                        _add_result(links, sct_name, row_data, display)
 
     def search_dialogue(self, tokens: SearchTokens):
-        d_strings = []
+        d_strings = {}
         sct_filters = tokens.get_filter_list('sct:')
+        values = [t.value.lower() for t in tokens.search]
         for sct_name, sct in self.prj.scts.items():
             if len(sct_filters) > 0:
                 if sct_name not in sct_filters:
                     continue
 
-            for sid, str_ in sct.strings.items():
-                s = SAstr_to_visible(str_).replace('\n', ' ')
+            index = self.get_string_index(sct_name, sct)
+            inds = set()
+            for value in values:
+                inds.update(index.find(value))
+
+            for ind in sorted(inds):
+                sid = index.string_ids[ind]
+                s = index.visible[ind]
                 for token in tokens.search:
                     if self.str_comp(token.value, sid) or self.str_comp(token.value, s, in_=True):
                         row_data = f'{sct.string_locations[sid]}{alt_sep}{sid}'
                         if sid == token.value:
                             display = f'{sct.string_locations[sid]} - {sid}'
                         else:
-                            s_ind = s if self.keep_case else s.lower()
+                            s_ind = s if self.keep_case else index.lower[ind]
                             v = token.value if self.keep_case else token.value.lower()
                             t_index = s_ind.index(v)
                             outer_char_num = dialog_result_string_width - len(token.value) // 2
@@ -348,12 +459,9 @@ class ProjectSearcher:
                                 substring = token.value
                             display = f'{sct.string_locations[sid]} - {substring}'
 
-                        if PrjResultGroup(sct_name, []) not in d_strings:
-                            d_strings.append(PrjResultGroup(sct_name, [PrjResult(row_data, display)]))
-                        else:
-                            d_strings[(d_strings.index(sct_name))].contents.append(PrjResult(row_data, display))
+                        _add_result(d_strings, sct_name, row_data, display)
 
-        return d_strings
+        return list(d_strings.values())
 
     def str_comp(self, s1, s2, in_=False):
         if not self.keep_case:
@@ -1,10 +1,14 @@
 import copy
 import math
+from bisect import bisect_right
 import queue
 import re
 import struct
+import sys
+from array import array
 from typing import Dict, Tuple, List, Callable, Literal, Union
 
+from SALSA.Common.containers import LRUCache
 from SALSA.Common.script_string_utils import fix_string_decoding_errors
 from SALSA.BaseInstructions.bi_facade import BaseInstLibFacade
 from SALSA.Project.project_container import SCTScript, SCTSection, SCTLink, SCTInstruction, SCTParameter
@@ -21,6 +25,12 @@ ind_name_max_len = 0x10
 
 endian: Dict[str, Literal['big', 'little']] = {'gc': 'big', 'dc': 'little'}
 
+# array typecode for unsigned 4-byte words
+word_typecode = 'I' if array('I').itemsize == 4 else 'L'
+
+# Marks an SCPT analysis without an arithmetic result
+_no_result = object()
+
 
 class SCTDecoder:
     log_key = 'SCTDecoder'
@@ -29,11 +39,21 @@ class SCTDecoder:
     _cursor = 0
     _inst_lib = BaseInstLib
     _index: Dict[str, Tuple[int, int]] = {}
+    # Instruction offsets in ascending order, with the (section, instruction ID) at each offset
+    _inst_offsets: List[int]
+    _inst_locs: List[Tuple[str, str]]
+    # Section bounds in ascending order as (start, end, name), with their starts separately for bisecting
+    _sect_bounds: List[Tuple[int, int, str]]
+    _sect_starts: List[int]
     _sctLength = 0
     _sctStart = 0
     _errorCount: int = 0
-    _sct: bytearray
+    _sct: memoryview
+    _words: Dict[str, array]
+    _word_end = 0
     _p_codes: SCPTParamCodes
+    # Shared SCPT analyses, keyed on the endian, parameter ID and words of the expression
+    _scpt_cache = LRUCache(maxsize=4096)
     _enc = 'shiftjis'
     _str_sect_links: List[SCTLink] = []
     _decoded_str_sect_links = []
@@ -76,6 +96,10 @@ class SCTDecoder:
         self._str_foot_links = []
         self._scpt_links = []
         self._index = {}
+        self._inst_offsets = []
+        self._inst_locs = []
+        self._sect_bounds = []
+        self._sect_starts = []
         self._jmp_if_falses = {}
         self._switches = {}
         self._variables = {}
@@ -116,8 +140,7 @@ class SCTDecoder:
     def decode_section_from_bytes(cls, name, sect_bytes: bytearray, sect_offset: int, inst_lib: BaseInstLibFacade):
         decoder = cls()
         decoder._init()
-        decoder._sct = sect_bytes
-        decoder._sctLength = len(sect_bytes)
+        decoder._set_sct(sect_bytes)
         decoder._last_sect_pos = len(sect_bytes)
         decoder._base_endian = 'big'
         decoder._other_endian = 'little'
@@ -128,6 +151,11 @@ class SCTDecoder:
         decoder._setup_scpt_links(sect_info={'section': section, 'offset': sect_offset, 'bounds': (sect_offset, len(sect_bytes) + sect_offset)})
         return section
 
+    @classmethod
+    def get_scpt_cache_counts(cls):
+        """Returns the hits and misses of the shared SCPT analysis cache"""
+        return cls._scpt_cache.get_counts()
+
     @classmethod
     def decode_sct_from_file(cls, name, sct, inst_lib: BaseInstLibFacade, status: queue.SimpleQueue = None,
                              strings_only=False, is_validation=False):
@@ -154,11 +182,11 @@ class SCTDecoder:
         self._is_validation = is_validation
         self._init()
         self._name = script_name
-        self._sct = sct
+        sct = memoryview(sct)
         self._inst_lib = inst_lib
 
-        if (int.from_bytes(self._sct[8:12], byteorder='big') <=
-                int.from_bytes(self._sct[8:12], byteorder='little')):
+        if (int.from_bytes(sct[8:12], byteorder='big') <=
+                int.from_bytes(sct[8:12], byteorder='little')):
             self._base_endian: Literal['big', 'little'] = 'big'
             self._other_endian: Literal['big', 'little'] = 'little'
             self._cur_endian = self._base_endian
@@ -167,9 +195,9 @@ class SCTDecoder:
             self._other_endian: Literal['big', 'little'] = 'big'
             self._cur_endian = self._base_endian
 
-        header = self._sct[:8]
-        ind_entries: int = int.from_bytes(self._sct[8:12], byteorder=self._cur_endian)
-        self._sct = self._sct[12:]
+        header = bytearray(sct[:8])
+        ind_entries: int = int.from_bytes(sct[8:12], byteorder=self._cur_endian)
+        self._sct = sct[12:]
         self._index = {}
         used_names = []
         for i in range(ind_entries):
@@ -190,12 +218,11 @@ class SCTDecoder:
                 self._last_sect_pos = start
             self._index[sect_name] = (start, next_start)
         index_len = ind_entries * 0x14
-        self._sct = self._sct[index_len:]
+        self._set_sct(sct[12 + index_len:])
         self._sctStart = 12 + index_len
         decoded_sct = SCTScript(name=script_name, index=self._index, header=header)
 
         self._cursor = 0
-        self._sctLength = len(self._sct)
         for sect_name, bounds in self._index.items():
             print(f'{self.log_key}: Decoding {sect_name}...', end='\r')
             change_bounds = False
@@ -222,6 +249,9 @@ class SCTDecoder:
 
             decoded_sct.add_section(new_section)
 
+        self._sect_bounds = sorted((bounds[0], bounds[1], sect_name) for sect_name, bounds in self._index.items())
+        self._sect_starts = [bounds[0] for bounds in self._sect_bounds]
+
         print(f'{self.log_key}: All sections decoded!!!')
 
         return decoded_sct
@@ -272,13 +302,12 @@ class SCTDecoder:
 
         while (self._cursor * 4) < bounds[1]:
             self._cur_endian = self._base_endian
-            currWord = self.getWord(self._cursor * 4)
-            currWord_int = int.from_bytes(currWord, byteorder=self._cur_endian)
+            currWord_int = self.getInt(self._cursor * 4)
 
             is_inst = 0 <= currWord_int <= 265
             if not is_inst:
                 self._cur_endian = self._other_endian
-                currWord_int = int.from_bytes(currWord, byteorder=self._cur_endian)
+                currWord_int = self.getInt(self._cursor * 4)
                 is_inst = 0 <= currWord_int <= 265
 
             if is_inst:
@@ -293,9 +322,10 @@ class SCTDecoder:
 
                 # Test for the dunder code to delay execution of an instruction
                 delay_inst = None
+                delay_length = 0
                 if currWord_int == 129:
                     delay_inst = self._decode_instruction(currWord_int, inst_pos, [sect_name, inst_list_id])
-                    delay_inst.length = self._cursor * 4 - inst_pos
+                    delay_length = self._cursor * 4 - inst_pos
                     currWord_int = self.getInt(self._cursor * 4)
 
                 instResult = self._decode_instruction(currWord_int, inst_pos, [sect_name])
@@ -322,8 +352,8 @@ class SCTDecoder:
                         instResult.add_error(('frame_delay', 'Non-numeric frame delay given'))
 
                     inst_size = self._cursor * 4 - instResult.absolute_offset
-                    if inst_size != (delay_inst.params[1].value + delay_inst.length):
-                        garbage_size = ((delay_inst.params[1].value + delay_inst.length) - inst_size) // 4
+                    if inst_size != (delay_inst.params[1].value + delay_length):
+                        garbage_size = ((delay_inst.params[1].value + delay_length) - inst_size) // 4
                         garbage = bytearray(b'')
                         for i in range(self._cursor, self._cursor + garbage_size):
                             garbage += self.getWord(i * 4)
@@ -332,6 +362,7 @@ class SCTDecoder:
                         self._cursor += garbage_size
 
                 section.add_instruction(instResult)
+                self._add_inst_offset(instResult.absolute_offset, sect_name, instResult.ID)
 
                 if instResult.base_id in (24, 25):
                     self._footer_dialog_locs.append([sect_name, instResult.ID])
@@ -379,7 +410,7 @@ class SCTDecoder:
                     if switch_len < min_case_start_offset:
                         print(f'switch with garbage here {section.name}')
                         garbage_size = min_case_start_offset - switch_len
-                        garbage = self._sct[self._cursor * 4: (self._cursor + garbage_size) * 4]
+                        garbage = bytearray(self._sct[self._cursor * 4: (self._cursor + garbage_size) * 4])
                         instResult.add_error(('Garbage', garbage))
                         self._cursor += garbage_size
                     elif switch_len > min_case_start_offset:
@@ -387,7 +418,7 @@ class SCTDecoder:
 
                 if instResult.base_id == 0xc:
                     section.add_error('Garbage: garbage instruction(s) after return')
-                    garbage = self._sct[self._cursor * 4:bounds[1]]
+                    garbage = bytearray(self._sct[self._cursor * 4:bounds[1]])
                     self._cursor = bounds[1] // 4
                     instResult.add_error(('Garbage', garbage))
 
@@ -447,7 +478,7 @@ class SCTDecoder:
             else:
                 cur_pos = self._cursor * 4
                 absolute_pos = cur_pos + self._sctStart
-                param = currWord
+                param = self.getWord(cur_pos)
 
                 # Since 0x04000000 is reserved for SCPTAnalyze, capture any instructions following this code as SCPT parameters
                 if currWord_int == 0x04000000:
@@ -455,9 +486,8 @@ class SCTDecoder:
                     while currWord_int != 0x0000001d:
                         length += 1
                         self._cursor += 1
-                        currWord = self.getWord(self._cursor * 4)
-                        currWord_int = int.from_bytes(currWord, byteorder=self._cur_endian)
-                        param += currWord
+                        currWord_int = self.getInt(self._cursor * 4)
+                        param += self.getWord(self._cursor * 4)
                     error_str = f'{self.log_key}: Extra SCPT parameter found:\n\tSCPT Position: {cur_pos}'
                     error_str += f'\n\tAbsolute Position: {absolute_pos}'
                     if int(inst_list_id):
@@ -491,47 +521,29 @@ class SCTDecoder:
         cur_inst.set_inst_id(inst_id)
         cur_inst.set_pos(inst_pos)
         trace.append(cur_inst.ID)
-        base_inst = self._inst_lib.get_inst(inst_id=inst_id)
+        layout = self._inst_lib.get_inst_layout(inst_id)
         self._cursor += 1
 
-        # decode parameters
-        parameters = copy.deepcopy(base_inst.params)
-        loop_parameters = []
-        hasLoop = base_inst.loop is not None
-        if hasLoop:
-            loop_parameters = [parameters[_] for _ in base_inst.loop]
-            for p_id in base_inst.loop:
-                parameters.pop(p_id)
-
-        cur_param_num = 0
-        used_params = []
-        for p_id, base_param in parameters.items():
-            if p_id != cur_param_num:
-                break
-            param = self._decode_param(base_param, [*trace, f'{p_id}'])
+        # decode parameters, base parameters are only read so they are shared rather than copied
+        for base_param in layout.params_before:
+            param = self._decode_param(base_param, [*trace, f'{base_param.param_ID}'])
             if param.link is not None:
                 cur_inst.links_out.append(param.link)
-            cur_inst.add_parameter(p_id, param)
-            used_params.append(p_id)
-            cur_param_num += 1
-
-        for p in used_params:
-            parameters.pop(p)
+            cur_inst.add_parameter(base_param.param_ID, param)
 
         willLoop = True
-        if base_inst.loop_cond is not None:
-            l_c = base_inst.loop_cond
+        l_c = layout.loop_cond
+        if l_c is not None:
             if l_c['Location'] == 'External':
                 if self._loop_cond_tests[l_c['Test']](cur_inst.params[l_c['Parameter']].value, l_c['Value']):
                     willLoop = False
 
-        if hasLoop and willLoop:
-            max_iter = cur_inst.params[base_inst.loop_iter].value
+        if len(layout.loop) > 0 and willLoop:
+            max_iter = cur_inst.params[layout.loop_iter].value
             cur_iter = 0
-            done = False
-            while not done and cur_iter < max_iter:
+            while cur_iter < max_iter:
                 param_group = {}
-                for p in loop_parameters:
+                for p in layout.loop:
                     param = self._decode_param(p, [*trace, f'{cur_iter}{sep}{p.param_ID}'])
                     param_group[p.param_ID] = param
                     if param.link is not None:
@@ -539,22 +551,16 @@ class SCTDecoder:
 
                 cur_inst.add_loop_parameter(param_group)
 
-                if base_inst.loop_cond is not None:
-                    l_c = base_inst.loop_cond
+                if l_c is not None:
                     if l_c['Location'] == 'Internal':
                         if self._loop_cond_tests[l_c['Test']](param_group[l_c['Parameter']].value, l_c['Value']):
                             break
 
                 cur_iter += 1
 
-        if len(parameters) == 0:
-            return cur_inst
-
-        for p_id, base_param in parameters.items():
-            if p_id != cur_param_num:
-                break
-            param = self._decode_param(base_param, [*trace, f'{p_id}'])
-            cur_inst.add_parameter(base_param.type, param)
+        for base_param in layout.params_after:
+            param = self._decode_param(base_param, [*trace, f'{base_param.param_ID}'])
+            cur_inst.add_parameter(base_param.param_ID, param)
             if param.link is not None:
                 cur_inst.links_out.append(param.link)
 
@@ -622,9 +628,7 @@ class SCTDecoder:
                 cur_param.arithmetic_value = arithmetic_result
 
         elif 'int' in param_type:
-            currWord = self.getWord(self._cursor * 4)
-            if self._cur_endian == 'little':
-                currWord = bytearray(reversed(currWord))
+            currWord = self.getRawWord(self._cursor * 4)
 
             if 'var' in param_type:
                 param_value = self._resolve_SCPT_code_only()
@@ -684,21 +688,59 @@ class SCTDecoder:
         return value
 
     def _SCPT_analyze(self, param: SCTParameter):
+        currentWord = self.getInt(self._cursor * 4)
+
+        # First check that the first word is not a special value
+        if currentWord in self._p_codes.no_loop.keys():
+            param.add_raw(self.getRawWord(self._cursor * 4))
+            self._cursor += 1
+            return self._p_codes.no_loop[currentWord]
+
+        # The same expressions appear throughout the game, so analyses are shared between parameters
+        key = self._scpt_cache_key(param)
+        analysis = None if key is None else self._scpt_cache.get(key)
+        if analysis is None:
+            analysis = self._analyze_scpt_words(param.ID)
+            if key is not None:
+                self._scpt_cache.put(key, analysis)
+        else:
+            self._cursor += analysis[1]
+
+        result, _, raw, scpt_result, errors, arithmetic_result = analysis
+        for error in errors:
+            param.add_error(error)
+        if arithmetic_result is not _no_result:
+            param.set_arithmetic_result(arithmetic_result)
+        param.add_raw(raw)
+        param.set_param_log(scpt_result)
+
+        return result
+
+    def _scpt_cache_key(self, param: SCTParameter):
+        # The words of the expression up to its stop code, skipping the values of float inputs
+        start = self._cursor
+        end = start
+        words = self._words[self._cur_endian]
+        while end < len(words):
+            word = words[end]
+            if word == self._p_codes.stop_code:
+                return self._cur_endian, param.ID, bytes(self._sct[start * 4: (end + 1) * 4])
+            if 0x04000000 <= word < 0x08000000:
+                end += 1
+            end += 1
+        return None
 
+    def _analyze_scpt_words(self, param_id):
+        """Analyzes the SCPT expression at the cursor and moves the cursor past it. Returns the result, the number
+        of words read, the raw bytes, the analysis log, the errors and the arithmetic result, which are shared
+        between parameters with the same expression and must not be changed"""
         scpt_result = {}
-        param_key = f'{param.ID}_S'
+        param_key = f'{param_id}_S'
         done = False
         roundNum = 0
-        currentWord = self.getWord(self._cursor * 4)
-        raw = currentWord
-        if self._cur_endian == 'little':
-            raw = bytearray(reversed(currentWord))
-
-        # First check that the first word is not a special value
-        if int.from_bytes(currentWord, byteorder=self._cur_endian) in self._p_codes.no_loop.keys():
-            param.add_raw(raw)
-            self._cursor += 1
-            return self._p_codes.no_loop[int.from_bytes(currentWord, byteorder=self._cur_endian)]
+        start = self._cursor
+        errors = []
+        arithmetic_result = _no_result
 
         raw = bytearray(b'')
         # Resolve the SCPT analysis
@@ -707,18 +749,14 @@ class SCTDecoder:
         stack_index: int = 0
         max_index = 18
         while not done:
-            currentWord = self.getWord(self._cursor * 4)
-            temp_raw = currentWord
-            if self._cur_endian == 'little':
-                temp_raw = bytearray(reversed(currentWord))
-            raw.extend(temp_raw)
-            currentWord = int.from_bytes(currentWord, byteorder=self._cur_endian)
+            raw.extend(self.getRawWord(self._cursor * 4))
+            currentWord = self.getInt(self._cursor * 4)
 
             cur_result = ''
 
             # Make sure that the SCPT Stack wouldn't overflow
             if stack_index >= max_index:
-                param.add_error(f'SCPT Stack overflow: {currentWord}')
+                errors.append(f'SCPT Stack overflow: {currentWord}')
                 break
 
             # Check for end of the SCPT Analysis loop
@@ -761,7 +799,7 @@ class SCTDecoder:
                         inputs.append(v)
                 if len(inputs) == 2:
                     result = self._scpt_arithmetic_fxns[self._p_codes.arithmetic[currentWord][4]](inputs[0], inputs[1])
-                    param.set_arithmetic_result(result)
+                    arithmetic_result = result
                 result_stack[stack_index + nones] = cur_result
                 stack_index -= 1
 
@@ -783,10 +821,7 @@ class SCTDecoder:
                     else:
                         if action == 0x04000000:
                             self._cursor += 1
-                            word = self.getWord(self._cursor * 4)
-                            if self._cur_endian == 'little':
-                                word = list(reversed(word))
-                            raw.extend(word)
+                            raw.extend(self.getRawWord(self._cursor * 4))
                             result = self.getFloat(self._cursor * 4)
                         elif action == 0x08000000:
                             obtainedValue = str((currentWord & 0xffff00) >> 8)
@@ -818,18 +853,15 @@ class SCTDecoder:
             self._cursor += 1
             roundNum += 1
             if self._cursor >= self._sctLength:
-                param.add_error('SCPTanalyze did not finish before next sct section')
+                errors.append('SCPTanalyze did not finish before next sct section')
                 break
 
         if result_stack[2] is None:
-            param.add_error('Error: No value generated')
-
-        param.add_raw(raw)
-        param.set_param_log(scpt_result)
+            errors.append('Error: No value generated')
 
         self._cursor += 1
 
-        return result_stack[2]
+        return result_stack[2], self._cursor - start, bytes(raw), scpt_result, tuple(errors), arithmetic_result
 
     # ------------------------ #
     # Decoder helper functions #
@@ -866,14 +898,24 @@ class SCTDecoder:
         testWord = self.getInt(cursor * 4)
         return testWord < 0 or testWord > 265
 
+    def _set_sct(self, sct):
+        # Body words are cast once per endian so that aligned reads are a single array lookup
+        self._sct = memoryview(sct)
+        self._sctLength = len(self._sct)
+        self._word_end = self._sctLength - self._sctLength % 4
+        big_words = array(word_typecode)
+        big_words.frombytes(self._sct[:self._word_end])
+        little_words = array(word_typecode, big_words)
+        (big_words if sys.byteorder == 'little' else little_words).byteswap()
+        self._words = {'big': big_words, 'little': little_words}
+
     def getInt(self, pos: int):
-        return int.from_bytes(bytes=self.getWord(pos), byteorder=self._cur_endian)
+        if pos & 3 == 0 and 0 <= pos < self._word_end:
+            return self._words[self._cur_endian][pos >> 2]
+        return int.from_bytes(bytes=self._sct[pos: pos + 4], byteorder=self._cur_endian)
 
     def getFloat(self, pos: int):
-        word = self.getWord(pos)
-        if self._cur_endian == 'little':
-            word = bytearray(reversed(word))
-        return struct.unpack('!f', word)[0]
+        return struct.unpack('!f', self.getRawWord(pos))[0]
 
     def getString(self, pos: int, max_len=None, encoding='shiftjis', force_jis=False) -> str:
         size = 0
@@ -886,7 +928,7 @@ class SCTDecoder:
             if max_len is not None:
                 if size == max_len:
                     break
-        str_bytes = self._sct[pos: pos + size]
+        str_bytes = bytes(self._sct[pos: pos + size])
 
         if len(str_bytes) > 3 and not self._EU_encoding:
             if str_bytes[3] == 0xab:
@@ -935,7 +977,14 @@ class SCTDecoder:
         return garbage
 
     def getWord(self, pos) -> bytearray:
-        return self._sct[pos: pos + 4]
+        return bytearray(self._sct[pos: pos + 4])
+
+    def getRawWord(self, pos) -> bytearray:
+        # Returns the word in big endian byte order, as stored in parameter raw bytes
+        word = self.getWord(pos)
+        if self._cur_endian == 'little':
+            word.reverse()
+        return word
 
     # -------------------------- #
     # Organize newly decoded sct #
@@ -953,9 +1002,7 @@ class SCTDecoder:
 
         # Setup links
         print(f'{self.log_key}: Setting Up Links...', end='\r')
-        done = False
-        while not done:
-            done = self._setup_scpt_links(decoded_sct=decoded_sct)
+        self._setup_scpt_links(decoded_sct=decoded_sct)
 
         self._resolve_scpt_links(decoded_sct=decoded_sct)
         self._setup_string_links(decoded_sct=decoded_sct)
@@ -1017,73 +1064,90 @@ class SCTDecoder:
             raise ValueError(f'{self.log_key}: setup scpt links requires either a decoded sct or sect info')
         blank_section = SCTSection()
         self.successful_scpt_links = []
-        for link in self._scpt_links:
-            target_sect = blank_section if decoded_sct is not None else sect_info['section']
+        # Instructions decoded from garbage can add links to the end of the list while it is being resolved
+        link_ind = 0
+        while link_ind < len(self._scpt_links):
+            link = self._scpt_links[link_ind]
+            link_ind += 1
             target_pos = link.target
             if sect_info is None:
-                for sect_name, bounds in self._index.items():
-                    if bounds[0] <= link.target < bounds[1]:
-                        target_sect = decoded_sct.sects[sect_name]
-                        break
+                target_sect = self.find_sect_by_pos(decoded_sct, target_pos)
+                if target_sect is None:
+                    target_sect = blank_section
             elif (target_pos - sect_info['offset']) < sect_info['bounds'][0] \
                     or (target_pos - sect_info['offset']) >= sect_info['bounds'][1]:
                 continue
             else:
+                target_sect = sect_info['section']
                 target_pos -= sect_info['offset']
-            target_inst_ind = 0
-            inst = None
-            while target_inst_ind < len(target_sect.insts):
-                inst = target_sect.get_inst_by_index(target_inst_ind)
-                if inst.absolute_offset == target_pos:
-                    break
 
-                if target_inst_ind == len(target_sect.insts) - 1:
-                    inst_end = target_sect.absolute_offset + target_sect.length
-                else:
-                    inst_end = target_sect.get_inst_by_index(target_inst_ind + 1).absolute_offset
+            inst = self._find_link_target(decoded_sct, target_sect, target_pos, link)
 
-                if inst.absolute_offset < target_pos < inst_end:
-                    internal = True
-                    new_error = None
-                    for i, e in enumerate(inst.errors):
-                        if e[0] != 'Garbage':
-                            continue
-                        internal = False
-                        first_start = inst_end - len(e[1])
-                        if target_pos < first_start:
-                            internal = True
-                            break
-                        new_error = e[1][:target_pos - first_start]
-                        break
+            link.target_trace = [target_sect.name, inst.ID]
+            self.successful_scpt_links.append(link)
 
-                    if internal:
-                        print(f'{self.log_key}: link position is internal to an instruction '
-                              f'at {target_sect.name}:{target_inst_ind}: \n\t{link}')
-                        decoded_sct.errors.append(
-                            f'link position is internal to an instruction at {target_sect.name}:{target_inst_ind}: \n\t{link}')
-                        break
+        self._decoded_scpt_links = [*self._decoded_scpt_links, *self._scpt_links]
+        self._scpt_links = []
 
-                    inst_num_before = len(target_sect.inst_list)
-                    self._decode_garbage(sect=target_sect, inst=inst, start=target_pos, end=inst_end,
-                                         delete_if_insts_created=True)
+    def _find_link_target(self, decoded_sct, target_sect, target_pos, link) -> Union[None, SCTInstruction]:
+        """Returns the instruction of the section at target_pos. If target_pos is inside an instruction's garbage,
+        the garbage is decoded first. Otherwise the instruction containing target_pos is returned"""
+        while True:
+            ind = bisect_right(self._inst_offsets, target_pos) - 1
+            if ind < 0 or self._inst_locs[ind][0] != target_sect.name:
+                # No instruction of the section starts before the target, use the last instruction of the section
+                return None if len(target_sect.inst_list) == 0 else target_sect.get_inst_by_index(-1)
 
-                    if new_error is not None and inst_num_before < len(target_sect.inst_list):
-                        if len(new_error) > 0:
-                            inst.errors.append(('Garbage', new_error))
+            inst = target_sect.insts[self._inst_locs[ind][1]]
+            if inst.absolute_offset == target_pos:
+                return inst
 
-                    print(
-                        f'{self.log_key}: New instructions decoded at {target_sect.name}:{target_inst_ind + 1}. Restarting Link setup...',
-                        end='\r')
-                    return False
+            if ind + 1 < len(self._inst_locs) and self._inst_locs[ind + 1][0] == target_sect.name:
+                inst_end = self._inst_offsets[ind + 1]
+            else:
+                inst_end = target_sect.absolute_offset + target_sect.length
 
-                target_inst_ind += 1
+            if not inst.absolute_offset < target_pos < inst_end:
+                return inst
 
-            link.target_trace = [target_sect.name, inst.ID]
-            self.successful_scpt_links.append(link)
+            internal = True
+            new_error = None
+            for i, e in enumerate(inst.errors):
+                if e[0] != 'Garbage':
+                    continue
+                internal = False
+                first_start = inst_end - len(e[1])
+                if target_pos < first_start:
+                    internal = True
+                    break
+                new_error = e[1][:target_pos - first_start]
+                break
 
-        self._decoded_scpt_links = [*self._decoded_scpt_links, *self._scpt_links]
-        self._scpt_links = []
-        return True
+            target_inst_ind = target_sect.inst_list.index(inst.ID)
+            if not internal:
+                inst_num_before = len(target_sect.inst_list)
+                self._decode_garbage(sect=target_sect, inst=inst, start=target_pos, end=inst_end,
+                                     delete_if_insts_created=True)
+                internal = inst_num_before == len(target_sect.inst_list)
+
+                if new_error is not None and not internal:
+                    if len(new_error) > 0:
+                        inst.errors.append(('Garbage', new_error))
+
+            if internal:
+                print(f'{self.log_key}: link position is internal to an instruction '
+                      f'at {target_sect.name}:{target_inst_ind}: \n\t{link}')
+                if decoded_sct is not None:
+                    decoded_sct.errors.append(
+                        f'link position is internal to an instruction at {target_sect.name}:{target_inst_ind}: \n\t{link}')
+                return inst
+
+            print(f'{self.log_key}: New instructions decoded at {target_sect.name}:{target_inst_ind + 1}', end='\r')
+
+    def _add_inst_offset(self, offset, sect_name, inst_id):
+        ind = bisect_right(self._inst_offsets, offset)
+        self._inst_offsets.insert(ind, offset)
+        self._inst_locs.insert(ind, (sect_name, inst_id))
 
     def _resolve_scpt_links(self, decoded_sct: SCTScript, links=None):
         if links is None:
@@ -1108,23 +1172,13 @@ class SCTDecoder:
 
     def _setup_string_links(self, decoded_sct):
         # setup string links
-        sect_keys = list(decoded_sct.sects.keys())
         for link in self._str_sect_links:
             target_sct_str = ''
-            target_sct_id = 0
-            while target_sct_id < len(decoded_sct.sects):
-                section = decoded_sct.sects[sect_keys[target_sct_id]]
-                if link.target == section.absolute_offset:
-                    target_sct_str = section.name
-                    break
-                if target_sct_id == len(decoded_sct.sects) - 1:
-                    sect_end = section.absolute_offset + section.length
-                else:
-                    sect_end = decoded_sct.sects[sect_keys[target_sct_id + 1]].absolute_offset
-                if section.absolute_offset < link.target < sect_end:
-                    print(f'link position is incorrect: \n\t{link}')
-                    break
-                target_sct_id += 1
+            ind = bisect_right(self._sect_starts, link.target) - 1
+            if ind >= 0 and self._sect_starts[ind] == link.target:
+                target_sct_str = self._sect_bounds[ind][2]
+            elif self.find_sect_by_pos(decoded_sct, link.target) is not None:
+                print(f'link position is incorrect: \n\t{link}')
 
             # Fix for strings with '\c' on the end to move the text box fade to a parameter instead of hardcoded
             # in the string.
@@ -1666,9 +1720,7 @@ class SCTDecoder:
 
         self._decode_garbage(sect=sect, inst=prev_inst, delete_if_insts_created=True)
 
-        done = False
-        while not done:
-            done = self._setup_scpt_links(decoded_sct=decoded_sct)
+        self._setup_scpt_links(decoded_sct=decoded_sct)
 
         self._resolve_scpt_links(decoded_sct=decoded_sct)
         self._setup_string_links(decoded_sct=decoded_sct)
@@ -1894,37 +1946,22 @@ class SCTDecoder:
                         return name
 
     def find_sect_by_pos(self, decoded_sct, pos) -> Union[None, SCTSection]:
-        for sect_name, bounds in self._index.items():
-            if bounds[0] <= pos < bounds[1]:
-                return decoded_sct.sects[sect_name]
-        return None
+        ind = bisect_right(self._sect_starts, pos) - 1
+        if ind < 0 or pos >= self._sect_bounds[ind][1]:
+            return None
+        return decoded_sct.sects[self._sect_bounds[ind][2]]
 
     def _find_inst_by_pos(self, sct: SCTScript, pos: int) -> Union[None, SCTInstruction]:
         sect = self.find_sect_by_pos(sct, pos)
-        inst_list = sect.inst_list
-        found = False
-        pos_range = self._index[sect.name]
-        cur_ind = int(len(inst_list) * ((pos - pos_range[0]) / (pos_range[1] - pos_range[0])))
-        while -1 < cur_ind < len(inst_list):
-            cur_inst = sect.insts[inst_list[cur_ind]]
+        ind = bisect_right(self._inst_offsets, pos) - 1
+        if ind >= 0 and self._inst_locs[ind][0] == sect.name:
+            cur_inst = sect.insts[self._inst_locs[ind][1]]
             if cur_inst.absolute_offset == pos:
-                found = True
-                break
-            if cur_inst.absolute_offset < pos < sect.insts[inst_list[cur_ind + 1]].absolute_offset:
-                print(
-                    f'SCPT Decoder: Find Inst: Target pos in middle of inst {sect.name}:{cur_inst.ID} - {pos}')
-                break
-            if cur_inst.absolute_offset < pos:
-                cur_ind += 1
-            else:
-                cur_ind -= 1
+                return cur_inst
+            print(f'SCPT Decoder: Find Inst: Target pos in middle of inst {sect.name}:{cur_inst.ID} - {pos}')
 
-        if not found:
-            print(
-                f'SCPT Decoder: Find Inst: Entry not found: - {pos}')
-            return None
-
-        return sect.insts[sect.inst_list[cur_ind]]
+        print(f'SCPT Decoder: Find Inst: Entry not found: - {pos}')
+        return None
 
     @staticmethod
     def get_prev_inst(sct: SCTScript, cur_sect: str, cur_inst: str) -> (str, SCTInstruction):
@@ -1970,29 +2007,27 @@ class SCTDecoder:
         print(f'{self.log_key}: {decoded_sct.name} finished')
 
     def _setup_variables(self, sct):
+        # Parameters with the same SCPT expression share their value, so each value is only searched once
+        var_lists = {}
         for s_name, section in sct.sects.items():
             for inst_key, inst in section.insts.items():
                 for pID, param in inst.params.items():
                     if isinstance(param.value, dict):
-                        var_list = self._extract_variables(param.value)
+                        var_list = self._get_variables(param, var_lists)
                         self._add_variable_locations(var_list, (s_name, inst_key, f'{pID}'))
                 for loop_id, loop in enumerate(inst.l_params):
                     for pID, param in loop.items():
                         if isinstance(param.value, dict):
-                            var_list = self._extract_variables(param.value)
+                            var_list = self._get_variables(param, var_lists)
                             self._add_variable_locations(var_list, (s_name, inst_key, f'{loop_id}{sep}{pID}'))
 
         sct.variables = self._variables
 
-    def _extract_variables(self, cur_element, var_list=None):
+    @staticmethod
+    def _get_variables(param: SCTParameter, var_lists):
+        var_list = var_lists.get(id(param.value), None)
         if var_list is None:
-            var_list = []
-        if isinstance(cur_element, dict):
-            for value in cur_element.values():
-                var_list = self._extract_variables(value, var_list=var_list)
-        elif isinstance(cur_element, str):
-            if 'Var:' in cur_element:
-                var_list.append(cur_element)
+            var_list = var_lists[id(param.value)] = param.get_variables()
         return var_list
 
     def _add_variable_locations(self, var_list, trace):
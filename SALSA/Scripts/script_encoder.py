@@ -1,8 +1,11 @@
 import copy
 import re
-from typing import Union, Literal
+import struct
+from dataclasses import dataclass
+from typing import Union, Literal, Dict, List, Tuple, Any
 
 from SALSA.Common.constants import alt_sep, footer_str_group_name
+from SALSA.Common.containers import LRUCache
 from SALSA.Common.script_string_utils import fix_string_encoding_errors
 from SALSA.BaseInstructions.bi_facade import BaseInstLibFacade
 from SALSA.Common.byte_array_utils import float2Hex
@@ -11,10 +14,24 @@ from SALSA.Scripts.scpt_param_codes import SCPTParamCodes
 from SALSA.Scripts.scpt_compare_fxns import is_equal, not_equal
 
 
+@dataclass
+class EncodedSection:
+    """A section encoded on its own with positions relative to its start, and its links left unresolved"""
+    body: bytes
+    eu_encoding: bool
+    eu_encoding_after: bool
+    sct_links: List[Tuple[int, Any]]
+    string_links: List[Tuple[int, Any]]
+    footer_links: List[Tuple[int, Any]]
+    inst_positions: List[Tuple[str, int]]
+    headers: List[Tuple[str, int]]
+    errors: list
+
+
 class SCTEncoder:
     log_key = 'SCTEncoder'
     skip_refresh = 13
-    _placeholder = bytearray(b'\x7f\x7f\xff\xff')
+    _placeholder = b'\x7f\x7f\xff\xff'
     endian_struct_format = {'big': '>', 'little': '<'}
     _header_offset_length = 0x4
     _header_name_length = 0x10
@@ -27,10 +44,18 @@ class SCTEncoder:
 
     param_tests = {'==': is_equal, '!=': not_equal}
 
+    # Shared encodings of SCPT expressions, keyed on the endian and the repr of the expression
+    _scpt_cache = LRUCache(maxsize=4096)
+
     def __init__(self, script: SCTScript, base_insts: BaseInstLibFacade, update_inst_pos=True,
-                 endian: Literal['little', 'big'] = 'big', validation=False, eu_validation=False):
+                 endian: Literal['little', 'big'] = 'big', validation=False, eu_validation=False,
+                 section_cache: Union[None, Dict[str, EncodedSection]] = None):
         self.sct_body = bytearray()
 
+        # Sections encoded by a previous encoder of this script with the same options. Sections found here are
+        # reused as they are, so changed sections must be removed from it by the caller
+        self.section_cache = section_cache
+
         # for decoder, encoder validation only
         self.validation = validation
         self._EU_validation = eu_validation
@@ -141,6 +166,9 @@ class SCTEncoder:
         self.footer_dict = {}
         self.added_string_groups = []
         self.endian = endian
+        self._word_structs = {signed: struct.Struct(f'{self.endian_struct_format[endian]}{code}')
+                              for signed, code in ((False, 'I'), (True, 'i'))}
+        self._word_cache = {}
         self.param_code = SCPTParamCodes(is_decoder=False)
 
         # Links will start off being a dictionary with origin_offset: (string or section or jmp_target)
@@ -155,10 +183,11 @@ class SCTEncoder:
     @classmethod
     def encode_sct_file_from_project_script(cls, project_script: SCTScript, base_insts: BaseInstLibFacade, endian,
                                             use_garbage=True, combine_footer_links=False, add_spurious_refresh=True,
-                                            update_inst_pos=True, validation=False, eu_validation=False, separate_index=False):
+                                            update_inst_pos=True, validation=False, eu_validation=False, separate_index=False,
+                                            section_cache=None):
         print(f'{cls.log_key}: encoding {project_script.name}')
         encoder = cls(script=project_script, base_insts=base_insts, update_inst_pos=update_inst_pos,
-                      validation=validation, eu_validation=eu_validation, endian=endian)
+                      validation=validation, eu_validation=eu_validation, endian=endian, section_cache=section_cache)
         encoder.encode_sct_file(use_garbage=use_garbage, combine_footer_links=combine_footer_links,
                                 add_spurious_refresh=add_spurious_refresh)
         print(f'{cls.log_key}: finished encoding for {project_script.name}')
@@ -166,22 +195,30 @@ class SCTEncoder:
             return encoder.sct_head[0xc:], encoder.sct_body + encoder.sct_foot
         return encoder.sct
 
+    @classmethod
+    def layout_sct_from_project_script(cls, project_script: SCTScript, base_insts: BaseInstLibFacade, endian='big',
+                                       use_garbage=True, add_spurious_refresh=True, start_section=None):
+        encoder = cls(script=project_script, base_insts=base_insts, update_inst_pos=True, endian=endian)
+        encoder.layout_sct_file(use_garbage=use_garbage, add_spurious_refresh=add_spurious_refresh,
+                                start_section=start_section)
+
     def encode_sct_file(self, use_garbage=True, combine_footer_links=False, add_spurious_refresh=False):
         self.use_garbage = use_garbage
         self.combine_footer_links = combine_footer_links
         self.add_spurious_refresh = add_spurious_refresh
 
-        pops = []
-        for i, error in enumerate(self.script.errors):
-            if 'Encoding' in error:
-                pops.append(i)
-
-        for i in reversed(pops):
-            self.script.errors.pop(i)
+        self._clear_encoding_errors()
 
         # encode sections in order
         for name in self.script.sect_list:
             section = self.script.sects[name]
+            if self.section_cache is not None:
+                encoded = self.section_cache.get(name, None)
+                if encoded is None or encoded.eu_encoding != self._EU_encoding:
+                    encoded = self.section_cache[name] = self._encode_section_separately(name=name, section=section)
+                self._add_encoded_section(section=section, encoded=encoded)
+                continue
+
             self._encode_section(name=name, section=section)
 
             # if string group header is added, add strings below it
@@ -197,8 +234,8 @@ class SCTEncoder:
                 print(f'No target inst{jmp_to[1]}')
                 continue
             jmp_to_pos = self.inst_positions[jmp_to[1]]
-            jmp_offset = self._make_word(i=(jmp_to_pos - link_offset), signed=True)
-            self._sct_body_insert_hex(location=link_offset, value=jmp_offset, validation=self._placeholder)
+            self._sct_body_insert_word(location=link_offset, i=(jmp_to_pos - link_offset), signed=True,
+                                       validation=self._placeholder)
 
         # Resolve string links
         for link_offset, (section, trace) in self.string_links.items():
@@ -210,8 +247,7 @@ class SCTEncoder:
                 continue
             str_pos = self.header_dict[section]
             str_offset = str_pos - link_offset
-            str_offset_word = self._make_word(i=str_offset, signed=True)
-            self._sct_body_insert_hex(location=link_offset, value=str_offset_word, validation=self._placeholder)
+            self._sct_body_insert_word(location=link_offset, i=str_offset, signed=True, validation=self._placeholder)
 
         # Add footer entries in order by links while resolving links
         has_footer_dialogue = footer_str_group_name in self.script.string_groups
@@ -227,9 +263,8 @@ class SCTEncoder:
                 str_pos = len(self.sct_body) + len(self.sct_foot)
                 added_footer_entries[string] = str_pos
             str_offset = str_pos - offset
-            str_offset_word = self._make_word(i=str_offset)
             self.sct_foot.extend(self._encode_string(string=string, align=False))
-            self._sct_body_insert_hex(location=offset, value=str_offset_word, validation=self._placeholder)
+            self._sct_body_insert_word(location=offset, i=str_offset, validation=self._placeholder)
 
         # Build header
         header_len = self._make_word(len(self.header_dict))
@@ -243,6 +278,121 @@ class SCTEncoder:
 
         return self.sct
 
+    def layout_sct_file(self, use_garbage=True, add_spurious_refresh=False, start_section=None):
+        """Sets the offsets of sections and instructions as encode_sct_file would, without encoding them.
+        If start_section is given, sections before it keep their offsets and layout starts from its offset"""
+        self.use_garbage = use_garbage
+        self.add_spurious_refresh = add_spurious_refresh
+
+        sect_list = self.script.sect_list
+        start_index = 0
+        position = 0
+        if start_section in self.script.sects:
+            start_offset = self.script.sects[start_section].absolute_offset
+            if isinstance(start_offset, int) and start_offset >= 0:
+                start_index = sect_list.index(start_section)
+                position = start_offset
+        layout_sects = sect_list[start_index:]
+
+        # Strings in earlier string groups can switch the encoding used for later ones
+        for name in sect_list[:start_index]:
+            if self._EU_encoding:
+                break
+            if name in self.script.string_groups.keys():
+                if any('«' in self.script.strings[s] for s in self.script.string_groups[name]):
+                    self._EU_encoding = True
+
+        if start_index == 0:
+            self._clear_encoding_errors()
+        else:
+            self._clear_encoding_errors(sections=set(layout_sects))
+
+        for name in layout_sects:
+            position = self._layout_section(name=name, section=self.script.sects[name], position=position)
+            if name in self.script.string_groups.keys():
+                position += self._string_group_size(name)
+
+        # Check link targets for the laid out sections
+        inst_ids = set()
+        headers = set()
+        for name in sect_list:
+            section = self.script.sects[name]
+            inst_ids.update(section.inst_list)
+            for inst_id in section.inst_list:
+                if section.insts[inst_id].base_id == 9:
+                    headers.add(section.insts[inst_id].label)
+            if name in self.script.string_groups.keys():
+                headers.update(self.script.string_groups[name])
+
+        for jmp_to, trace in self.sct_links.values():
+            if jmp_to[1] not in inst_ids:
+                self.script.errors.append(
+                    ('Encoding', 'Link', f'No target inst {jmp_to[0]}-{jmp_to[1]}', alt_sep.join(trace)))
+
+        for section, trace in self.string_links.values():
+            if 'FOOTER' in section:
+                continue
+            if section not in headers:
+                self.script.errors.append(('Encoding', 'String', f'No string {section}', alt_sep.join(trace)))
+
+    def _clear_encoding_errors(self, sections=None):
+        pops = []
+        for i, error in enumerate(self.script.errors):
+            if 'Encoding' not in error:
+                continue
+            if sections is not None and error[3].split(alt_sep)[0] not in sections:
+                continue
+            pops.append(i)
+
+        for i in reversed(pops):
+            self.script.errors.pop(i)
+
+    def _encode_section_separately(self, name, section):
+        state = (self.sct_body, self.sct_links, self.string_links, self.footer_links, self.inst_positions,
+                 self.header_dict)
+        self.sct_body = bytearray()
+        self.sct_links = {}
+        self.string_links = {}
+        self.footer_links = {}
+        self.inst_positions = {}
+        self.header_dict = {}
+        eu_encoding = self._EU_encoding
+        error_count = len(self.script.errors)
+        try:
+            self._encode_section(name=name, section=section)
+            if name in self.script.string_groups.keys():
+                self.added_string_groups.append(name)
+                self._add_strings(name)
+            encoded = EncodedSection(
+                body=bytes(self.sct_body), eu_encoding=eu_encoding, eu_encoding_after=self._EU_encoding,
+                sct_links=list(self.sct_links.items()), string_links=list(self.string_links.items()),
+                footer_links=list(self.footer_links.items()), inst_positions=list(self.inst_positions.items()),
+                headers=list(self.header_dict.items()), errors=self.script.errors[error_count:])
+        finally:
+            del self.script.errors[error_count:]
+            (self.sct_body, self.sct_links, self.string_links, self.footer_links, self.inst_positions,
+             self.header_dict) = state
+        return encoded
+
+    def _add_encoded_section(self, section, encoded: EncodedSection):
+        start = len(self.sct_body)
+        section.absolute_offset = start
+        self.sct_body.extend(encoded.body)
+        for offset, link in encoded.sct_links:
+            self.sct_links[start + offset] = link
+        for offset, link in encoded.string_links:
+            self.string_links[start + offset] = link
+        for offset, link in encoded.footer_links:
+            self.footer_links[start + offset] = link
+        for inst_id, offset in encoded.inst_positions:
+            self.inst_positions[inst_id] = start + offset
+            if self.update_inst_pos:
+                section.insts[inst_id].absolute_offset = start + offset
+        for name, offset in encoded.headers:
+            self.header_dict[name] = start + offset
+        self.script.errors.extend(encoded.errors)
+        self._EU_encoding = encoded.eu_encoding_after
+
     def _add_strings(self, string_group_name):
         string_group = self.script.string_groups[string_group_name]
         for name in string_group:
@@ -258,6 +408,25 @@ class SCTEncoder:
                 if 'end' in garbage:
                     self.sct_body.extend(garbage['end'])
 
+    def _string_group_size(self, string_group_name):
+        size = 0
+        for name in self.script.string_groups[string_group_name]:
+            size += len(self._str_label) + len(self._encode_string(string=self.script.strings[name], align=True))
+            garbage = self.script.string_garbage.get(name, {})
+            if 'end' in garbage:
+                size += len(garbage['end'])
+        return size
+
+    def _layout_section(self, name, section, position):
+        section.absolute_offset = position
+        for inst_id in section.inst_list:
+            position += self._instruction_size(section.insts[inst_id], position=position, e_trace=[name])
+
+        if self.use_garbage:
+            if 'end' in section.garbage.keys():
+                position += len(section.garbage['end'])
+        return position
+
     def _encode_section(self, name, section):
         # If the inst is a label, just add the entry to the header and add a string label
         sect_name = name
@@ -316,61 +485,16 @@ class SCTEncoder:
             self._encode_param(param=instruction.params[p_id], base_param=base_inst.params[p_id],
                                a_trace=[*a_trace, str(p_id)], e_trace=[*e_trace, str(p_id)])
 
-        do_loop = True
-        has_loop_cond = False
-        # Check for an external loop bypass
-        if base_inst.loop_cond is not None:
-            if base_inst.loop_cond['Location'] == 'External':
-                value1 = instruction.params[base_inst.loop_cond['Parameter']].value
-                if not isinstance(value1, int):
-                    value1 = int(value1)
-                value2 = base_inst.loop_cond['Value']
-                if not isinstance(value2, int):
-                    value2 = int(value2)
-                test = base_inst.loop_cond['Test']
-                do_loop = not self.param_tests[test](value1, value2)
-            else:
-                has_loop_cond = True
-
-        break_loops = False
         loop_iters_performed = 0
-        if do_loop:
-            for i, loop in enumerate(instruction.l_params):
-                for p_id, param in loop.items():
-                    self._encode_param(param=loop[p_id], base_param=base_inst.params[p_id],
-                                       a_trace=[*a_trace, f'{i}|{p_id}'], e_trace=[*e_trace, f'{i}|{p_id}'])
-
-                    # Check internal loop conditions
-                    if not has_loop_cond:
-                        continue
-
-                    if p_id == base_inst.loop_cond['Parameter']:
-                        value1 = param.value
-
-                        if isinstance(value1, dict) and param.arithmetic_value is not None:
-                            value1 = param.arithmetic_value
-
-                        if not isinstance(value1, int):
-                            value1 = self.convert_param_to_int(value1)
-
-                        value2 = base_inst.loop_cond['Value']
-
-                        if not isinstance(value2, int):
-                            value2 = self.convert_param_to_int(value2)
-
-                        test = base_inst.loop_cond['Test']
-                        if self.param_tests[test](value1, value2):
-                            break_loops = True
-                            break
-
-                loop_iters_performed += 1
-                if break_loops:
-                    break
+        for i, loop in self._loops_to_encode(instruction, base_inst):
+            for p_id, param in loop:
+                self._encode_param(param=param, base_param=base_inst.params[p_id],
+                                   a_trace=[*a_trace, f'{i}|{p_id}'], e_trace=[*e_trace, f'{i}|{p_id}'])
+            loop_iters_performed += 1
 
         if loop_iter_param_value is not None:
             if loop_iters_performed != loop_iter_param_value:
-                self._sct_body_insert_hex(location=loop_iter_param_location,
-                                          value=self._make_word(loop_iters_performed))
+                self._sct_body_insert_word(location=loop_iter_param_location, i=loop_iters_performed)
 
         for p_id in base_inst.params_after:
             self._encode_param(param=instruction.params[p_id], base_param=base_inst.params[p_id],
@@ -389,7 +513,139 @@ class SCTEncoder:
 
         if delay_pos is not None:
             inst_len = len(self.sct_body) - inst_pos
-            self._sct_body_insert_hex(delay_pos, bytearray(self._make_word(inst_len)))
+            self._sct_body_insert_word(delay_pos, inst_len)
+
+    def _instruction_size(self, instruction, position, e_trace):
+        self.inst_positions[instruction.ID] = position
+        instruction.absolute_offset = position
+
+        if not instruction.encode_inst:
+            return 0
+
+        base_inst = self.bi.get_inst(instruction.base_id)
+        e_trace.append(str(instruction.ID))
+
+        size = 0
+        if instruction.skip_refresh:
+            if self.add_spurious_refresh or (not base_inst.no_new_frame and not base_inst.forced_new_frame):
+                size += 4
+
+        if instruction.delay_param is not None:
+            # delay code, delay value and length of the delayed instruction
+            size += 8 + self._param_size(param=instruction.delay_param, base_param=self.bi.get_inst(129).params[0],
+                                         e_trace=[*e_trace, 'Delay'])
+
+        # instruction code
+        size += 4
+
+        for p_id in base_inst.params_before:
+            size += self._param_size(param=instruction.params[p_id], base_param=base_inst.params[p_id],
+                                     e_trace=[*e_trace, str(p_id)])
+
+        for i, loop in self._loops_to_encode(instruction, base_inst):
+            for p_id, param in loop:
+                size += self._param_size(param=param, base_param=base_inst.params[p_id],
+                                         e_trace=[*e_trace, f'{i}|{p_id}'])
+
+        for p_id in base_inst.params_after:
+            size += self._param_size(param=instruction.params[p_id], base_param=base_inst.params[p_id],
+                                     e_trace=[*e_trace, str(p_id)])
+
+        if self.use_garbage:
+            for e in instruction.errors:
+                if e[0] == 'Garbage':
+                    size += len(e[1])
+                    break
+
+        return size
+
+    def _param_size(self, param: SCTParameter, base_param, e_trace):
+        # Mirrors _encode_param, recording links and errors without encoding the parameter
+        if 'footer' in base_param.type or 'string' in base_param.type or \
+                'jump' in base_param.type or 'subscript' in base_param.type:
+            if 'footer' in base_param.type or 'string' in base_param.type:
+                if param.linked_string is None or param.linked_string == ('',):
+                    self.script.errors.append(('Encoding', 'Parameter', 'No string assigned', alt_sep.join(e_trace)))
+                    return 0
+                if 'string' in base_param.type:
+                    self.string_links[alt_sep.join(e_trace)] = (param.linked_string, e_trace)
+
+            elif 'jump' in base_param.type or 'subscript' in base_param.type:
+                if param.link is None or param.link.target_trace is None:
+                    self.script.errors.append(('Encoding', 'Parameter', 'Jump not setup', alt_sep.join(e_trace)))
+                    return 0
+                self.sct_links[alt_sep.join(e_trace)] = (param.link.target_trace, e_trace)
+            return len(self._placeholder)
+
+        if 'scpt' in base_param.type:
+            if param.override is not None:
+                return len(param.override)
+            if param.value is None and 'skip' not in base_param.type:
+                self.script.errors.append(('Encoding', 'Parameter', 'Value is None', alt_sep.join(e_trace)))
+                return 0
+            if isinstance(param.value, str) and param.value in self.param_code.no_loop.keys():
+                return 4
+            # expression followed by the stop code
+            return self._scpt_param_size(param.value) + 4
+
+        if param.value is None:
+            self.script.errors.append(('Encoding', 'Parameter', 'Value is None', alt_sep.join(e_trace)))
+            return 0
+        if 'var' in base_param.type:
+            return self._scpt_param_size(param.value)
+        return 4
+
+    def _loops_to_encode(self, instruction, base_inst):
+        """Yields (loop index, [(param id, param), ...]) for each loop of the instruction that is encoded,
+        stopping at the parameter which meets the loop condition"""
+        has_loop_cond = False
+        # Check for an external loop bypass
+        if base_inst.loop_cond is not None:
+            if base_inst.loop_cond['Location'] == 'External':
+                value1 = instruction.params[base_inst.loop_cond['Parameter']].value
+                if not isinstance(value1, int):
+                    value1 = int(value1)
+                value2 = base_inst.loop_cond['Value']
+                if not isinstance(value2, int):
+                    value2 = int(value2)
+                test = base_inst.loop_cond['Test']
+                if self.param_tests[test](value1, value2):
+                    return
+            else:
+                has_loop_cond = True
+
+        for i, loop in enumerate(instruction.l_params):
+            loop_params = []
+            break_loops = False
+            for p_id, param in loop.items():
+                loop_params.append((p_id, param))
+
+                # Check internal loop conditions
+                if not has_loop_cond:
+                    continue
+
+                if p_id == base_inst.loop_cond['Parameter']:
+                    value1 = param.value
+
+                    if isinstance(value1, dict) and param.arithmetic_value is not None:
+                        value1 = param.arithmetic_value
+
+                    if not isinstance(value1, int):
+                        value1 = self.convert_param_to_int(value1)
+
+                    value2 = base_inst.loop_cond['Value']
+
+                    if not isinstance(value2, int):
+                        value2 = self.convert_param_to_int(value2)
+
+                    test = base_inst.loop_cond['Test']
+                    if self.param_tests[test](value1, value2):
+                        break_loops = True
+                        break
+
+            yield i, loop_params
+            if break_loops:
+                return
 
     def _encode_param(self, param: SCTParameter, base_param, a_trace, e_trace):
         # if needed, setup link and use 0x7fffffff as placeholder
@@ -431,6 +687,7 @@ class SCTEncoder:
                 if no_loop:
                     value = self._make_word(self.param_code.no_loop[param.value])
                     if self.validation:
+                        value = bytearray(value)
                         self._check_additions(a_trace, value)
                 else:
                     value = self._encode_scpt_param(param=param.value)
@@ -446,12 +703,27 @@ class SCTEncoder:
             else:
                 value = self._make_word(param.value, signed=base_param.is_signed)
             if self.validation:
+                value = bytearray(value)
                 self._check_additions(a_trace, value)
 
         # add parameter
         self.sct_body.extend(value)
 
     def _encode_scpt_param(self, param):
+        # Single values are quick to encode, only expressions are worth caching
+        if not isinstance(param, dict):
+            return self._encode_scpt_expression(param)
+
+        # The same expressions appear throughout the game, so their encodings are shared between encoders.
+        # repr keeps the key order and tells apart values that are equal but encode differently, like 0.0 and -0.0
+        cache_key = (self.endian, repr(param))
+        encoded = self._scpt_cache.get(cache_key)
+        if encoded is None:
+            encoded = bytes(self._encode_scpt_expression(param))
+            self._scpt_cache.put(cache_key, encoded)
+        return bytearray(encoded)
+
+    def _encode_scpt_expression(self, param):
         param_bytes = bytearray()
 
         if param is None:
@@ -470,7 +742,7 @@ class SCTEncoder:
         # if the parameter is complex, go through the requisite parameter dictionary encoding values then keys
         elif isinstance(param, dict):
             for key, value in param.items():
-                param_bytes.extend(self._encode_scpt_param(value))
+                param_bytes.extend(self._encode_scpt_expression(value))
                 if key in self.param_code.compare:
                     param_bytes.extend(self._make_word(self.param_code.compare[key]))
                 if key in self.param_code.arithmetic:
@@ -497,6 +769,25 @@ class SCTEncoder:
 
         return param_bytes
 
+    def _scpt_param_size(self, param):
+        # Size of the output of _encode_scpt_param
+        if param is None:
+            return 0
+        if isinstance(param, (int, float)):
+            return 8
+        if isinstance(param, dict):
+            size = 0
+            for key, value in param.items():
+                size += self._scpt_param_size(value)
+                if key in self.param_code.compare:
+                    size += 4
+                if key in self.param_code.arithmetic:
+                    size += 4
+            return size
+        if isinstance(param, str):
+            return 4
+        return 0
+
     def _check_additions(self, trace, ba: bytearray):
         key = '-'.join(trace)
         if key in self._additions:
@@ -511,9 +802,14 @@ class SCTEncoder:
                 addition = addition['value']
             ba.extend(addition)
 
-    def _make_word(self, i: int, signed=None):
-        signed = False if signed is None else signed
-        return bytearray(i.to_bytes(length=4, byteorder=self.endian, signed=signed))
+    def _make_word(self, i: int, signed=None) -> bytes:
+        # Words are immutable and shared through the cache, copy before extending one
+        signed = bool(signed)
+        key = (i, signed)
+        word = self._word_cache.get(key)
+        if word is None:
+            word = self._word_cache[key] = self._word_structs[signed].pack(i)
+        return word
 
     def _encode_string(self, string, encoding='shiftjis', align=True, size=-1):
         if '«' in string:
@@ -549,18 +845,23 @@ class SCTEncoder:
         str_bytes.extend(extra_bytes)
         return str_bytes
 
-    def _sct_body_insert_hex(self, location: int, value: bytearray, validation: Union[None, bytearray] = None):
+    def _sct_body_check(self, location: int, validation: Union[None, bytes]):
         if validation is None:
-            valid = True
-        else:
-            valid = validation.hex() == self.sct_body[location: location + len(validation)].hex()
-
-        if not valid:
-            print(
-                f'{self.log_key}: Validation failed for hex replacement in sct_body: {self.sct_body[location: location + len(validation) - 1].hex()} != {validation.hex()}')
+            return True
+        current = memoryview(self.sct_body)[location: location + len(validation)]
+        try:
+            if current == validation:
+                return True
+            print(f'{self.log_key}: Validation failed for hex replacement in sct_body: '
+                  f'{current.hex()} != {validation.hex()}')
+            return False
+        finally:
+            current.release()
+
+    def _sct_body_insert_word(self, location: int, i: int, signed=False, validation: Union[None, bytes] = None):
+        if not self._sct_body_check(location, validation):
             return
-
-        self.sct_body = self.sct_body[:location] + value + self.sct_body[location + len(value):]
+        self._word_structs[bool(signed)].pack_into(self.sct_body, location, i)
 
     @staticmethod
     def detect_encoding(script: SCTScript):
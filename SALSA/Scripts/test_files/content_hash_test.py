@@ -0,0 +1,34 @@
+# This file checks that the content hashes of a project's scripts are the same after saving and reloading it, so
+# reopening a project doesn't export every script again.
+import os
+import tempfile
+
+# Requires a saved project to run
+project_file = './../../_project_files/test_project.prj'
+
+
+if __name__ == '__main__':
+    cur_dir = os.path.dirname(__file__)
+    os.chdir(cur_dir)
+    # Saving a project records its directory in the user settings, which are found from the base directory
+    project_file = os.path.abspath(project_file)
+    os.chdir(os.path.pardir)
+    os.chdir(os.path.pardir)
+    os.chdir(os.path.pardir)
+    from SALSA.FileModels.project_model import ProjectModel
+    from SALSA.FileModels.sct_model import get_script_content_hash
+
+    prj_model = ProjectModel()
+    project = prj_model.load_project(project_file, ignore_dir=True, lazy=False)
+    hashes = {name: get_script_content_hash(script) for name, script in project.scts.items()}
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        copy_file = os.path.join(tmp_dir, os.path.basename(project_file))
+        prj_model.save_project(project, copy_file)
+        copy = prj_model.load_project(copy_file, ignore_dir=True, lazy=False)
+
+    changed = [name for name, script in copy.scts.items() if get_script_content_hash(script) != hashes.get(name)]
+    print(f'{os.path.basename(project_file)}: {len(hashes) - len(changed)} of {len(hashes)} scripts hash the same '
+          f'after saving and reloading')
+    for name in changed:
+        print(f'\t{name} hashes differently')
@@ -0,0 +1,67 @@
+# This file times decoding of sct files and the per-instruction parameter copies the decoder no longer makes.
+import copy
+import time
+
+# Requires a script directory to run
+script_dir = './../../_script_files/_US_decompressed_scripts'
+
+# Number of times each script is decoded, the fastest run is reported
+repeats = 3
+
+# If None, the largest script in script_dir is used
+script_name = None
+
+
+def time_decode(decoder, name, sct, inst_lib):
+    best = None
+    script = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        script = decoder.decode_sct_from_file(name, sct=bytearray(sct), inst_lib=inst_lib)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, script
+
+
+def time_param_copies(script, inst_lib):
+    # Deep copies of base parameters that the decoder used to make for each decoded instruction
+    base_ids = [inst.base_id for sect in script.sects.values() for inst in sect.insts.values()]
+    start = time.perf_counter()
+    for base_id in base_ids:
+        copy.deepcopy(inst_lib.get_inst(base_id).params)
+    return time.perf_counter() - start, len(base_ids)
+
+
+if __name__ == '__main__':
+    import contextlib
+    import io
+    import os
+    cur_dir = os.path.dirname(__file__)
+    os.chdir(cur_dir)
+    os.chdir(os.path.pardir)
+    os.chdir(os.path.pardir)
+    os.chdir(os.path.pardir)
+    from SALSA.FileModels.sct_model import SCTModel
+    from SALSA.BaseInstructions.bi_facade import BaseInstLibFacade
+    from SALSA.Scripts.script_decoder import SCTDecoder
+    os.chdir(cur_dir)
+    os.chdir(os.path.pardir)
+
+    baseinsts = BaseInstLibFacade()
+    sct_model = SCTModel()
+
+    if script_name is None:
+        files = [f for f in os.listdir(script_dir) if f.lower().endswith('.sct')]
+        script_name = max(files, key=lambda f: os.path.getsize(os.path.join(script_dir, f)))
+
+    name, original_ba = sct_model.read_sct_file(filepath=os.path.join(script_dir, script_name))
+    name = name.split(os.sep)[-1]
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        decode_time, decoded_script = time_decode(SCTDecoder, name, original_ba, baseinsts)
+    copy_time, inst_count = time_param_copies(decoded_script, baseinsts)
+
+    print(f'{name}: {len(original_ba)} bytes, {inst_count} instructions')
+    print(f'Decode time: {decode_time:.3f}s')
+    print(f'Parameter deep copies avoided: {copy_time:.3f}s '
+          f'({copy_time / (decode_time + copy_time) * 100:.1f}% of the previous decode time)')
@@ -0,0 +1,130 @@
+# This file tests that laying out scripts gives the same offsets and encoding errors as encoding them.
+import copy
+
+# Requires a script directory to run
+script_dir = './../../_script_files/_US_decompressed_scripts'
+
+# All files between the first and last file names will be checked.
+# If first_file == None, starts at beginning
+# If last_file == None, goes till end
+first_file = None
+last_file = None
+
+
+def get_offsets(script):
+    return [(name, script.sects[name].absolute_offset,
+             [script.sects[name].insts[inst_id].absolute_offset for inst_id in script.sects[name].inst_list])
+            for name in script.sect_list]
+
+
+def get_encoding_errors(script):
+    return sorted(str(e) for e in script.errors if 'Encoding' in e)
+
+
+def clear_offsets(script, sections):
+    for name in sections:
+        section = script.sects[name]
+        section.absolute_offset = -1
+        for inst in section.insts.values():
+            inst.absolute_offset = -1
+
+
+def make_mixed_encoding(script):
+    """Puts a '«' string in a string group in the first third of the script and strings which are shorter in cp1252
+    than in shiftjis in a string group in the second third. Returns the first section after the '«' group"""
+    if len(script.sect_list) < 4 or len(script.strings) == 0:
+        return None
+    groups = [name for name in script.sect_list if name in script.string_groups]
+    strings = [string for name in groups for string in script.string_groups[name]]
+    if len(strings) < 3:
+        return None
+    for name in groups:
+        del script.string_groups[name]
+    first = script.sect_list[len(script.sect_list) // 3]
+    second = script.sect_list[2 * len(script.sect_list) // 3]
+    script.string_groups[first] = strings[:2]
+    script.string_groups[second] = strings[2:]
+
+    # The first string found decides the starting encoding, so it starts as shiftjis
+    first_string = next(iter(script.strings))
+    script.strings[first_string] = '＜' + script.strings[first_string]
+    script.strings[strings[1] if strings[0] == first_string else strings[0]] += '«'
+    for string in strings[2:]:
+        script.strings[string] = '×××'
+    return script.sect_list[script.sect_list.index(first) + 1]
+
+
+def check_layout(name, script, start_section=None):
+    SCTEncoder.encode_sct_file_from_project_script(project_script=script, base_insts=baseinsts, endian='big')
+    encoded_offsets = get_offsets(script)
+    encoded_errors = get_encoding_errors(script)
+
+    if start_section is None:
+        clear_offsets(script, script.sect_list)
+    else:
+        clear_offsets(script, script.sect_list[script.sect_list.index(start_section) + 1:])
+    SCTEncoder.layout_sct_from_project_script(project_script=script, base_insts=baseinsts,
+                                              start_section=start_section)
+    if get_offsets(script) != encoded_offsets:
+        return [f'{name}: Offsets differ from encoding']
+    if get_encoding_errors(script) != encoded_errors:
+        return [f'{name}: Encoding errors differ from encoding']
+    return []
+
+
+if __name__ == '__main__':
+    import os
+    cur_dir = os.path.dirname(__file__)
+    os.chdir(cur_dir)
+    os.chdir(os.path.pardir)
+    os.chdir(os.path.pardir)
+    os.chdir(os.path.pardir)
+    from SALSA.FileModels.sct_model import SCTModel
+    from SALSA.BaseInstructions.bi_facade import BaseInstLibFacade
+    from SALSA.Scripts.script_decoder import SCTDecoder
+    from SALSA.Scripts.script_encoder import SCTEncoder
+    os.chdir(cur_dir)
+    os.chdir(os.path.pardir)
+
+    baseinsts = BaseInstLibFacade()
+
+    sct_model = SCTModel()
+
+    files = os.listdir(script_dir)
+
+    differences = []
+    skip = first_file is not None
+    for f in files:
+        if first_file is not None and f.lower() == first_file.lower():
+            skip = False
+
+        if skip:
+            continue
+
+        name, original_ba = sct_model.read_sct_file(filepath=os.path.join(script_dir, f))
+        name = f.split('.')[0]
+        script = SCTDecoder.decode_sct_from_file(name, sct=original_ba, inst_lib=baseinsts)
+
+        # Full layout
+        differences.extend(check_layout(name, script))
+
+        # Layout from a middle section after removing one of its instructions
+        middle = [s for s in script.sect_list if len(script.sects[s].inst_list) > 2]
+        if len(middle) > 0:
+            section_name = middle[len(middle) // 2]
+            script.sects[section_name].inst_list.pop(1)
+            differences.extend(check_layout(f'{name} (from {section_name})', script, start_section=section_name))
+
+        # Layout after a string group which switches the string encoding
+        mixed_script = copy.deepcopy(script)
+        start = make_mixed_encoding(mixed_script)
+        if start is not None:
+            differences.extend(check_layout(f'{name} (mixed encoding from {start})', mixed_script,
+                                            start_section=start))
+
+        if last_file is not None and f.lower() == last_file.lower():
+            break
+
+    for difference in differences:
+        print(difference)
+    print(f'{len(differences)} layouts differ from encoding')
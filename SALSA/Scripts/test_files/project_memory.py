@@ -0,0 +1,46 @@
+# This file reports the memory a loaded project takes up, per instruction and per parameter.
+import gc
+import os
+import tracemalloc
+
+# Requires a saved project to run
+project_file = './../../_project_files/test_project.prj'
+
+
+def count_pieces(project):
+    inst_count = 0
+    param_count = 0
+    for script in project.scts.values():
+        for section in script.sects.values():
+            inst_count += len(section.insts)
+            for inst in section.insts.values():
+                param_count += len(inst.params)
+                for loop in inst.l_params:
+                    param_count += len(loop)
+    return inst_count, param_count
+
+
+if __name__ == '__main__':
+    cur_dir = os.path.dirname(__file__)
+    os.chdir(cur_dir)
+    os.chdir(os.path.pardir)
+    os.chdir(os.path.pardir)
+    os.chdir(os.path.pardir)
+    from SALSA.FileModels.project_model import ProjectModel
+    from SALSA.Project.project_container import SCTProject
+    os.chdir(cur_dir)
+
+    prj_model = ProjectModel()
+
+    gc.collect()
+    tracemalloc.start()
+    project: SCTProject = prj_model.load_project(project_file, ignore_dir=True, lazy=False)
+    gc.collect()
+    size, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    inst_count, param_count = count_pieces(project)
+    print(f'{os.path.basename(project_file)}: {len(project.scts)} scripts, {inst_count} instructions, '
+          f'{param_count} parameters')
+    print(f'Loaded size: {size / 2**20:.1f} MiB ({size / max(inst_count, 1):.0f} bytes per instruction), '
+          f'peak while loading: {peak / 2**20:.1f} MiB')
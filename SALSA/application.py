@@ -6,7 +6,6 @@ import threading
 import tkinter as tk
 from tkinter import filedialog, messagebox, ttk
 from tkinter.filedialog import asksaveasfilename
-from typing import Union
 
 from SALSA.Analysis.link_finder import LinkFinder
 from SALSA.Analysis.var_usage import VarUsage
@@ -301,27 +300,30 @@ class Application(tk.Tk):
         script_thread.start()
         self._script_add_listener(script_decode_queue)
 
-    def _script_add_listener(self, decode_queue, scripts: Union[None, dict] = None):
-        if scripts is None:
-            scripts = {}
-        if not decode_queue.empty():
+    def _script_add_listener(self, decode_queue):
+        # Add all scripts decoded since the last check to the project together
+        scripts = {}
+        stop = False
+        while not decode_queue.empty():
             item = decode_queue.get()
             decode_queue.task_done()
             if isinstance(item, str):
                 if item == 'stop':
-                    return self.finish_add_script(scripts)
+                    stop = True
             else:
                 scripts |= item
-        self.after(20, self._script_add_listener, decode_queue, scripts)
+        if len(scripts) > 0:
+            self.project.add_scripts_to_project(scripts)
+        if stop:
+            return self.finish_add_script()
+        self.after(20, self._script_add_listener, decode_queue)
 
     def _threaded_script_decoder(self, script_paths, script_decode_out_queue: queue.Queue, status_queue: queue.SimpleQueue):
-        for filepath in script_paths:
-            name, script = self.sct_model.load_sct(self.base_insts, file=filepath, status=status_queue)
+        for name, script in self.sct_model.load_scts(self.base_insts, files=script_paths, status=status_queue):
             script_decode_out_queue.put({name: script})
         script_decode_out_queue.put('stop')
 
-    def finish_add_script(self, scripts):
-        self.project.add_scripts_to_project(scripts)
+    def finish_add_script(self):
         self.gui.stop_status_popup()
 
     def on_quit(self):
@@ -345,8 +347,8 @@ class Application(tk.Tk):
     # -------------------------------- #
 
     def on_export_scts(self, directory, scripts, options):
-        compress = options['compress_aklz']
-        options.pop('compress_aklz')
+        compress = options.pop('compress_aklz')
+        compress_mode = options.pop('aklz_mode')
 
         script_dict = {}
         for script in scripts:
@@ -360,24 +362,28 @@ class Application(tk.Tk):
 
         finish_queue = queue.SimpleQueue()
         script_thread = threading.Thread(target=self._threaded_script_exporter,
-                                         args=(script_dict, options, compress, finish_queue, self.gui.status_queue))
+                                         args=(script_dict, options, compress, compress_mode, finish_queue,
+                                               self.gui.status_queue))
         script_thread.start()
         self._script_export_listener(finish_queue)
 
-    def _threaded_script_exporter(self, scripts, options, compress, finish_queue, status_queue: queue.SimpleQueue):
+    def _threaded_script_exporter(self, scripts, options, compress, compress_mode, finish_queue,
+                                  status_queue: queue.SimpleQueue):
+        export_scripts = {}
         for name, filepath in scripts.items():
             if name in self.project_edit_controller.encoding_errors:
                 self.project_edit_controller.encoding_errors.remove(name)
             if name in self.project_edit_controller.script_refresh_offset_queue:
                 self.project_edit_controller.script_refresh_offset_queue.remove(name)
-            status_queue.put({'msg': f'Encoding {name}.sct'})
-            script = self.project.get_project_script_by_name(name)
-            self.sct_model.export_script_as_sct(filepath=filepath, script=script, base_insts=self.base_insts,
-                                                options=options, compress=compress)
-            for error in self.project.get_project_script_by_name(name).errors:
-                if 'Encoding' in error:
-                    self.project_edit_controller.encoding_errors.append(name)
-                    self.project_edit_controller.script_refresh_offset_queue.append(name)
+            export_scripts[name] = (self.project.get_project_script_by_name(name), filepath)
+
+        for name, saved in self.sct_model.export_scts(export_scripts, base_insts=self.base_insts, options=options,
+                                                      compress=compress, compress_mode=compress_mode,
+                                                      status=status_queue):
+            has_errors = not saved or any('Encoding' in error for error in export_scripts[name][0].errors)
+            if has_errors:
+                self.project_edit_controller.encoding_errors.append(name)
+                self.project_edit_controller.script_refresh_offset_queue.append(name)
         finish_queue.put('stop')
 
     def _script_export_listener(self, decode_queue):
@@ -416,15 +422,18 @@ class Application(tk.Tk):
 
     def refresh_offsets(self):
         scts = copy.deepcopy(self.project_edit_controller.script_refresh_offset_queue)
+        start_sections = self.project_edit_controller.script_refresh_offset_starts
         self.project_edit_controller.script_refresh_offset_queue = []
+        self.project_edit_controller.script_refresh_offset_starts = {}
         done_queue = queue.SimpleQueue()
         self.gui.show_status_popup('Refresh Absolute Positions', 'Refreshing positions:')
-        thread = threading.Thread(target=self._threaded_refresh_poses, args=(scts, self.gui.status_queue, done_queue))
+        thread = threading.Thread(target=self._threaded_refresh_poses,
+                                  args=(scts, start_sections, self.gui.status_queue, done_queue))
         thread.start()
         self.after(20, self._refresh_pos_listener, done_queue)
 
-    def _threaded_refresh_poses(self, scripts, message_queue, done_queue):
-        errored_scts = self.project.refresh_abs_poses(scripts, message_queue)
+    def _threaded_refresh_poses(self, scripts, start_sections, message_queue, done_queue):
+        errored_scts = self.project.refresh_abs_poses(scripts, message_queue, start_sections=start_sections)
         self.project_edit_controller.encoding_errors = errored_scts
         self.project_edit_controller.script_refresh_offset_queue = [*errored_scts]
         done_queue.put('done')
@@ -521,5 +530,6 @@ class Application(tk.Tk):
         print('Variable usage written to ' + filename)
 
     def show_section_links(self, sct, section):
-        link_finder = LinkFinder.find_links(self.project.project, sct, section, self.base_insts)
+        link_finder = LinkFinder.find_links(self.project.project, sct, section, self.base_insts,
+                                            link_graph=self.project.get_link_graph(sct))
         self.gui.show_links_popup(link_finder)